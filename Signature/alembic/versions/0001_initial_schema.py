@@ -0,0 +1,112 @@
+"""initial schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2025-06-26 12:00:00
+
+Schema ban đầu (trước đây được tạo trực tiếp từ models).
+Database đã có sẵn các bảng này thì chỉ cần `alembic stamp 0001`.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'users',
+        sa.Column('user_id', sa.UUID(), primary_key=True),
+        sa.Column('username', sa.String(50)),
+        sa.Column('email', sa.String(100)),
+        sa.Column('password_hash', sa.String(255)),
+        sa.Column('two_factor_secret', sa.String(255)),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.func.now()),
+        sa.Column('last_login', sa.DateTime()),
+    )
+    op.create_index('ix_users_user_id', 'users', ['user_id'])
+    op.create_index('ix_users_username', 'users', ['username'], unique=True)
+    op.create_index('ix_users_email', 'users', ['email'], unique=True)
+    op.create_index('ix_users_last_login', 'users', ['last_login'])
+
+    op.create_table(
+        'keys',
+        sa.Column('key_id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('user_id', sa.UUID(), sa.ForeignKey('users.user_id', ondelete='CASCADE'), unique=True),
+        sa.Column('public_key', sa.Text()),
+        sa.Column('encrypted_private', sa.Text()),
+        sa.Column('salt', sa.Text()),
+        sa.Column('nonce', sa.Text()),
+        sa.Column('revoked_at', sa.DateTime()),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.func.now()),
+    )
+
+    op.create_table(
+        'documents',
+        sa.Column('document_id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('user_id', sa.UUID(), sa.ForeignKey('users.user_id', ondelete='CASCADE')),
+        sa.Column('filename', sa.String(255)),
+        sa.Column('status', sa.String(255)),
+        sa.Column('file_bytes', sa.Text()),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.func.now()),
+    )
+
+    op.create_table(
+        'signatures',
+        sa.Column('signature_id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('document_id', sa.Integer(), sa.ForeignKey('documents.document_id', ondelete='CASCADE')),
+        sa.Column('user_id', sa.UUID(), sa.ForeignKey('users.user_id', ondelete='SET NULL')),
+        sa.Column('key_id', sa.Integer(), sa.ForeignKey('keys.key_id', ondelete='SET NULL')),
+        sa.Column('signature', sa.Text()),
+        sa.Column('signed_at', sa.DateTime(), server_default=sa.func.now()),
+    )
+
+    op.create_table(
+        'shared_documents',
+        sa.Column('share_id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('document_id', sa.Integer(), sa.ForeignKey('documents.document_id', ondelete='CASCADE')),
+        sa.Column('user_id', sa.UUID(), sa.ForeignKey('users.user_id', ondelete='CASCADE')),
+        sa.Column('token', sa.String(64), unique=True),
+        sa.Column('expires_at', sa.DateTime()),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.func.now()),
+    )
+
+    op.create_table(
+        'activity_logs',
+        sa.Column('log_id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('user_id', sa.UUID(), sa.ForeignKey('users.user_id', ondelete='CASCADE'), unique=True),
+        sa.Column('activity_type', sa.String(50)),
+        sa.Column('document_id', sa.Integer(), sa.ForeignKey('documents.document_id', ondelete='SET NULL')),
+        sa.Column('ip_address', sa.String(45)),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.func.now()),
+    )
+
+    op.create_table(
+        'verifications',
+        sa.Column('verification_id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('signature_id', sa.Integer(), sa.ForeignKey('signatures.signature_id', ondelete='CASCADE')),
+        sa.Column('user_id', sa.UUID(), sa.ForeignKey('users.user_id', ondelete='SET NULL')),
+        sa.Column('is_valid', sa.Boolean()),
+        sa.Column('verified_at', sa.DateTime(), server_default=sa.func.now()),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('verifications')
+    op.drop_table('activity_logs')
+    op.drop_table('shared_documents')
+    op.drop_table('signatures')
+    op.drop_table('documents')
+    op.drop_table('keys')
+    op.drop_index('ix_users_last_login', table_name='users')
+    op.drop_index('ix_users_email', table_name='users')
+    op.drop_index('ix_users_username', table_name='users')
+    op.drop_index('ix_users_user_id', table_name='users')
+    op.drop_table('users')
@@ -0,0 +1,106 @@
+"""move document bytes to blob store
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 09:00:00
+
+- Thêm content_sha256, size_bytes, storage_key vào documents
+- Chuyển nội dung base64 trong documents.file_bytes sang blob store (theo lô)
+- Xoá cột file_bytes
+"""
+import base64
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from src.storage import get_blob_store
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 100
+
+documents = sa.table(
+    'documents',
+    sa.column('document_id', sa.Integer),
+    sa.column('file_bytes', sa.Text),
+    sa.column('content_sha256', sa.String),
+    sa.column('size_bytes', sa.BigInteger),
+    sa.column('storage_key', sa.String),
+)
+
+
+def upgrade() -> None:
+    op.add_column('documents', sa.Column('content_sha256', sa.String(64)))
+    op.add_column('documents', sa.Column('size_bytes', sa.BigInteger()))
+    op.add_column('documents', sa.Column('storage_key', sa.String(255)))
+    op.create_index('ix_documents_content_sha256', 'documents', ['content_sha256'])
+
+    bind = op.get_bind()
+    store = get_blob_store()
+    last_id = 0
+
+    # Duyệt theo document_id (keyset) để không phải tải cả bảng vào bộ nhớ
+    while True:
+        rows = bind.execute(
+            sa.select(documents.c.document_id, documents.c.file_bytes)
+            .where(documents.c.document_id > last_id)
+            .where(documents.c.file_bytes.isnot(None))
+            .order_by(documents.c.document_id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+
+        for document_id, file_bytes in rows:
+            blob = store.put_bytes(base64.b64decode(file_bytes))
+            bind.execute(
+                documents.update()
+                .where(documents.c.document_id == document_id)
+                .values(
+                    content_sha256=blob.sha256,
+                    size_bytes=blob.size,
+                    storage_key=blob.storage_key,
+                )
+            )
+            last_id = document_id
+
+    op.drop_column('documents', 'file_bytes')
+
+
+def downgrade() -> None:
+    op.add_column('documents', sa.Column('file_bytes', sa.Text()))
+
+    bind = op.get_bind()
+    store = get_blob_store()
+    last_id = 0
+
+    while True:
+        rows = bind.execute(
+            sa.select(documents.c.document_id, documents.c.storage_key)
+            .where(documents.c.document_id > last_id)
+            .where(documents.c.storage_key.isnot(None))
+            .order_by(documents.c.document_id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+
+        for document_id, storage_key in rows:
+            data = store.read_bytes(storage_key)
+            bind.execute(
+                documents.update()
+                .where(documents.c.document_id == document_id)
+                .values(file_bytes=base64.b64encode(data).decode('utf-8'))
+            )
+            last_id = document_id
+
+    op.drop_index('ix_documents_content_sha256', table_name='documents')
+    op.drop_column('documents', 'storage_key')
+    op.drop_column('documents', 'size_bytes')
+    op.drop_column('documents', 'content_sha256')
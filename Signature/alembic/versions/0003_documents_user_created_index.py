@@ -0,0 +1,26 @@
+"""index documents(user_id, created_at) for listing
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 10:00:00
+
+Index phục vụ danh sách document theo keyset (created_at, document_id).
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_documents_user_id_created_at', 'documents', ['user_id', 'created_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_documents_user_id_created_at', table_name='documents')
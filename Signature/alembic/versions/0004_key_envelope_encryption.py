@@ -0,0 +1,33 @@
+"""envelope encryption columns for keys
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 11:00:00
+
+- keys.wrapped_dek: DEK đã wrap bằng KEK
+- keys.kek_version: version KEK dùng để wrap
+Key cũ (salt != NULL) vẫn giải mã được; chạy `python -m src.key.rewrap` để chuyển sang envelope.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('keys', sa.Column('wrapped_dek', sa.Text()))
+    op.add_column('keys', sa.Column('kek_version', sa.Integer()))
+    op.create_index('ix_keys_kek_version', 'keys', ['kek_version'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_keys_kek_version', table_name='keys')
+    op.drop_column('keys', 'kek_version')
+    op.drop_column('keys', 'wrapped_dek')
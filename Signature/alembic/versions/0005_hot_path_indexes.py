@@ -0,0 +1,75 @@
+"""hot-path indexes and unique (user_id, filename) on documents
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 12:00:00
+
+- Đổi tên các document trùng (user_id, filename): bản mới nhất giữ tên, các bản cũ
+  thành "<filename> (<document_id>)"; không chuyển chữ ký/lịch sử sang document khác.
+  Còn trùng sau khi đổi tên -> dừng migration và liệt kê các nhóm trùng
+- documents: unique (user_id, filename), index (user_id, document_id)
+- signatures: index (document_id, user_id)
+keys.user_id đã có index từ unique constraint nên không thêm.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+FILENAME_LENGTH = 255
+MAX_REPORTED_DUPLICATES = 50
+
+
+def upgrade() -> None:
+    # Bản giữ tên của mỗi nhóm trùng = document_id lớn nhất; tên mới vẫn trong giới hạn String(255)
+    op.execute(
+        f"""
+        UPDATE documents d
+        SET filename = LEFT(d.filename, {FILENAME_LENGTH} - LENGTH(dup.suffix)) || dup.suffix
+        FROM (
+            SELECT document_id, ' (' || document_id || ')' AS suffix FROM (
+                SELECT document_id,
+                       MAX(document_id) OVER (PARTITION BY user_id, filename) AS keep_id
+                FROM documents
+                WHERE filename IS NOT NULL
+            ) g
+            WHERE document_id <> keep_id
+        ) dup
+        WHERE d.document_id = dup.document_id
+        """
+    )
+
+    # Tên mới trùng với 1 file có sẵn (hiếm) -> không tự xử lý, báo lại để xử lý tay
+    duplicates = op.get_bind().execute(sa.text(
+        f"""
+        SELECT user_id, filename, array_agg(document_id ORDER BY document_id) AS document_ids
+        FROM documents
+        WHERE filename IS NOT NULL
+        GROUP BY user_id, filename
+        HAVING COUNT(*) > 1
+        LIMIT {MAX_REPORTED_DUPLICATES}
+        """
+    )).all()
+    if duplicates:
+        report = "\n".join(
+            f"  user_id={row.user_id} filename={row.filename!r} document_ids={list(row.document_ids)}"
+            for row in duplicates
+        )
+        raise RuntimeError(f"Còn document trùng (user_id, filename), cần xử lý tay trước khi migrate:\n{report}")
+
+    op.create_unique_constraint('uq_documents_user_id_filename', 'documents', ['user_id', 'filename'])
+    op.create_index('ix_documents_user_id_document_id', 'documents', ['user_id', 'document_id'])
+    op.create_index('ix_signatures_document_id_user_id', 'signatures', ['document_id', 'user_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_signatures_document_id_user_id', table_name='signatures')
+    op.drop_index('ix_documents_user_id_document_id', table_name='documents')
+    op.drop_constraint('uq_documents_user_id_filename', 'documents', type_='unique')
@@ -0,0 +1,37 @@
+"""activity_logs: drop unique user_id, index (user_id, created_at)
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 13:00:00
+
+unique trên activity_logs.user_id khiến mỗi user chỉ có được 1 dòng log.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Tên mặc định Postgres đặt cho unique constraint của 0001
+    op.drop_constraint('activity_logs_user_id_key', 'activity_logs', type_='unique')
+    op.create_index('ix_activity_logs_user_id_created_at', 'activity_logs', ['user_id', 'created_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_activity_logs_user_id_created_at', table_name='activity_logs')
+    # Chỉ giữ dòng log mới nhất của mỗi user để khôi phục được unique
+    op.execute(
+        """
+        DELETE FROM activity_logs a
+        USING activity_logs b
+        WHERE a.user_id = b.user_id AND a.log_id < b.log_id
+        """
+    )
+    op.create_unique_constraint('activity_logs_user_id_key', 'activity_logs', ['user_id'])
@@ -0,0 +1,46 @@
+"""signatures: page, rect, content_hash, algorithm, manifest_version
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 14:00:00
+
+Mỗi dòng signatures giữ thêm vị trí stamp và digest nội dung đã ký (trùng với mục
+trong manifest của PDF) để tra cứu theo người ký / kiểm tra chồng chéo không cần parse PDF.
+Dòng cũ để NULL, điền bằng job backfill (python -m src.document.backfill).
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = (
+    ('page', sa.Integer()),
+    ('rect_x', sa.Float()),
+    ('rect_y', sa.Float()),
+    ('rect_width', sa.Float()),
+    ('rect_height', sa.Float()),
+    ('content_hash', sa.String(length=64)),
+    ('algorithm', sa.String(length=32)),
+    ('manifest_version', sa.Integer()),
+)
+
+
+def upgrade() -> None:
+    for name, type_ in COLUMNS:
+        op.add_column('signatures', sa.Column(name, type_, nullable=True))
+    op.create_index('ix_signatures_user_id_signature_id', 'signatures', ['user_id', 'signature_id'])
+    op.create_index('ix_signatures_document_id_page', 'signatures', ['document_id', 'page'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_signatures_document_id_page', table_name='signatures')
+    op.drop_index('ix_signatures_user_id_signature_id', table_name='signatures')
+    for name, _ in reversed(COLUMNS):
+        op.drop_column('signatures', name)
@@ -0,0 +1,41 @@
+"""documents.signatures_indexed_at: đánh dấu document đã được job backfill đọc
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19 09:00:00
+
+Job backfill chỉ đọc document chưa có dấu (index riêng cho các dòng NULL), nên
+document không có chữ ký và dòng signatures đã tách khỏi file (page NULL) không bị
+tải + parse lại ở mỗi lần chạy. Document đã có đủ chỉ mục được đánh dấu ngay.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('documents', sa.Column('signatures_indexed_at', sa.DateTime(), nullable=True))
+    op.execute(
+        """
+        UPDATE documents d SET signatures_indexed_at = now()
+        WHERE EXISTS (SELECT 1 FROM signatures s WHERE s.document_id = d.document_id)
+          AND NOT EXISTS (SELECT 1 FROM signatures s WHERE s.document_id = d.document_id AND s.page IS NULL)
+        """
+    )
+    op.create_index(
+        'ix_documents_signatures_unindexed', 'documents', ['document_id'],
+        postgresql_where=sa.text('signatures_indexed_at IS NULL')
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_documents_signatures_unindexed', table_name='documents')
+    op.drop_column('documents', 'signatures_indexed_at')
@@ -0,0 +1,88 @@
+# Benchmark đọc chữ ký trong metadata PDF: pypdf.PdfReader (cách cũ) và pdfmeta (đường nhanh)
+# Chạy tay: python -m benchmarks.bench_metadata [--pages 1 1000] [--repeat 50]
+import argparse
+import io
+import json
+import mmap
+import os
+import tempfile
+import time
+from typing import Callable, List
+
+import fitz  # PyMuPDF
+from pypdf import PdfReader
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives import serialization
+
+from src.document.pdfmeta import read_info, read_signature_manifest
+from src.document.worker import sign_pdf_multi_sync
+
+
+def build_signed_pdf(pages: int) -> bytes:
+    """PDF có `pages` trang chữ, được ký 3 lần (3 lần lưu incremental) để có chuỗi /Prev"""
+    doc = fitz.open()
+    for number in range(pages):
+        page = doc.new_page()
+        for line in range(30):
+            page.insert_text((50, 60 + line * 20), f"Trang {number + 1} - dòng {line + 1}", fontsize=11)
+    pdf_bytes = doc.tobytes(garbage=3, deflate=True)
+    doc.close()
+
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    key_der = private_key.private_bytes(
+        serialization.Encoding.DER,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption()
+    )
+    for index in range(3):
+        pdf_bytes, _ = sign_pdf_multi_sync(
+            pdf_bytes, key_der, f"signer-{index}", f"id-{index}", [(1, 100 + index * 200, 300)]
+        )
+    return pdf_bytes
+
+
+def pypdf_signatures(pdf_bytes: bytes) -> int:
+    """Cách cũ: dựng PdfReader rồi json.loads metadata"""
+    metadata = PdfReader(io.BytesIO(pdf_bytes)).metadata or {}
+    manifest = json.loads(metadata.get("/SignatureManifest", "{}") or "{}")
+    return len(manifest.get("signatures", []))
+
+
+def timed(fn: Callable[[], object], repeat: int) -> float:
+    """Thời gian trung bình 1 lần gọi (ms), bỏ lần chạy đầu (warm-up)"""
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def run(page_counts: List[int], repeat: int) -> None:
+    print(f"{'pages':>6} {'size (KB)':>10} {'pypdf (ms)':>11} {'pdfmeta bytes (ms)':>19} {'pdfmeta mmap (ms)':>18} {'speedup':>8}")
+    for pages in page_counts:
+        pdf_bytes = build_signed_pdf(pages)
+        assert pypdf_signatures(pdf_bytes) == len(read_signature_manifest(pdf_bytes).entries) == 3
+
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+            f.write(pdf_bytes)
+            path = f.name
+        try:
+            with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                old = timed(lambda: pypdf_signatures(pdf_bytes), repeat)
+                fast = timed(lambda: read_info(pdf_bytes), repeat)
+                fast_mmap = timed(lambda: read_info(mapped), repeat)
+        finally:
+            os.unlink(path)
+
+        print(
+            f"{pages:>6} {len(pdf_bytes) / 1024:>10.1f} {old:>11.3f} {fast:>19.3f} {fast_mmap:>18.3f} "
+            f"{old / fast:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 1000])
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    run(args.pages, args.repeat)
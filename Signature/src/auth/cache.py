@@ -0,0 +1,90 @@
+# Cache payload JWT đã xác minh (tránh giải mã + kiểm tra chữ ký HMAC mỗi request)
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from src import metrics
+from src.config import TOKEN_CACHE_MAX_SIZE, TOKEN_CACHE_TTL_SECONDS
+
+
+def token_digest(token: str) -> bytes:
+    """Khoá cache: sha256 của token (không giữ token gốc trong bộ nhớ)"""
+    return hashlib.sha256(token.encode()).digest()
+
+
+class TokenPayloadCache:
+    """
+    Cache LRU các payload đã xác minh, key theo sha256(token)
+    - Entry hết hạn tại min(exp của token, lúc put + ttl_seconds)
+      nên token hết hạn không bao giờ được trả từ cache
+    - Vượt max_size -> bỏ entry ít dùng nhất
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[bytes, tuple[float, dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, token: str) -> Optional[dict]:
+        digest = token_digest(token)
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, payload = entry
+            if expires_at <= time.time():
+                del self._entries[digest]
+                self.evictions += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            return payload
+
+    def put(self, token: str, payload: dict) -> None:
+        if self.max_size <= 0:
+            return
+        expires_at = time.time() + self.ttl_seconds
+        if isinstance(payload.get("exp"), (int, float)):
+            expires_at = min(expires_at, payload["exp"])
+
+        digest = token_digest(token)
+        with self._lock:
+            self._entries[digest] = (expires_at, payload)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, token: str) -> None:
+        with self._lock:
+            self._entries.pop(token_digest(token), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+token_payload_cache = TokenPayloadCache(TOKEN_CACHE_MAX_SIZE, TOKEN_CACHE_TTL_SECONDS)
+metrics.register("token_payload_cache", token_payload_cache.stats)
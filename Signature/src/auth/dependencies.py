@@ -1,10 +1,13 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.ext.asyncio import AsyncSession
 from src.auth.utils import decode_token, oauth2_scheme
+from src.auth.cache import token_payload_cache
+from src.auth.revocation import is_token_revoked
+import logging
 
-# Lấy từ router.py
-from src.database import get_db
+logger = logging.getLogger(__name__)
+
+# Các dependency xác thực chỉ làm việc CPU (giải mã JWT), không mở session database
 
 # oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
@@ -34,20 +37,44 @@ from src.database import get_db
     
 #     return user
 
-async def get_current_user_id(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
+async def get_token_payload(token: str = Depends(oauth2_scheme)) -> dict:
+    """
+    Payload của access token đã xác minh
+    - Ưu tiên lấy từ cache (theo sha256 của token, không sống quá exp)
+    - FastAPI cache dependency trong 1 request nên token chỉ được xác minh 1 lần
+    - Token đã thu hồi (đăng xuất) -> 401
+    """
     if not token:
         raise HTTPException(status_code=401, detail="Not authenticated!")
-    
-    try:
+
+    payload = token_payload_cache.get(token)
+    if payload is None:
         payload = decode_token(token)
-        # jti = payload.get("jti")
-        
-        # if jti in token_blacklist:
-        #     raise HTTPException(
-        #         status_code=status.HTTP_401_UNAUTHORIZED,
-        #         detail="Token đã bị thu hồi"
-        #     )
-        
+        token_payload_cache.put(token, payload)
+
+    # Kiểm tra thu hồi mỗi request (không cache): Bloom filter trả lời ngay với token bình thường
+    jti = payload.get("jti")
+    try:
+        revoked = bool(jti) and await is_token_revoked(jti)
+    except Exception as e:
+        # Không xác định được token có bị thu hồi hay không -> không cho qua, nhưng báo lỗi tạm thời
+        logger.error("Kiểm tra token thu hồi thất bại: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Không kiểm tra được trạng thái token, vui lòng thử lại",
+            headers={"Retry-After": "1"}
+        )
+    if revoked:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token đã bị thu hồi",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    return payload
+
+
+async def get_current_user_id(payload: dict = Depends(get_token_payload)):
+    try:
         user_id = payload.get("sub")
         if not user_id:
             raise HTTPException(
@@ -0,0 +1,365 @@
+# Kho token bị thu hồi (jti), tự loại bỏ token khi quá exp
+# - MemoryRevocationStore: trong process, heap sắp theo exp
+# - SQLiteRevocationStore: file SQLite dùng chung giữa các worker trên cùng máy
+# - BloomRevocationStore: Bloom filter đặt trước backend, kiểm tra "chưa bị thu hồi" không chạm backend
+# - Đồng bộ Bloom với backend (purge + jti mới) chạy ở task nền, không nằm trên đường đi của request
+import asyncio
+import hashlib
+import heapq
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from src import metrics
+from src.config import (
+    REVOCATION_BACKEND, REVOCATION_SQLITE_PATH,
+    REVOCATION_BLOOM_CAPACITY, REVOCATION_BLOOM_ERROR_RATE, REVOCATION_SYNC_INTERVAL
+)
+
+logger = logging.getLogger(__name__)
+
+
+class RevocationStore(ABC):
+    """Giao diện chung: jti + exp (epoch giây), hết exp thì token tự hết hiệu lực nên có thể xoá"""
+
+    @abstractmethod
+    def revoke(self, jti: str, exp: float) -> None:
+        ...
+
+    @abstractmethod
+    def is_revoked(self, jti: str) -> bool:
+        ...
+
+    def might_be_revoked(self, jti: str) -> bool:
+        """Kiểm tra nhanh trong bộ nhớ: False = chắc chắn chưa bị thu hồi, True = cần hỏi is_revoked"""
+        return True
+
+    def sync(self) -> None:
+        """Đồng bộ định kỳ với backend (chạy trong thread của task nền)"""
+
+    @abstractmethod
+    def purge_expired(self) -> int:
+        """Xoá các jti đã quá exp, trả về số bản ghi đã xoá"""
+        ...
+
+    @abstractmethod
+    def active_jtis(self) -> List[str]:
+        """Toàn bộ jti còn hiệu lực (dùng để dựng lại Bloom filter)"""
+        ...
+
+    def changes_since(self, cursor: int) -> Tuple[List[str], int]:
+        """jti được thêm (có thể bởi worker khác) kể từ cursor -> (jtis, cursor mới)"""
+        return [], cursor
+
+    def close(self) -> None:
+        pass
+
+    def stats(self) -> dict:
+        return {}
+
+
+class MemoryRevocationStore(RevocationStore):
+    """Dict jti -> exp + min-heap (exp, jti); token quá exp bị loại khi kiểm tra/thêm mới"""
+
+    def __init__(self):
+        self._expiry: Dict[str, float] = {}
+        self._heap: List[Tuple[float, str]] = []
+        self._lock = threading.Lock()
+
+    def revoke(self, jti: str, exp: float) -> None:
+        with self._lock:
+            self._evict_expired(time.time())
+            self._expiry[jti] = exp
+            heapq.heappush(self._heap, (exp, jti))
+
+    def is_revoked(self, jti: str) -> bool:
+        with self._lock:
+            self._evict_expired(time.time())
+            return jti in self._expiry
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            return self._evict_expired(time.time())
+
+    def _evict_expired(self, now: float) -> int:
+        removed = 0
+        while self._heap and self._heap[0][0] <= now:
+            exp, jti = heapq.heappop(self._heap)
+            # Bỏ qua entry cũ nếu jti đã được thu hồi lại với exp khác
+            if self._expiry.get(jti) == exp:
+                del self._expiry[jti]
+                removed += 1
+        return removed
+
+    def active_jtis(self) -> List[str]:
+        with self._lock:
+            return list(self._expiry)
+
+    def stats(self) -> dict:
+        return {"backend": "memory", "size": len(self._expiry)}
+
+
+class SQLiteRevocationStore(RevocationStore):
+    """
+    Bảng revoked_tokens trong file SQLite (WAL) dùng chung giữa các worker
+    - rowid tăng dần dùng làm cursor để worker khác lấy jti mới
+    - Bản ghi quá exp bị xoá khi purge_expired
+    """
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS revoked_tokens ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " jti TEXT NOT NULL UNIQUE,"
+                " exp REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS ix_revoked_tokens_exp ON revoked_tokens (exp)")
+
+    def revoke(self, jti: str, exp: float) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO revoked_tokens (jti, exp) VALUES (?, ?) "
+                "ON CONFLICT(jti) DO UPDATE SET exp = excluded.exp",
+                (jti, exp)
+            )
+
+    def is_revoked(self, jti: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM revoked_tokens WHERE jti = ? AND exp > ?", (jti, time.time())
+            ).fetchone()
+        return row is not None
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            return self._conn.execute("DELETE FROM revoked_tokens WHERE exp <= ?", (time.time(),)).rowcount
+
+    def active_jtis(self) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute("SELECT jti FROM revoked_tokens WHERE exp > ?", (time.time(),)).fetchall()
+        return [row[0] for row in rows]
+
+    def changes_since(self, cursor: int) -> Tuple[List[str], int]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, jti FROM revoked_tokens WHERE id > ? ORDER BY id", (cursor,)
+            ).fetchall()
+        if not rows:
+            return [], cursor
+        return [jti for _, jti in rows], rows[-1][0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM revoked_tokens").fetchone()[0]
+        return {"backend": "sqlite", "size": size}
+
+
+class BloomFilter:
+    """Bloom filter cố định kích thước (không xoá được phần tử, dựng lại khi cần)"""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = max(capacity, 1)
+        self.num_bits = max(8, int(-self.capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / self.capacity * math.log(2)))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str) -> Iterable[int]:
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.num_bits for i in range(self.num_hashes))
+
+    def add(self, item: str) -> None:
+        for pos in self._positions(item):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+class BloomRevocationStore(RevocationStore):
+    """
+    Bloom filter trước backend
+    - Không có trong Bloom -> chắc chắn chưa bị thu hồi, không truy cập backend
+    - Có trong Bloom -> hỏi backend (loại bỏ false positive)
+    - sync() (task nền, mỗi sync_interval giây) lấy jti mới từ backend (do worker khác thu hồi) và
+      xoá bản ghi hết hạn; Bloom được dựng lại khi số phần tử vượt capacity
+    """
+
+    def __init__(self, backend: RevocationStore, capacity: int, error_rate: float, sync_interval: float):
+        self.backend = backend
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.sync_interval = sync_interval
+        self._lock = threading.Lock()
+        self._cursor = 0
+        self.bloom_negatives = 0
+        self.backend_checks = 0
+        self.false_positives = 0
+        self.sync_failures = 0
+        self._rebuild()
+
+    def _rebuild(self) -> None:
+        bloom = BloomFilter(self.capacity, self.error_rate)
+        # Lấy cursor trước rồi mới đọc danh sách -> jti thêm vào giữa 2 bước vẫn được sync lần sau
+        _, cursor = self.backend.changes_since(self._cursor)
+        for jti in self.backend.active_jtis():
+            bloom.add(jti)
+        self._bloom = bloom
+        self._cursor = cursor
+
+    def sync(self) -> None:
+        try:
+            with self._lock:
+                self.backend.purge_expired()
+                if self._bloom.count > self.capacity:
+                    self._rebuild()
+                    return
+                jtis, self._cursor = self.backend.changes_since(self._cursor)
+                for jti in jtis:
+                    self._bloom.add(jti)
+        except Exception:
+            # Backend bận/lỗi (vd. SQLite bị worker khác khoá): giữ Bloom hiện tại, lần sau thử lại
+            self.sync_failures += 1
+            raise
+
+    def revoke(self, jti: str, exp: float) -> None:
+        self.backend.revoke(jti, exp)
+        with self._lock:
+            self._bloom.add(jti)
+
+    def might_be_revoked(self, jti: str) -> bool:
+        if jti not in self._bloom:
+            self.bloom_negatives += 1
+            return False
+        return True
+
+    def is_revoked(self, jti: str) -> bool:
+        if not self.might_be_revoked(jti):
+            return False
+
+        self.backend_checks += 1
+        revoked = self.backend.is_revoked(jti)
+        if not revoked:
+            self.false_positives += 1
+        return revoked
+
+    def purge_expired(self) -> int:
+        return self.backend.purge_expired()
+
+    def active_jtis(self) -> List[str]:
+        return self.backend.active_jtis()
+
+    def close(self) -> None:
+        self.backend.close()
+
+    def stats(self) -> dict:
+        return {
+            **self.backend.stats(),
+            "bloom_items": self._bloom.count,
+            "bloom_capacity": self.capacity,
+            "bloom_negatives": self.bloom_negatives,
+            "backend_checks": self.backend_checks,
+            "false_positives": self.false_positives,
+            "sync_failures": self.sync_failures,
+        }
+
+
+def create_revocation_store() -> RevocationStore:
+    if REVOCATION_BACKEND == "memory":
+        backend = MemoryRevocationStore()
+    elif REVOCATION_BACKEND == "sqlite":
+        backend = SQLiteRevocationStore(REVOCATION_SQLITE_PATH)
+    else:
+        raise ValueError(f"REVOCATION_BACKEND không hợp lệ: {REVOCATION_BACKEND}")
+    return BloomRevocationStore(
+        backend,
+        capacity=REVOCATION_BLOOM_CAPACITY,
+        error_rate=REVOCATION_BLOOM_ERROR_RATE,
+        sync_interval=REVOCATION_SYNC_INTERVAL
+    )
+
+
+_revocation_store: RevocationStore = None
+
+
+def get_revocation_store() -> RevocationStore:
+    global _revocation_store
+    if _revocation_store is None:
+        _revocation_store = create_revocation_store()
+    return _revocation_store
+
+
+def close_revocation_store() -> None:
+    global _revocation_store
+    if _revocation_store is not None:
+        _revocation_store.close()
+        _revocation_store = None
+
+
+async def is_token_revoked(jti: str) -> bool:
+    """
+    Kiểm tra thu hồi trên đường đi của request
+    - Bloom (trong bộ nhớ) trả lời ngay với token bình thường
+    - Bloom dương tính -> hỏi backend trong thread (SQLite có thể chờ khoá của worker khác)
+    - Lỗi backend được raise cho caller quyết định (không nuốt: token có thể đã bị thu hồi)
+    """
+    store = get_revocation_store()
+    if not store.might_be_revoked(jti):
+        return False
+    return await asyncio.to_thread(store.is_revoked, jti)
+
+
+_sync_task: Optional[asyncio.Task] = None
+_sync_stop: Optional[asyncio.Event] = None
+
+
+async def _sync_loop(store: RevocationStore, interval: float, stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        try:
+            await asyncio.to_thread(store.sync)
+        except Exception as e:
+            logger.error("Đồng bộ danh sách token thu hồi thất bại: %s", e)
+        try:
+            await asyncio.wait_for(stop.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+def start_revocation_sync() -> None:
+    """Task nền đồng bộ Bloom với backend mỗi REVOCATION_SYNC_INTERVAL giây (gọi trong lifespan)"""
+    global _sync_task, _sync_stop
+    if _sync_task is None:
+        _sync_stop = asyncio.Event()
+        _sync_task = asyncio.create_task(_sync_loop(get_revocation_store(), REVOCATION_SYNC_INTERVAL, _sync_stop))
+
+
+async def stop_revocation_sync() -> None:
+    """Dừng task nền, chờ lần sync đang chạy xong (không huỷ giữa chừng trước khi đóng backend)"""
+    global _sync_task, _sync_stop
+    if _sync_task is not None:
+        _sync_stop.set()
+        await _sync_task
+        _sync_task = _sync_stop = None
+
+
+metrics.register("token_revocation", lambda: get_revocation_store().stats())
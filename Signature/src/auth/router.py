@@ -8,12 +8,12 @@ from src.auth.service import create_user, authenticate_user, get_current_user
 from src.database import get_db
 from src.auth.utils import oauth2_scheme
 from src.auth.dependencies import get_current_user_id
+from src.auth.revocation import get_revocation_store
+from src.auth.cache import token_payload_cache
+import asyncio
 
 router = APIRouter(tags=["Auth"])
 
-# Danh sách token bị thu hồi (trong production nên dùng Redis)
-token_blacklist = set()
-
 @router.post("/signup", response_model=TokenResponse)
 async def signup(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
     """
@@ -52,14 +52,16 @@ async def login(login_data: UserLogin, db: AsyncSession = Depends(get_db)):
 @router.post("/logout")
 async def logout(token: str = Depends(oauth2_scheme)):
     """
-    Đăng xuất và thêm token vào danh sách đen
+    Đăng xuất: thu hồi token (theo jti) cho tới khi token hết hạn
     """
     try:
         payload = decode_token(token)
         jti = payload.get("jti")  # JWT ID để định danh token
         
         if jti:
-            token_blacklist.add(jti)
+            # Backend SQLite ghi file -> chạy ngoài event loop
+            await asyncio.to_thread(get_revocation_store().revoke, jti, payload["exp"])
+            token_payload_cache.invalidate(token)
 
         return {"message": "Đăng xuất thành công"}
     except HTTPException as e:
@@ -98,21 +100,9 @@ async def logout(token: str = Depends(oauth2_scheme)):
 #     }
     
 
-async def verify_token_not_blacklisted(token: str = Depends(oauth2_scheme)):
-    payload = decode_token(token)
-    jti = payload.get("jti")
-    
-    if jti and jti in token_blacklist:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Token đã bị thu hồi"
-        )
-    return payload
-
 @router.get("/me", response_model=UserResponse)
 async def get_current_user_info(
-    payload: dict = Depends(verify_token_not_blacklisted),
-    user_id: str = Depends(get_current_user_id),
+    user_id: str = Depends(get_current_user_id),  # đã kiểm tra token bị thu hồi
     db: AsyncSession = Depends(get_db)
 ):
     user = await get_current_user(db, user_id)
@@ -3,9 +3,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from src.models import User
 from src.models import Key
-from src.auth.utils import hash_password, verify_password
-from src.key.service import generate_rsa_key_pair
-from src.key.utils import encrypt_private_key, base_public_key
+from src.auth.utils import hash_password_async, verify_password_async
+from src.key.pool import key_pair_pool
 from src.auth.schemas import UserCreate, UserLogin, UserResponse
 from src.key.schemas import KeyCreate
 from dotenv import load_dotenv
@@ -50,27 +49,31 @@ async def create_user(db: AsyncSession, user_data: UserCreate) -> User:
             detail="Email hoặc username đã được sử dụng"
         )
 
+    # Băm mật khẩu ngoài try: quá tải auth pool phải trả 429, không bị đổi thành 500
+    password_hash = await hash_password_async(user_data.password)
+
     try:
         # Create new user
         new_user = User(
             username = user_data.username,
             email = user_data.email,
-            password_hash = hash_password(user_data.password)
+            password_hash = password_hash
         )
         db.add(new_user)
         await db.flush()  # Lấy user_id
 
-        # Sinh cặp khoá
-        private_key, public_key = generate_rsa_key_pair()
-        encrypted_data = encrypt_private_key(private_key, os.getenv('AES_KEY'))
+        # Lấy cặp khoá sinh sẵn từ pool (pool rỗng thì sinh ngay, ngoài event loop)
+        key_pair = await key_pair_pool.acquire()
+        encrypted_data = key_pair.encrypted
 
         # Create new key
         new_key: KeyCreate = Key(
             user_id = new_user.user_id,
-            public_key = base_public_key(public_key),
+            public_key = key_pair.public_key,
             encrypted_private = encrypted_data["encrypted_key"],
-            salt = encrypted_data["salt"],
-            nonce = encrypted_data["nonce"]
+            nonce = encrypted_data["nonce"],
+            wrapped_dek = encrypted_data["wrapped_dek"],
+            kek_version = encrypted_data["kek_version"]
         )
         db.add(new_key)
         await db.commit()
@@ -95,7 +98,7 @@ async def authenticate_user(db: AsyncSession, login_data: UserLogin) -> User:
     )
     user = user.scalar_one_or_none()
     
-    if not user or not verify_password(login_data.password, user.password_hash):
+    if not user or not await verify_password_async(login_data.password, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Email hoặc mật khẩu không đúng",
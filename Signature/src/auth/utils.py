@@ -6,6 +6,7 @@ from fastapi import HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from dotenv import load_dotenv
 from src.auth.schemas import AuthConfig
+from src.executors import run_in_auth_pool
 import uuid
 
 load_dotenv()
@@ -19,6 +20,14 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Xác minh mật khẩu đã băm"""
     return bcrypt.checkpw(plain_password.encode(), hashed_password.encode())
 
+async def hash_password_async(password: str) -> str:
+    """hash_password chạy trong auth thread pool (429 nếu quá tải)"""
+    return await run_in_auth_pool(hash_password, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password chạy trong auth thread pool (429 nếu quá tải)"""
+    return await run_in_auth_pool(verify_password, plain_password, hashed_password)
+
 # JWT Configuration
 auth: AuthConfig = AuthConfig()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
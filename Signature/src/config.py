@@ -1 +1,115 @@
-# Cấu hình global (setting từ .env)
\ No newline at end of file
+# Cấu hình global (setting từ .env)
+import os
+from dotenv import load_dotenv
+
+# load dotenv from .env
+load_dotenv()
+
+
+# Blob store: nơi lưu nội dung file PDF (bảng documents chỉ giữ digest + key)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local")
+STORAGE_LOCAL_ROOT = os.getenv("STORAGE_LOCAL_ROOT", "storage/blobs")
+STORAGE_CHUNK_SIZE = int(os.getenv("STORAGE_CHUNK_SIZE", 64 * 1024))  # kích thước chunk khi stream file
+
+
+# Upload: giới hạn kích thước được kiểm tra ngay khi nhận byte
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", 10 * 1024 * 1024))  # mỗi file PDF
+MAX_REQUEST_BYTES = int(os.getenv("MAX_REQUEST_BYTES", MAX_UPLOAD_BYTES + 1024 * 1024))  # cả body (multipart)
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", 64 * 1024))
+
+# Ký theo lô (/document/sign-batch)
+SIGN_BATCH_MAX_FILES = int(os.getenv("SIGN_BATCH_MAX_FILES", 40))
+MAX_BATCH_REQUEST_BYTES = int(os.getenv("MAX_BATCH_REQUEST_BYTES", 50 * 1024 * 1024))  # cả body của 1 lô
+
+# Job backfill chỉ mục signatures từ manifest trong PDF đã lưu (python -m src.document.backfill)
+SIGNATURE_BACKFILL_BATCH_SIZE = int(os.getenv("SIGNATURE_BACKFILL_BATCH_SIZE", 200))
+SIGNATURE_BACKFILL_CONCURRENCY = int(os.getenv("SIGNATURE_BACKFILL_CONCURRENCY", 8))  # số file đọc song song mỗi lô
+SIGNATURE_BACKFILL_BATCH_PAUSE = float(os.getenv("SIGNATURE_BACKFILL_BATCH_PAUSE", 0.2))  # giây nghỉ giữa các lô
+
+
+# Process pool cho các tác vụ PDF nặng CPU (ký, stamp, lưu file)
+PDF_POOL_SIZE = int(os.getenv("PDF_POOL_SIZE", os.cpu_count() or 2))
+PDF_POOL_QUEUE_DEPTH = int(os.getenv("PDF_POOL_QUEUE_DEPTH", 2 * PDF_POOL_SIZE))  # số việc chờ tối đa
+
+# Thread pool cho tác vụ CPU của auth (bcrypt nhả GIL nên chạy song song được)
+AUTH_POOL_SIZE = int(os.getenv("AUTH_POOL_SIZE", os.cpu_count() or 2))
+AUTH_POOL_QUEUE_DEPTH = int(os.getenv("AUTH_POOL_QUEUE_DEPTH", 4 * AUTH_POOL_SIZE))  # số việc chờ tối đa
+AUTH_QUEUE_TIMEOUT = float(os.getenv("AUTH_QUEUE_TIMEOUT", 2.0))  # giây chờ slot trước khi trả 429
+
+
+# Cache private key đã giải mã (theo key_id)
+KEY_CACHE_MAX_SIZE = int(os.getenv("KEY_CACHE_MAX_SIZE", 1024))
+KEY_CACHE_TTL_SECONDS = float(os.getenv("KEY_CACHE_TTL_SECONDS", 300))
+
+# Cache public key đã load dùng khi xác thực (theo user_id)
+PUBLIC_KEY_CACHE_MAX_SIZE = int(os.getenv("PUBLIC_KEY_CACHE_MAX_SIZE", 4096))
+PUBLIC_KEY_CACHE_TTL_SECONDS = float(os.getenv("PUBLIC_KEY_CACHE_TTL_SECONDS", 600))
+
+# Cache kết quả xác thực theo (sha256 PDF, chữ ký, fingerprint public key)
+VERIFICATION_CACHE_MAX_SIZE = int(os.getenv("VERIFICATION_CACHE_MAX_SIZE", 10000))
+# Số PDF giữ danh sách chữ ký đã parse (bỏ qua PdfReader khi xác thực lại cùng file)
+VERIFICATION_CACHE_MAX_DOCUMENTS = int(os.getenv("VERIFICATION_CACHE_MAX_DOCUMENTS", 2048))
+# Số chữ ký tối đa trong manifest của 1 PDF khi xác thực (manifest do client gửi lên, không tin được)
+VERIFICATION_MAX_SIGNATURES = int(os.getenv("VERIFICATION_MAX_SIGNATURES", 100))
+
+# Chỉ mục không gian (lưới đều) cho stamp trên mỗi trang PDF, đơn vị point
+SPATIAL_GRID_CELL_SIZE = float(os.getenv("SPATIAL_GRID_CELL_SIZE", 64))
+# Số ô tối đa 1 rect được rải vào lưới (rect lớn hơn, ví dụ lấy từ metadata bất thường, được so trực tiếp)
+SPATIAL_GRID_MAX_CELLS = int(os.getenv("SPATIAL_GRID_MAX_CELLS", 1024))
+FREE_SLOT_STEP = float(os.getenv("FREE_SLOT_STEP", 10))  # bước dò vị trí trống quanh vị trí mong muốn
+FREE_SLOT_MAX_CANDIDATES = int(os.getenv("FREE_SLOT_MAX_CANDIDATES", 20000))  # số vị trí dò tối đa mỗi lần
+# Tự đặt vị trí ký (placement "auto"): kích thước 1 ô của occupancy grid và lề trang để trống, đơn vị point
+AUTO_PLACEMENT_RESOLUTION = float(os.getenv("AUTO_PLACEMENT_RESOLUTION", 2))
+AUTO_PLACEMENT_MARGIN = float(os.getenv("AUTO_PLACEMENT_MARGIN", 20))
+# Số ô tối đa của occupancy grid; trang lớn hơn được raster hoá thô hơn (ô to hơn) để giữ trong giới hạn
+AUTO_PLACEMENT_MAX_CELLS = int(os.getenv("AUTO_PLACEMENT_MAX_CELLS", 1_000_000))
+
+# Cache payload JWT đã xác minh (theo hash của token, không sống quá exp)
+TOKEN_CACHE_MAX_SIZE = int(os.getenv("TOKEN_CACHE_MAX_SIZE", 10000))
+TOKEN_CACHE_TTL_SECONDS = float(os.getenv("TOKEN_CACHE_TTL_SECONDS", 300))
+
+# Kho token bị thu hồi (đăng xuất)
+REVOCATION_BACKEND = os.getenv("REVOCATION_BACKEND", "memory")  # memory (1 process) | sqlite (nhiều worker cùng máy)
+REVOCATION_SQLITE_PATH = os.getenv("REVOCATION_SQLITE_PATH", "storage/revocation.db")
+REVOCATION_BLOOM_CAPACITY = int(os.getenv("REVOCATION_BLOOM_CAPACITY", 100_000))
+REVOCATION_BLOOM_ERROR_RATE = float(os.getenv("REVOCATION_BLOOM_ERROR_RATE", 0.001))
+REVOCATION_SYNC_INTERVAL = float(os.getenv("REVOCATION_SYNC_INTERVAL", 1.0))  # giây, đồng bộ Bloom với worker khác
+
+
+# Master key + envelope encryption cho private key
+# - KEK (key-encryption key) được dẫn xuất 1 lần từ AES_KEY khi khởi động
+# - Xoay master key: đặt AES_KEY mới + KEK_VERSION mới, giữ key cũ ở AES_KEY_PREVIOUS/KEK_PREVIOUS_VERSION
+#   rồi chạy job re-wrap (python -m src.key.rewrap)
+AES_KEY = os.getenv("AES_KEY")
+KEK_VERSION = int(os.getenv("KEK_VERSION", 1))
+AES_KEY_PREVIOUS = os.getenv("AES_KEY_PREVIOUS")
+KEK_PREVIOUS_VERSION = int(os.getenv("KEK_PREVIOUS_VERSION", KEK_VERSION - 1))
+KEK_SALT = os.getenv("KEK_SALT", "signature-kek")
+KEY_REWRAP_ON_STARTUP = os.getenv("KEY_REWRAP_ON_STARTUP", "false").lower() == "true"
+KEY_REWRAP_BATCH_SIZE = int(os.getenv("KEY_REWRAP_BATCH_SIZE", 100))
+KEY_REWRAP_BATCH_PAUSE = float(os.getenv("KEY_REWRAP_BATCH_PAUSE", 0.5))  # giây nghỉ giữa các lô
+
+
+# Pool cặp khoá RSA sinh sẵn (đã mã hoá) cho đăng ký
+KEYPAIR_POOL_SIZE = int(os.getenv("KEYPAIR_POOL_SIZE", 16))  # 0 = tắt, luôn sinh trực tiếp
+KEYPAIR_POOL_REFILL_INTERVAL = float(os.getenv("KEYPAIR_POOL_REFILL_INTERVAL", 0.05))  # giây nghỉ giữa 2 lần sinh
+
+
+# Connection pool của database (cấu hình theo từng worker)
+DB_POOL_CLASS = os.getenv("DB_POOL_CLASS", "queue").lower()  # queue | null (null = mở kết nối mới mỗi lần)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))  # giây chờ lấy kết nối
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))  # giây, -1 = không recycle
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", 100))  # 0 khi đi qua pgbouncer (transaction mode)
+DB_ECHO = os.getenv("DB_ECHO", "false").lower() == "true"
+
+
+# Ghi activity log theo lô (hàng đợi trong bộ nhớ + task nền)
+ACTIVITY_LOG_BATCH_SIZE = int(os.getenv("ACTIVITY_LOG_BATCH_SIZE", 500))  # số dòng tối đa mỗi câu INSERT
+ACTIVITY_LOG_FLUSH_INTERVAL_MS = int(os.getenv("ACTIVITY_LOG_FLUSH_INTERVAL_MS", 500))
+ACTIVITY_LOG_QUEUE_SIZE = int(os.getenv("ACTIVITY_LOG_QUEUE_SIZE", 10000))  # đầy thì bỏ event mới
+
+# GET /metrics: chỉ bật khi có token, gọi kèm header "Authorization: Bearer <METRICS_TOKEN>"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
@@ -1,8 +1,20 @@
 # Kết nối database (AsyncSession)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from sqlalchemy.pool import NullPool
+from sqlalchemy.pool import NullPool, AsyncAdaptedQueuePool
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from dotenv import load_dotenv
+from src import metrics
+from src.config import (
+    DB_POOL_CLASS, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT,
+    DB_POOL_PRE_PING, DB_POOL_RECYCLE, DB_STATEMENT_CACHE_SIZE, DB_ECHO
+)
 import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional
 
 # load dotenv from .env
 load_dotenv()
@@ -13,17 +25,125 @@ DB_URL = os.getenv("DB_URL")
 if not DB_URL:
     raise ValueError("DB_URL không tồn tại trong file .env")
 
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """QueuePool ghi lại thời gian chờ lấy kết nối (checkout) để theo dõi độ bão hoà"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.checkout_timeouts = 0
+        self.checkout_seconds = 0.0
+        self.max_checkout_seconds = 0.0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            self.checkout_timeouts += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            self.checkouts += 1
+            self.checkout_seconds += elapsed
+            self.max_checkout_seconds = max(self.max_checkout_seconds, elapsed)
+
+
+def _pool_options() -> dict:
+    if DB_POOL_CLASS == "null":
+        return {"poolclass": NullPool}
+    if DB_POOL_CLASS != "queue":
+        raise ValueError(f"DB_POOL_CLASS không hợp lệ: {DB_POOL_CLASS}")
+    return {
+        "poolclass": TimedQueuePool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+        "pool_recycle": DB_POOL_RECYCLE,
+    }
+
+
 # Async engine 
 # Connect to database
 engine = create_async_engine(
     DB_URL, 
-    echo=True,
-    poolclass=NullPool,
+    echo=DB_ECHO,
     connect_args= {
-        "ssl": os.getenv("DB_SSL", "false").lower() == "true"  # Support SSL
-    }
+        "ssl": os.getenv("DB_SSL", "false").lower() == "true",  # Support SSL
+        "statement_cache_size": DB_STATEMENT_CACHE_SIZE,  # cache prepared statement của asyncpg
+        "prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE,  # cache phía SQLAlchemy
+    },
+    **_pool_options()
 ) # engine manage pool connection and execute queries async
 
+
+def pool_stats() -> dict:
+    """Số liệu connection pool: kết nối đang dùng, độ bão hoà, thời gian chờ checkout"""
+    pool = engine.pool
+    if not isinstance(pool, TimedQueuePool):
+        return {"pool_class": type(pool).__name__}
+
+    capacity = pool.size() + max(pool._max_overflow, 0)
+    return {
+        "pool_class": type(pool).__name__,
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "idle": pool.checkedin(),
+        "overflow": pool.overflow(),
+        "saturation": round(pool.checkedout() / capacity, 3) if capacity else 0.0,
+        "checkouts": pool.checkouts,
+        "checkout_timeouts": pool.checkout_timeouts,
+        "avg_checkout_ms": round(pool.checkout_seconds / pool.checkouts * 1000, 3) if pool.checkouts else 0.0,
+        "max_checkout_ms": round(pool.max_checkout_seconds * 1000, 3),
+    }
+
+
+metrics.register("db_pool", pool_stats)
+
+# Đếm round trip tới database theo từng thao tác (BEGIN/COMMIT/ROLLBACK + mỗi câu lệnh)
+_round_trip_counter: ContextVar[Optional[List[int]]] = ContextVar("db_round_trips", default=None)
+_round_trip_stats: Dict[str, dict] = {}
+
+
+def _count_round_trip(*args, **kwargs) -> None:
+    counter = _round_trip_counter.get()
+    if counter is not None:
+        counter[0] += 1
+
+
+for _event_name in ("begin", "commit", "rollback", "before_cursor_execute"):
+    event.listen(Engine, _event_name, _count_round_trip)
+
+
+@contextmanager
+def track_round_trips(operation: str) -> Iterator[List[int]]:
+    """
+    Đếm số round trip database trong khối lệnh, cộng dồn vào metrics theo tên thao tác
+    - counter[0] là số round trip hiện tại
+    """
+    counter = [0]
+    token = _round_trip_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _round_trip_counter.reset(token)
+        stats = _round_trip_stats.setdefault(operation, {"calls": 0, "total": 0, "max": 0})
+        stats["calls"] += 1
+        stats["total"] += counter[0]
+        stats["max"] = max(stats["max"], counter[0])
+
+
+def round_trip_stats() -> dict:
+    return {
+        operation: {**stats, "avg": round(stats["total"] / stats["calls"], 2)}
+        for operation, stats in _round_trip_stats.items()
+    }
+
+
+metrics.register("db_round_trips", round_trip_stats)
+
 # Async session factory
 # Factory make session async
 AsyncSessionLocal = async_sessionmaker(
@@ -34,6 +154,8 @@ AsyncSessionLocal = async_sessionmaker(
 ) 
 
 # Dependency for FastAPI
+# AsyncSession chỉ lấy connection từ pool ở câu lệnh đầu tiên và trả lại khi đóng,
+# nên request không truy vấn database (hoặc bị từ chối ở bước xác thực) không chiếm connection
 async def get_db():
     async with AsyncSessionLocal() as session:
         try:
@@ -0,0 +1,183 @@
+# Job backfill chỉ mục signatures (trang, vùng stamp, content_hash...) từ manifest trong các PDF đã lưu
+# Chạy tay: python -m src.document.backfill [--all] [--batch-size 200] [--concurrency 8]
+import argparse
+import asyncio
+import logging
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select, insert, update, func, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import SIGNATURE_BACKFILL_BATCH_SIZE, SIGNATURE_BACKFILL_CONCURRENCY, SIGNATURE_BACKFILL_BATCH_PAUSE
+from src.database import AsyncSessionLocal
+from src.document.pdfmeta import read_signature_manifest
+from src.document.service import signature_index_values
+from src.models import Document, Signature, User
+from src.storage import get_blob_store
+
+logger = logging.getLogger(__name__)
+
+
+def _needs_backfill():
+    """
+    Document chưa được job đọc lần nào (signatures_indexed_at NULL)
+    - Gồm document cũ chưa có chỉ mục và file ký sẵn được upload (chưa có dòng signatures)
+    - Document đã đọc thì không quét lại, kể cả khi không có chữ ký hoặc còn dòng page NULL
+      (chữ ký đã tách khỏi file, xem _detach_stale_index)
+    """
+    return Document.signatures_indexed_at.is_(None)
+
+
+def _user_id(value) -> Optional[str]:
+    try:
+        return str(uuid.UUID(str(value)))
+    except ValueError:
+        return None
+
+
+def _signed_at(sig: Dict) -> Optional[datetime]:
+    try:
+        return datetime.fromisoformat(str(sig.get("sign_date")))
+    except ValueError:
+        return None
+
+
+async def _read_entries(storage_key: str, slots: asyncio.Semaphore) -> List[Dict]:
+    """Các mục manifest (v2 + v3) của 1 file trong blob store"""
+    async with slots:
+        data = await get_blob_store().get(storage_key)
+    # Thường chỉ đọc trailer/Info (pdfmeta); file hỏng rơi về pypdf nên chạy ngoài event loop
+    manifest = await asyncio.to_thread(read_signature_manifest, data)
+    return manifest.signatures
+
+
+async def _apply_batch(db: AsyncSession, manifests: Dict[int, List[Dict]]) -> Tuple[int, int]:
+    """
+    Ghi chỉ mục cho 1 lô document, trả về (số dòng cập nhật, số dòng thêm mới)
+    - Dòng signatures đã có: ghép theo giá trị chữ ký, cập nhật các cột chỉ mục (1 UPDATE theo khoá chính)
+    - Mục trong manifest chưa có dòng: thêm dòng mới nếu signer_id là user của hệ thống (key_id để NULL)
+    """
+    rows = (await db.execute(
+        select(Signature.signature_id, Signature.document_id, Signature.signature, Signature.page)
+        .where(Signature.document_id.in_(list(manifests)))
+    )).all()
+    known = {(row.document_id, row.signature): row for row in rows}
+
+    signer_ids = {_user_id(sig.get("signer_id")) for entries in manifests.values() for sig in entries} - {None}
+    users = set()
+    if signer_ids:
+        users = {
+            str(user_id) for user_id in
+            (await db.execute(select(User.user_id).where(User.user_id.in_(list(signer_ids))))).scalars()
+        }
+
+    updates, inserts = [], []
+    seen = set()
+    for document_id, entries in manifests.items():
+        for sig in entries:
+            if not sig.get("signature") or (document_id, sig["signature"]) in seen:
+                continue
+            seen.add((document_id, sig["signature"]))
+
+            row = known.get((document_id, sig["signature"]))
+            if row is not None:
+                if row.page is None:
+                    updates.append({"signature_id": row.signature_id, **signature_index_values(sig)})
+            elif _user_id(sig.get("signer_id")) in users:
+                inserts.append({
+                    "document_id": document_id,
+                    "user_id": _user_id(sig["signer_id"]),
+                    "signature": sig["signature"],
+                    "signed_at": _signed_at(sig) or datetime.now(),
+                    **signature_index_values(sig),
+                })
+
+    if updates:
+        await db.execute(update(Signature), updates)
+    if inserts:
+        await db.execute(insert(Signature), inserts)
+    return len(updates), len(inserts)
+
+
+async def backfill_signature_index(
+    batch_size: int = SIGNATURE_BACKFILL_BATCH_SIZE,
+    concurrency: int = SIGNATURE_BACKFILL_CONCURRENCY,
+    batch_pause: float = SIGNATURE_BACKFILL_BATCH_PAUSE,
+    rescan_all: bool = False
+) -> dict:
+    """
+    Điền chỉ mục signatures cho các document đã lưu, theo từng lô document_id tăng dần
+    - Mỗi lô: 1 truy vấn lấy document, đọc file song song (tối đa `concurrency` file), ghi trong 1 transaction
+    - Không giữ transaction trong lúc đọc file; chạy lại nhiều lần cho cùng kết quả (dòng đã có chỉ mục được bỏ qua)
+    - Document đọc xong được đánh dấu signatures_indexed_at, lần chạy sau (mặc định) bỏ qua
+    - File lỗi được ghi log và bỏ qua (không đánh dấu, lần sau thử lại), job luôn tiến tới cuối bảng
+    """
+    slots = asyncio.Semaphore(max(concurrency, 1))
+    last_document_id = 0
+    stats = {"documents": 0, "updated": 0, "inserted": 0, "failed": 0}
+
+    while True:
+        condition = Document.document_id > last_document_id
+        if not rescan_all:
+            condition = and_(condition, _needs_backfill())
+
+        async with AsyncSessionLocal() as db:
+            async with db.begin():
+                documents = (await db.execute(
+                    select(Document.document_id, Document.storage_key)
+                    .where(condition & Document.storage_key.isnot(None))
+                    .order_by(Document.document_id)
+                    .limit(batch_size)
+                )).all()
+        if not documents:
+            break
+        last_document_id = documents[-1].document_id
+
+        results = await asyncio.gather(
+            *(_read_entries(document.storage_key, slots) for document in documents),
+            return_exceptions=True
+        )
+        manifests, scanned = {}, []
+        for document, result in zip(documents, results):
+            if isinstance(result, Exception):
+                logger.error("Đọc manifest document %s thất bại: %s", document.document_id, result)
+                stats["failed"] += 1
+                continue
+            scanned.append(document.document_id)
+            if result:
+                manifests[document.document_id] = result
+        stats["documents"] += len(documents)
+
+        if scanned:
+            async with AsyncSessionLocal() as db:
+                async with db.begin():
+                    if manifests:
+                        updated, inserted = await _apply_batch(db, manifests)
+                        stats["updated"] += updated
+                        stats["inserted"] += inserted
+                    await db.execute(
+                        update(Document)
+                        .where(Document.document_id.in_(scanned))
+                        .values(signatures_indexed_at=func.now())
+                    )
+
+        logger.info("Backfill tới document %s: %s", last_document_id, stats)
+        if len(documents) < batch_size:
+            break
+        await asyncio.sleep(batch_pause)
+
+    logger.info("Backfill xong: %s", stats)
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill chỉ mục signatures từ manifest trong PDF đã lưu")
+    parser.add_argument("--all", action="store_true", help="Quét mọi document (mặc định chỉ document chưa được quét)")
+    parser.add_argument("--batch-size", type=int, default=SIGNATURE_BACKFILL_BATCH_SIZE)
+    parser.add_argument("--concurrency", type=int, default=SIGNATURE_BACKFILL_CONCURRENCY)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    print(asyncio.run(backfill_signature_index(args.batch_size, args.concurrency, rescan_all=args.all)))
@@ -0,0 +1,109 @@
+# Cache kết quả xác thực chữ ký (tránh parse PDF + SHA-256 + RSA verify khi xác thực lại file không đổi)
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from src import metrics
+from src.config import VERIFICATION_CACHE_MAX_SIZE, VERIFICATION_CACHE_MAX_DOCUMENTS
+from src.key.cache import PublicKeyEntry
+
+
+class VerificationCache:
+    """
+    Cache LRU kết quả xác thực, key = (sha256 PDF, giá trị chữ ký, fingerprint public key)
+    - Cùng bytes + cùng chữ ký + cùng khoá thì kết quả RSA/hash luôn như nhau nên không cần TTL
+    - Mỗi entry nhớ revoked_at của khoá lúc xác thực: revoked_at khác đi -> entry bị bỏ (invalidation)
+    - Kết quả cache giữ nguyên verified_at của lần xác thực thật, kèm cached=True
+    - Ngoài ra giữ danh sách chữ ký đã parse (không có signed_content) theo sha256 PDF
+    """
+
+    def __init__(self, max_size: int, max_documents: int):
+        self.max_size = max_size
+        self.max_documents = max_documents
+        self._results: "OrderedDict[Tuple[str, str, str], Tuple[Optional[datetime], Dict]]" = OrderedDict()
+        self._documents: "OrderedDict[str, List[Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+        self.document_hits = 0
+        self.document_misses = 0
+
+    def get_entries(self, pdf_sha256: str) -> Optional[List[Dict]]:
+        """Danh sách chữ ký đã parse của PDF, None nếu chưa có"""
+        with self._lock:
+            entries = self._documents.get(pdf_sha256)
+            if entries is None:
+                self.document_misses += 1
+                return None
+            self._documents.move_to_end(pdf_sha256)
+            self.document_hits += 1
+            return entries
+
+    def put_entries(self, pdf_sha256: str, entries: List[Dict]) -> None:
+        if self.max_documents <= 0:
+            return
+        with self._lock:
+            self._documents[pdf_sha256] = entries
+            self._documents.move_to_end(pdf_sha256)
+            while len(self._documents) > self.max_documents:
+                self._documents.popitem(last=False)
+
+    def get(self, pdf_sha256: str, signature: str, key: PublicKeyEntry) -> Optional[Dict]:
+        cache_key = (pdf_sha256, signature, key.fingerprint)
+        with self._lock:
+            entry = self._results.get(cache_key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            revoked_at, report = entry
+            if revoked_at != key.revoked_at:
+                del self._results[cache_key]
+                self.invalidations += 1
+                self.misses += 1
+                return None
+
+            self._results.move_to_end(cache_key)
+            self.hits += 1
+            return {**report, "cached": True}
+
+    def put(self, pdf_sha256: str, signature: str, key: PublicKeyEntry, report: Dict) -> None:
+        if self.max_size <= 0:
+            return
+        cache_key = (pdf_sha256, signature, key.fingerprint)
+        with self._lock:
+            self._results[cache_key] = (key.revoked_at, report)
+            self._results.move_to_end(cache_key)
+            while len(self._results) > self.max_size:
+                self._results.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._results.clear()
+            self._documents.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        document_total = self.document_hits + self.document_misses
+        return {
+            "size": len(self._results),
+            "max_size": self.max_size,
+            "documents": len(self._documents),
+            "max_documents": self.max_documents,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "document_hits": self.document_hits,
+            "document_misses": self.document_misses,
+            "document_hit_rate": round(self.document_hits / document_total, 4) if document_total else 0.0,
+        }
+
+
+verification_cache = VerificationCache(VERIFICATION_CACHE_MAX_SIZE, VERIFICATION_CACHE_MAX_DOCUMENTS)
+metrics.register("verification_cache", verification_cache.stats)
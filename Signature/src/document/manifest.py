@@ -0,0 +1,154 @@
+# Định dạng metadata chữ ký trong Info dictionary của PDF
+# - v2 (cũ): /SignaturesInfo = JSON list, mỗi mục chứa nguyên văn signed_content
+# - v3: /SignatureManifest = JSON {"version": 3, "signatures": [...]}, mỗi mục chỉ giữ digest.
+#   Nội dung đã ký được dựng lại từ revision trước khi ký (file[:rev]): các text block
+#   của trang không giao với vùng loại trừ (stamp của chính nó + các stamp ký trước trên trang)
+import json
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from src.document.spatial import PageGrid, Rect
+
+MANIFEST_VERSION = 3
+MANIFEST_KEY = "SignatureManifest"
+LEGACY_KEY = "SignaturesInfo"
+SIGNATURE_ALGORITHM = "RSA-PSS-SHA1"
+EXCLUSION_PADDING = 5
+# Kích thước cố định của stamp, (x, y) người dùng chọn được dịch thành góc trên trái của stamp
+STAMP_WIDTH, STAMP_HEIGHT = 180, 50
+STAMP_OFFSET_X, STAMP_OFFSET_Y = 48, 200
+
+
+def _load_list(raw: Optional[str]) -> List[Dict]:
+    if not raw:
+        return []
+    try:
+        value = json.loads(raw)
+    except (json.JSONDecodeError, TypeError):
+        return []
+    if isinstance(value, dict):
+        value = value.get("signatures")
+    if not isinstance(value, list):
+        return []
+    return [sig for sig in value if isinstance(sig, dict)]
+
+
+def stamp_rect(sig: Dict) -> Optional[Rect]:
+    """Vùng stamp (x0, y0, x1, y1) của 1 mục, None nếu thiếu/sai toạ độ"""
+    try:
+        x, y = float(sig["x"]), float(sig["y"])
+        return (x, y, x + float(sig["width"]), y + float(sig["height"]))
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def position_rect(position_x: float, position_y: float) -> Rect:
+    """Vùng stamp tương ứng với vị trí ký (x, y) gửi lên"""
+    x, y = position_x - STAMP_OFFSET_X, position_y - STAMP_OFFSET_Y
+    return (x, y, x + STAMP_WIDTH, y + STAMP_HEIGHT)
+
+
+def rect_position(rect: Rect) -> tuple:
+    """Ngược của position_rect: vị trí ký (x, y) để gửi lên cho vùng stamp `rect`"""
+    return rect[0] + STAMP_OFFSET_X, rect[1] + STAMP_OFFSET_Y
+
+
+def pad_rect(rect: Rect, padding: float = EXCLUSION_PADDING) -> Rect:
+    return (rect[0] - padding, rect[1] - padding, rect[2] + padding, rect[3] + padding)
+
+
+def is_v3(sig: Dict) -> bool:
+    return sig.get("version") == MANIFEST_VERSION
+
+
+class SignatureManifest:
+    """
+    Danh sách chữ ký của 1 PDF theo thứ tự ký: mục v2 (legacy) trước, mục v3 sau
+    - Có chỉ mục theo signer_id và theo trang (index trong signatures)
+    - Vùng stamp của mỗi trang nằm trong 1 PageGrid: kiểm tra chồng chéo / tìm chỗ trống không duyệt hết stamp
+    - Khi ghi lại chỉ /SignatureManifest thay đổi, /SignaturesInfo cũ giữ nguyên
+    """
+
+    def __init__(self, legacy: Optional[List[Dict]] = None, entries: Optional[List[Dict]] = None):
+        self.legacy = legacy or []
+        self.entries = entries or []
+        self._by_signer: Dict[str, List[int]] = defaultdict(list)
+        self._by_page: Dict[int, List[int]] = defaultdict(list)
+        self._grids: Dict[int, PageGrid] = {}
+        for index, sig in enumerate(self.signatures):
+            self._index(index, sig)
+
+    @classmethod
+    def from_raw(cls, signatures_info: Optional[str], manifest: Optional[str]) -> "SignatureManifest":
+        """Đọc từ giá trị string của /SignaturesInfo và /SignatureManifest (có thể None)"""
+        entries = [sig for sig in _load_list(manifest) if is_v3(sig)]
+        return cls(_load_list(signatures_info), entries)
+
+    @classmethod
+    def from_signatures(cls, signatures: List[Dict]) -> "SignatureManifest":
+        """Dựng lại từ danh sách signatures (ví dụ bản đã cache)"""
+        return cls([sig for sig in signatures if not is_v3(sig)], [sig for sig in signatures if is_v3(sig)])
+
+    @property
+    def signatures(self) -> List[Dict]:
+        return self.legacy + self.entries
+
+    def _index(self, index: int, sig: Dict) -> None:
+        if sig.get("signer_id") is not None:
+            self._by_signer[str(sig["signer_id"])].append(index)
+        try:
+            page = int(sig.get("page", 1))
+        except (TypeError, ValueError):
+            return
+        self._by_page[page].append(index)
+        rect = stamp_rect(sig)
+        if rect is not None:
+            self._grids.setdefault(page, PageGrid()).insert(rect, index)
+
+    def by_signer(self, signer_id: str) -> List[int]:
+        return self._by_signer.get(str(signer_id), [])
+
+    def on_page(self, page: int) -> List[int]:
+        return self._by_page.get(int(page), [])
+
+    def has_signer(self, signer_id: str) -> bool:
+        return bool(self.by_signer(signer_id))
+
+    def grid(self, page: int) -> PageGrid:
+        """Lưới stamp của trang (rỗng nếu trang chưa có chữ ký)"""
+        return self._grids.get(int(page)) or PageGrid()
+
+    def page_rects(self, page: int, upto: Optional[int] = None) -> List[Rect]:
+        """Vùng stamp các chữ ký trên trang (chỉ các chữ ký có index < upto nếu truyền upto)"""
+        grid = self.grid(page)
+        return [rect for rect, index in zip(grid.rects, grid.items) if upto is None or index < upto]
+
+    def overlaps(self, page: int, rect: Rect) -> bool:
+        return self.grid(page).intersects(rect)
+
+    def free_slot(self, page: int, rect: Rect, bounds: Rect) -> Optional[Rect]:
+        """Vùng stamp trống gần `rect` nhất trong `bounds`, cách các stamp hiện có EXCLUSION_PADDING"""
+        return self.grid(page).nearest_free(rect, bounds, gap=EXCLUSION_PADDING)
+
+    def exclusion_rects(self, page: int, rect: Rect, upto: Optional[int] = None) -> List[Rect]:
+        """
+        Vùng loại trừ khi dựng nội dung ký cho stamp `rect` trên `page`:
+        chính stamp + các stamp ký trước (index < upto), nới thêm EXCLUSION_PADDING
+        """
+        return [pad_rect(rect)] + [pad_rect(other) for other in self.page_rects(page, upto)]
+
+    def append(self, entry: Dict) -> int:
+        """Thêm mục v3, trả về index trong signatures"""
+        entry = {**entry, "version": MANIFEST_VERSION}
+        self.entries.append(entry)
+        index = len(self.legacy) + len(self.entries) - 1
+        self._index(index, entry)
+        return index
+
+    def manifest_json(self) -> str:
+        """Giá trị ghi vào /SignatureManifest"""
+        return json.dumps(
+            {"version": MANIFEST_VERSION, "signatures": self.entries},
+            ensure_ascii=False,
+            separators=(",", ":")
+        )
@@ -0,0 +1,693 @@
+# Đọc nhanh Info dictionary của PDF mà không parse toàn bộ tài liệu
+# startxref -> bảng xref (dạng bảng hoặc xref stream, theo chuỗi /Prev của các lần lưu incremental)
+# -> chỉ resolve object /Info (kể cả khi nằm trong object stream). Không đọc page tree.
+# Làm việc trực tiếp trên bytes / memoryview / mmap: chỉ những đoạn cần thiết được đọc.
+import io
+import mmap
+import re
+import zlib
+from contextlib import contextmanager
+from typing import BinaryIO, Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+from pypdf import PdfReader
+
+from src.document.manifest import SignatureManifest, MANIFEST_KEY, LEGACY_KEY
+
+Buffer = Union[bytes, bytearray, memoryview, mmap.mmap]
+
+WHITESPACE = b" \t\r\n\x0c\x00"
+DELIMITERS = b"()<>[]{}/%"
+TAIL_SIZE = 2048
+MAX_XREF_SECTIONS = 1024
+MAX_STREAM_SIZE = 32 * 1024 * 1024  # giới hạn dữ liệu sau giải nén của 1 stream (chống zip bomb)
+XREF_ENTRY_SIZE = 20
+
+_NUMBER = re.compile(rb"[+-]?(?:\d+\.?\d*|\.\d+)")
+_STRING_SPECIAL = re.compile(rb"[()\\]")
+_OBJ_HEADER = re.compile(rb"\s*(\d+)\s+(\d+)\s+obj\b")
+_XREF_SUBSECTION = re.compile(rb"\s*(\d+)\s+(\d+)\s*[\r\n]")
+_XREF_ENTRY = re.compile(rb"\s*(\d{1,10})\s+(\d{1,5})\s+([nf])")
+_XREF_ENTRY_FIXED = re.compile(rb"(\d{10}) (\d{5}) ([nf])[ \r\n]{2}")
+_XREF_NEXT = re.compile(rb"\s*(?:\d|trailer)")
+_ESCAPES = {
+    ord("n"): b"\n", ord("r"): b"\r", ord("t"): b"\t", ord("b"): b"\b",
+    ord("f"): b"\f", ord("("): b"(", ord(")"): b")", ord("\\"): b"\\",
+}
+
+
+class PdfMetadataError(ValueError):
+    """Không đọc được metadata bằng đường nhanh (file hỏng, mã hoá, filter không hỗ trợ...)"""
+
+
+class Name(str):
+    """Tên PDF (/Name), lưu không có dấu /"""
+
+
+class Ref(NamedTuple):
+    num: int
+    gen: int
+
+
+class _Parser:
+    """Parser object PDF tối thiểu, bắt đầu từ vị trí pos trong buffer"""
+
+    def __init__(self, data: Buffer, pos: int = 0):
+        self.data = data
+        self.pos = pos
+
+    def skip_whitespace(self) -> None:
+        data, pos, size = self.data, self.pos, len(self.data)
+        while pos < size:
+            char = data[pos]
+            if char in WHITESPACE:
+                pos += 1
+            elif char == 0x25:  # % comment tới hết dòng
+                while pos < size and data[pos] not in b"\r\n":
+                    pos += 1
+            else:
+                break
+        self.pos = pos
+
+    def expect(self, keyword: bytes) -> None:
+        self.skip_whitespace()
+        if self.data[self.pos:self.pos + len(keyword)] != keyword:
+            raise PdfMetadataError(f"Thiếu {keyword!r} tại byte {self.pos}")
+        self.pos += len(keyword)
+
+    def parse(self):
+        self.skip_whitespace()
+        data, pos = self.data, self.pos
+        if pos >= len(data):
+            raise PdfMetadataError("Hết dữ liệu khi đọc object")
+
+        char = data[pos]
+        if char == 0x2F:  # /
+            return self._parse_name()
+        if char == 0x28:  # (
+            return self._parse_literal_string()
+        if char == 0x3C:  # <
+            if data[pos + 1:pos + 2] == b"<":
+                return self._parse_dict()
+            return self._parse_hex_string()
+        if char == 0x5B:  # [
+            self.pos += 1
+            items = []
+            while True:
+                self.skip_whitespace()
+                if self.data[self.pos:self.pos + 1] == b"]":
+                    self.pos += 1
+                    return items
+                items.append(self.parse())
+
+        match = _NUMBER.match(data, pos)
+        if match:
+            return self._parse_number_or_ref(match.group(0))
+
+        token = self._read_token()
+        if token == b"true":
+            return True
+        if token == b"false":
+            return False
+        if token == b"null":
+            return None
+        raise PdfMetadataError(f"Token không hợp lệ {token[:20]!r} tại byte {pos}")
+
+    def _read_token(self) -> bytes:
+        data, start = self.data, self.pos
+        end = start
+        size = len(data)
+        while end < size and data[end] not in WHITESPACE and data[end] not in DELIMITERS:
+            end += 1
+        self.pos = end
+        return bytes(data[start:end])
+
+    def _parse_name(self) -> Name:
+        self.pos += 1
+        raw = self._read_token()
+        if b"#" in raw:
+            raw = re.sub(rb"#([0-9A-Fa-f]{2})", lambda m: bytes([int(m.group(1), 16)]), raw)
+        return Name(raw.decode("latin-1"))
+
+    def _parse_number_or_ref(self, token: bytes):
+        self.pos += len(token)
+        if b"." in token:
+            return float(token)
+        value = int(token)
+
+        # "num gen R" -> tham chiếu gián tiếp
+        saved = self.pos
+        self.skip_whitespace()
+        gen_match = re.match(rb"\d+", bytes(self.data[self.pos:self.pos + 12]))
+        if gen_match:
+            self.pos += len(gen_match.group(0))
+            self.skip_whitespace()
+            if self.data[self.pos:self.pos + 1] == b"R":
+                after = self.data[self.pos + 1:self.pos + 2]
+                if not after or after[0] in WHITESPACE or after[0] in DELIMITERS:
+                    self.pos += 1
+                    return Ref(value, int(gen_match.group(0)))
+        self.pos = saved
+        return value
+
+    def _parse_dict(self) -> Dict[str, object]:
+        self.pos += 2
+        result = {}
+        while True:
+            self.skip_whitespace()
+            if self.data[self.pos:self.pos + 2] == b">>":
+                self.pos += 2
+                return result
+            key = self.parse()
+            if not isinstance(key, Name):
+                raise PdfMetadataError(f"Key của dictionary phải là name (byte {self.pos})")
+            result[str(key)] = self.parse()
+
+    def _parse_hex_string(self) -> bytes:
+        end = self._find(b">", self.pos + 1)
+        raw = bytes(self.data[self.pos + 1:end])
+        self.pos = end + 1
+        digits = re.sub(rb"\s+", b"", raw)
+        if len(digits) % 2:
+            digits += b"0"
+        try:
+            return bytes.fromhex(digits.decode("ascii"))
+        except ValueError as e:
+            raise PdfMetadataError("Hex string không hợp lệ") from e
+
+    def _find(self, needle: bytes, start: int) -> int:
+        index = find(self.data, needle, start)
+        if index < 0:
+            raise PdfMetadataError(f"Không tìm thấy {needle!r}")
+        return index
+
+    def _parse_literal_string(self) -> bytes:
+        data = self.data
+        pos = self.pos + 1
+        depth = 1
+        out = bytearray()
+        size = len(data)
+        while True:
+            # Chép nguyên các đoạn không có ký tự đặc biệt
+            match = _STRING_SPECIAL.search(data, pos)
+            if match is None:
+                raise PdfMetadataError("String không đóng ngoặc")
+            special = match.start()
+            out += data[pos:special]
+            char = data[special]
+            pos = special + 1
+
+            if char == 0x28:  # (
+                depth += 1
+                out.append(char)
+            elif char == 0x29:  # )
+                depth -= 1
+                if depth == 0:
+                    self.pos = pos
+                    return bytes(out)
+                out.append(char)
+            else:  # \
+                if pos >= size:
+                    raise PdfMetadataError("String kết thúc sau dấu \\")
+                escaped = data[pos]
+                if escaped in _ESCAPES:
+                    out += _ESCAPES[escaped]
+                    pos += 1
+                elif 0x30 <= escaped <= 0x37:  # \ddd
+                    end = pos
+                    while end < size and end - pos < 3 and 0x30 <= data[end] <= 0x37:
+                        end += 1
+                    out.append(int(bytes(data[pos:end]), 8) & 0xFF)
+                    pos = end
+                elif escaped == 0x0D:  # xuống dòng sau \ -> bỏ qua
+                    pos += 2 if data[pos + 1:pos + 2] == b"\n" else 1
+                elif escaped == 0x0A:
+                    pos += 1
+                else:
+                    out.append(escaped)
+                    pos += 1
+
+
+def find(data: Buffer, needle: bytes, start: int = 0) -> int:
+    """bytes.find cho mọi loại buffer (memoryview không có find)"""
+    match = re.compile(re.escape(needle)).search(data, start)
+    return match.start() if match else -1
+
+
+def decode_text_string(raw: bytes) -> str:
+    """PDF text string -> str (UTF-16 có BOM, UTF-8 có BOM, còn lại coi như PDFDocEncoding/latin-1)"""
+    if raw.startswith(b"\xfe\xff"):
+        return raw[2:].decode("utf-16-be", errors="replace")
+    if raw.startswith(b"\xff\xfe"):
+        return raw[2:].decode("utf-16-le", errors="replace")
+    if raw.startswith(b"\xef\xbb\xbf"):
+        return raw[3:].decode("utf-8", errors="replace")
+    return raw.decode("latin-1")
+
+
+def _png_unpredict(data: bytes, columns: int) -> bytes:
+    """Bỏ PNG predictor (Predictor >= 10) của xref stream, mỗi dòng có 1 byte loại filter"""
+    row_size = columns + 1
+    if len(data) % row_size:
+        raise PdfMetadataError("Độ dài dữ liệu PNG predictor không khớp")
+    previous = bytearray(columns)
+    out = bytearray()
+    for start in range(0, len(data), row_size):
+        kind = data[start]
+        row = bytearray(data[start + 1:start + row_size])
+        if kind == 1:  # Sub
+            for i in range(1, columns):
+                row[i] = (row[i] + row[i - 1]) & 0xFF
+        elif kind == 2:  # Up
+            for i in range(columns):
+                row[i] = (row[i] + previous[i]) & 0xFF
+        elif kind == 3:  # Average
+            for i in range(columns):
+                left = row[i - 1] if i else 0
+                row[i] = (row[i] + ((left + previous[i]) >> 1)) & 0xFF
+        elif kind == 4:  # Paeth
+            for i in range(columns):
+                left = row[i - 1] if i else 0
+                up_left = previous[i - 1] if i else 0
+                estimate = left + previous[i] - up_left
+                pa, pb, pc = abs(estimate - left), abs(estimate - previous[i]), abs(estimate - up_left)
+                predictor = left if pa <= pb and pa <= pc else previous[i] if pb <= pc else up_left
+                row[i] = (row[i] + predictor) & 0xFF
+        elif kind != 0:
+            raise PdfMetadataError(f"PNG predictor không hỗ trợ: {kind}")
+        out += row
+        previous = row
+    return bytes(out)
+
+
+class _XrefTable:
+    """
+    Section xref dạng bảng
+    - Entry chuẩn dài đúng 20 byte -> chỉ nhớ vị trí subsection, entry được đọc khi cần
+    - Subsection lệch chuẩn được đọc hết vào dict
+    """
+
+    def __init__(self, data: Buffer):
+        self.data = data
+        self.subsections: List[Tuple[int, int, int]] = []
+        self.entries: Dict[int, Optional[int]] = {}
+
+    def lookup(self, num: int) -> Optional[Tuple[int, int, int]]:
+        if num in self.entries:
+            offset = self.entries[num]
+            return (1, offset, 0) if offset is not None else None
+        for start, count, offset in self.subsections:
+            if start <= num < start + count:
+                position = offset + (num - start) * XREF_ENTRY_SIZE
+                entry = _XREF_ENTRY_FIXED.match(bytes(self.data[position:position + XREF_ENTRY_SIZE]))
+                if not entry:
+                    raise PdfMetadataError(f"Entry xref {num} không hợp lệ")
+                return (1, int(entry.group(1)), 0) if entry.group(3) == b"n" else None
+        return None
+
+
+class _XrefStream:
+    """
+    Section xref dạng stream (/Type /XRef)
+    - Chỉ giải nén, dòng cần tìm được tính khi tra
+    - PNG predictor Up (trường hợp phổ biến): byte của dòng k = tổng cột từ dòng 0..k (mod 256),
+      tính bằng sum() trên slice thay vì giải predictor cho cả bảng
+    """
+
+    def __init__(self, content: bytes, widths: List[int], index: List[int], columns: Optional[int]):
+        self.content = content
+        self.widths = widths
+        self.row_size = sum(widths)
+        self.columns = columns
+        self.ranges: List[Tuple[int, int, int]] = []
+        self._all_up: Optional[bool] = None
+        self._decoded: Optional[bytes] = None
+
+        first_row = 0
+        for start, count in zip(index[0::2], index[1::2]):
+            self.ranges.append((start, count, first_row))
+            first_row += count
+
+        if columns is not None and columns != self.row_size:
+            raise PdfMetadataError("/Columns của xref stream không khớp /W")
+
+    def _row(self, row_index: int) -> bytes:
+        if self.columns is None:
+            row = self.content[row_index * self.row_size:(row_index + 1) * self.row_size]
+        else:
+            stride = self.columns + 1
+            end = (row_index + 1) * stride
+            if end > len(self.content):
+                raise PdfMetadataError("Xref stream bị cắt")
+            if self._all_up is None:
+                self._all_up = set(self.content[0::stride]) <= {2}
+            if self._all_up:
+                row = bytes(sum(self.content[column + 1:end:stride]) & 0xFF for column in range(self.columns))
+            else:
+                if self._decoded is None:
+                    self._decoded = _png_unpredict(self.content, self.columns)
+                row = self._decoded[row_index * self.columns:(row_index + 1) * self.columns]
+        if len(row) < self.row_size:
+            raise PdfMetadataError("Xref stream bị cắt")
+        return row
+
+    def lookup(self, num: int) -> Optional[Tuple[int, int, int]]:
+        for start, count, first_row in self.ranges:
+            if start <= num < start + count:
+                row = self._row(first_row + num - start)
+                fields = []
+                offset = 0
+                for width in self.widths:
+                    fields.append(int.from_bytes(row[offset:offset + width], "big") if width else None)
+                    offset += width
+                kind = 1 if fields[0] is None else fields[0]
+                if kind not in (1, 2):
+                    return None
+                return kind, fields[1] or 0, fields[2] or 0
+        return None
+
+
+class PdfInfoReader:
+    """
+    Resolve object trong PDF chỉ qua bảng xref
+    - Đọc trailer của mọi section theo chuỗi /Prev (mới -> cũ); entry chỉ được tra khi cần,
+      section mới hơn được ưu tiên
+    - File mã hoá (/Encrypt) -> PdfMetadataError (string trong Info bị mã hoá)
+    """
+
+    def __init__(self, data: Buffer):
+        self.data = data
+        self.trailer: Dict[str, object] = {}
+        self._sections: List[Union[_XrefTable, _XrefStream]] = []
+        self._entries: Dict[int, Optional[Tuple[int, int, int]]] = {}
+        self._object_streams: Dict[int, Tuple[bytes, Dict[int, int]]] = {}
+        self._read_xref_chain(self._startxref())
+
+    def _startxref(self) -> int:
+        tail_start = max(0, len(self.data) - TAIL_SIZE)
+        tail = bytes(self.data[tail_start:])
+        index = tail.rfind(b"startxref")
+        if index < 0:
+            raise PdfMetadataError("Không tìm thấy startxref")
+        match = re.match(rb"startxref\s+(\d+)", tail[index:])
+        if not match:
+            raise PdfMetadataError("startxref không hợp lệ")
+        return int(match.group(1))
+
+    def _read_xref_chain(self, offset: int) -> None:
+        seen = set()
+        pending: List[int] = [offset]
+        while pending:
+            offset = pending.pop(0)
+            if offset in seen or len(seen) >= MAX_XREF_SECTIONS:
+                continue
+            if not 0 <= offset < len(self.data):
+                raise PdfMetadataError(f"Offset xref ngoài file: {offset}")
+            seen.add(offset)
+
+            parser = _Parser(self.data, offset)
+            parser.skip_whitespace()
+            if self.data[parser.pos:parser.pos + 4] == b"xref":
+                trailer = self._read_xref_table(parser)
+                # File hybrid: trailer của bảng trỏ thêm tới 1 xref stream
+                if isinstance(trailer.get("XRefStm"), int):
+                    pending.insert(0, trailer["XRefStm"])
+            else:
+                trailer = self._read_xref_stream(parser)
+
+            for key, value in trailer.items():
+                self.trailer.setdefault(key, value)
+            if isinstance(trailer.get("Prev"), int):
+                pending.append(trailer["Prev"])
+
+    def _read_xref_table(self, parser: _Parser) -> Dict[str, object]:
+        parser.pos += 4
+        data = self.data
+        section = _XrefTable(data)
+        self._sections.append(section)
+        while True:
+            parser.skip_whitespace()
+            if data[parser.pos:parser.pos + 7] == b"trailer":
+                parser.pos += 7
+                trailer = parser.parse()
+                if not isinstance(trailer, dict):
+                    raise PdfMetadataError("Trailer không hợp lệ")
+                return trailer
+
+            header = _XREF_SUBSECTION.match(bytes(data[parser.pos:parser.pos + 40]))
+            if not header:
+                raise PdfMetadataError(f"Bảng xref không hợp lệ tại byte {parser.pos}")
+            start, count = int(header.group(1)), int(header.group(2))
+            parser.pos += header.end()
+
+            # Entry chuẩn: kiểm tra entry đầu, entry cuối và phần tiếp theo rồi bỏ qua cả khối
+            end = parser.pos + count * XREF_ENTRY_SIZE
+            if count == 0 or (
+                _XREF_ENTRY_FIXED.match(bytes(data[parser.pos:parser.pos + XREF_ENTRY_SIZE]))
+                and _XREF_ENTRY_FIXED.match(bytes(data[end - XREF_ENTRY_SIZE:end]))
+                and _XREF_NEXT.match(bytes(data[end:end + 40]))
+            ):
+                section.subsections.append((start, count, parser.pos))
+                parser.pos = end
+                continue
+
+            # Lệch chuẩn (EOL 1 byte...) -> đọc từng entry
+            chunk = bytes(data[parser.pos:parser.pos + count * 21 + 21])
+            cursor = 0
+            for num in range(start, start + count):
+                entry = _XREF_ENTRY.match(chunk, cursor)
+                if not entry:
+                    raise PdfMetadataError(f"Entry xref {num} không hợp lệ")
+                cursor = entry.end()
+                section.entries[num] = int(entry.group(1)) if entry.group(3) == b"n" else None
+            parser.pos += cursor
+
+    def _read_xref_stream(self, parser: _Parser) -> Dict[str, object]:
+        header = _OBJ_HEADER.match(bytes(self.data[parser.pos:parser.pos + 40]))
+        if not header:
+            raise PdfMetadataError(f"Không có bảng xref tại byte {parser.pos}")
+        parser.pos += header.end()
+        stream_dict, content, columns = self._read_stream(parser, resolve_length=False, unpredict=False)
+        if stream_dict.get("Type") != "XRef":
+            raise PdfMetadataError("Object tại startxref không phải xref stream")
+
+        widths = stream_dict.get("W")
+        if not isinstance(widths, list) or len(widths) != 3 or not all(isinstance(w, int) and w >= 0 for w in widths):
+            raise PdfMetadataError("/W của xref stream không hợp lệ")
+        if sum(widths) <= 0:
+            raise PdfMetadataError("/W của xref stream không hợp lệ")
+        index = stream_dict.get("Index") or [0, stream_dict.get("Size", 0)]
+        if not isinstance(index, list) or not all(isinstance(value, int) for value in index):
+            raise PdfMetadataError("/Index của xref stream không hợp lệ")
+
+        self._sections.append(_XrefStream(content, widths, index, columns))
+        return stream_dict
+
+    def _read_stream(
+        self,
+        parser: _Parser,
+        resolve_length: bool = True,
+        unpredict: bool = True
+    ) -> Tuple[Dict[str, object], bytes, Optional[int]]:
+        """
+        Đọc dict + dữ liệu stream (đã giải nén) ngay sau header 'obj'
+        - Trả về (dict, dữ liệu, Columns của PNG predictor nếu unpredict=False và stream có predictor)
+        """
+        stream_dict = parser.parse()
+        if not isinstance(stream_dict, dict):
+            raise PdfMetadataError("Stream phải bắt đầu bằng dictionary")
+        parser.expect(b"stream")
+        if self.data[parser.pos:parser.pos + 2] == b"\r\n":
+            parser.pos += 2
+        elif self.data[parser.pos:parser.pos + 1] in (b"\n", b"\r"):
+            parser.pos += 1
+
+        length = stream_dict.get("Length")
+        if isinstance(length, Ref) and resolve_length:
+            length = self.resolve(length)
+        if not isinstance(length, int) or length < 0:
+            # /Length hỏng hoặc gián tiếp trong xref stream -> tìm endstream
+            length = find(self.data, b"endstream", parser.pos) - parser.pos
+            if length < 0:
+                raise PdfMetadataError("Không tìm thấy endstream")
+        raw = bytes(self.data[parser.pos:parser.pos + length])
+        data, columns = self._decode(stream_dict, raw)
+        if columns is not None and unpredict:
+            data, columns = _png_unpredict(data, columns), None
+        return stream_dict, data, columns
+
+    @staticmethod
+    def _decode(stream_dict: Dict[str, object], raw: bytes) -> Tuple[bytes, Optional[int]]:
+        """Giải FlateDecode -> (dữ liệu, Columns nếu còn PNG predictor chưa giải)"""
+        filters = stream_dict.get("Filter")
+        params = stream_dict.get("DecodeParms")
+        if isinstance(filters, Name):
+            filters, params = [filters], [params]
+        if not filters:
+            return raw, None
+        if not isinstance(params, list):
+            params = [params] * len(filters)
+        if len(filters) != 1:
+            raise PdfMetadataError("Nhiều filter liên tiếp không hỗ trợ")
+
+        name, param = filters[0], params[0]
+        if name != "FlateDecode":
+            raise PdfMetadataError(f"Filter không hỗ trợ: {name}")
+        # decompressobj: file thiếu checksum/cắt cuối vẫn lấy được phần đã giải nén;
+        # giới hạn MAX_STREAM_SIZE, còn dữ liệu chưa giải (unconsumed_tail) -> stream quá lớn
+        decompressor = zlib.decompressobj()
+        try:
+            data = decompressor.decompress(raw, MAX_STREAM_SIZE)
+        except zlib.error as e:
+            raise PdfMetadataError(f"FlateDecode lỗi: {e}") from e
+        if decompressor.unconsumed_tail:
+            raise PdfMetadataError(f"Stream giải nén vượt quá {MAX_STREAM_SIZE} byte")
+
+        predictor = param.get("Predictor", 1) if isinstance(param, dict) else 1
+        if predictor >= 10:
+            return data, int(param.get("Columns", 1))
+        if predictor != 1:
+            raise PdfMetadataError("Predictor TIFF không hỗ trợ")
+        return data, None
+
+    def _entry(self, num: int) -> Optional[Tuple[int, int, int]]:
+        """(loại, field 2, field 3) của object: loại 1 = offset trong file, 2 = nằm trong object stream"""
+        if num not in self._entries:
+            entry = None
+            for section in self._sections:
+                entry = section.lookup(num)
+                if entry is not None:
+                    break
+            self._entries[num] = entry
+        return self._entries[num]
+
+    def resolve(self, value, depth: int = 0):
+        """Giá trị trực tiếp được giữ nguyên, Ref được đọc qua xref"""
+        if not isinstance(value, Ref):
+            return value
+        if depth > 16:
+            raise PdfMetadataError("Tham chiếu lồng quá sâu")
+
+        entry = self._entry(value.num)
+        if entry is None:
+            return None
+        if entry[0] == 2:
+            return self.resolve(self._read_compressed(value.num, entry[1]), depth + 1)
+        return self.resolve(self._read_object(value.num, entry[1]), depth + 1)
+
+    def _object_parser(self, num: int, offset: int) -> _Parser:
+        header = _OBJ_HEADER.match(bytes(self.data[offset:offset + 40]))
+        if not header or int(header.group(1)) != num:
+            raise PdfMetadataError(f"Offset của object {num} không khớp")
+        return _Parser(self.data, offset + header.end())
+
+    def _read_object(self, num: int, offset: int):
+        return self._object_parser(num, offset).parse()
+
+    def _read_compressed(self, num: int, stream_num: int):
+        if stream_num not in self._object_streams:
+            entry = self._entry(stream_num)
+            if entry is None or entry[0] != 1:
+                raise PdfMetadataError(f"Không tìm thấy object stream {stream_num}")
+            stream_dict, content, _ = self._read_stream(self._object_parser(stream_num, entry[1]))
+            count, first = stream_dict.get("N"), stream_dict.get("First")
+            if not isinstance(count, int) or not isinstance(first, int):
+                raise PdfMetadataError("Object stream thiếu /N hoặc /First")
+            numbers = [int(value) for value in content[:first].split()]
+            table = {numbers[i]: first + numbers[i + 1] for i in range(0, min(len(numbers), count * 2) - 1, 2)}
+            self._object_streams[stream_num] = (content, table)
+
+        content, table = self._object_streams[stream_num]
+        if num not in table:
+            raise PdfMetadataError(f"Object {num} không có trong object stream {stream_num}")
+        return _Parser(content, table[num]).parse()
+
+    def info(self) -> Dict[str, str]:
+        """Các giá trị string trong Info dictionary (key không có dấu /)"""
+        if "Encrypt" in self.trailer:
+            raise PdfMetadataError("PDF được mã hoá")
+        info = self.resolve(self.trailer.get("Info"))
+        if info is None:
+            return {}
+        if not isinstance(info, dict):
+            raise PdfMetadataError("/Info không phải dictionary")
+
+        result = {}
+        for key, value in info.items():
+            value = self.resolve(value)
+            if isinstance(value, bytes):
+                result[key] = decode_text_string(value)
+        return result
+
+
+def read_info(data: Buffer) -> Dict[str, str]:
+    """Info dictionary qua đường nhanh, raise PdfMetadataError nếu không đọc được"""
+    try:
+        return PdfInfoReader(data).info()
+    except PdfMetadataError:
+        raise
+    except (ValueError, IndexError, TypeError, KeyError, RecursionError) as e:
+        raise PdfMetadataError(str(e)) from e
+
+
+def _read_info_pypdf(data: Buffer) -> Dict[str, str]:
+    reader = PdfReader(io.BytesIO(bytes(data)))
+    return {
+        key.lstrip("/"): str(value)
+        for key, value in (reader.metadata or {}).items()
+        if isinstance(value, str)
+    }
+
+
+def read_pdf_info(data: Buffer) -> Dict[str, str]:
+    """Info dictionary: đường nhanh trước, lỗi thì dùng pypdf (parse đầy đủ)"""
+    try:
+        return read_info(data)
+    except PdfMetadataError:
+        return _read_info_pypdf(data)
+
+
+@contextmanager
+def file_buffer(file: BinaryIO) -> Iterator[Buffer]:
+    """
+    Buffer chỉ đọc của 1 file đang mở, không copy nội dung
+    - SpooledTemporaryFile còn trong RAM -> memoryview của BytesIO bên trong
+    - File trên đĩa -> mmap
+    """
+    raw = getattr(file, "_file", file)  # SpooledTemporaryFile giữ file thật ở _file
+    if hasattr(raw, "getbuffer"):
+        view = raw.getbuffer()
+        try:
+            yield view
+        finally:
+            view.release()
+        return
+
+    mapped = mmap.mmap(raw.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        yield mapped
+    finally:
+        mapped.close()
+
+
+def revision_ends(data: Buffer) -> List[Tuple[int, int]]:
+    """
+    Các vị trí kết thúc revision (lần lưu) của file -> [(đầu, cuối)]: ngay sau 1 %%EOF có startxref
+    đứng trước (trong TAIL_SIZE byte), tới hết EOL/khoảng trắng theo sau
+    - file[:n] là 1 revision hoàn chỉnh khi đầu <= n <= cuối của 1 khoảng
+    """
+    ends = []
+    pos = find(data, b"%%EOF", 0)
+    while pos != -1:
+        start = stop = pos + 5
+        if find(data[max(0, pos - TAIL_SIZE):pos], b"startxref", 0) != -1:
+            while stop < len(data) and data[stop] in WHITESPACE:
+                stop += 1
+            ends.append((start, stop))
+        pos = find(data, b"%%EOF", start)
+    return ends
+
+
+def read_signature_manifest(data: Buffer) -> SignatureManifest:
+    """Chữ ký trong PDF (v2 + v3) chỉ từ Info dictionary"""
+    info = read_pdf_info(data)
+    return SignatureManifest.from_raw(info.get(LEGACY_KEY), info.get(MANIFEST_KEY))
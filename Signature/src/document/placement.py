@@ -0,0 +1,129 @@
+# Tự đặt vị trí stamp (placement "auto"): tìm vùng trống tốt nhất trên trang bằng occupancy grid (NumPy)
+# - Text block, image block và stamp hiện có được raster hoá thành lưới ô (AUTO_PLACEMENT_RESOLUTION point/ô)
+# - Summed-area table cho tổng số ô bị chiếm của mọi vị trí stamp cùng lúc, không dò từng vị trí
+# - Số ô bị chặn bởi AUTO_PLACEMENT_MAX_CELLS: trang rất lớn thì ô to hơn, không cấp phát lưới khổng lồ
+import math
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from src.config import AUTO_PLACEMENT_RESOLUTION, AUTO_PLACEMENT_MARGIN, AUTO_PLACEMENT_MAX_CELLS
+from src.document.spatial import Rect, is_finite
+
+OccupancyGrid = np.ndarray
+
+
+def grid_resolution(
+    page_rect: Rect,
+    resolution: float = AUTO_PLACEMENT_RESOLUTION,
+    max_cells: int = AUTO_PLACEMENT_MAX_CELLS
+) -> float:
+    """
+    Kích thước ô thực dùng cho trang: `resolution`, tăng lên nếu lưới vượt quá `max_cells` ô
+    - Trang có kích thước không hữu hạn / không dương -> ValueError
+    """
+    width, height = page_rect[2] - page_rect[0], page_rect[3] - page_rect[1]
+    if not is_finite(page_rect) or width <= 0 or height <= 0:
+        raise ValueError("Kích thước trang không hợp lệ")
+
+    resolution = max(resolution, math.sqrt(width * height / max_cells), max(width, height) / max_cells)
+    while math.ceil(width / resolution) * math.ceil(height / resolution) > max_cells:
+        resolution *= 1.1
+    return resolution
+
+
+def occupancy_grid(
+    page_rect: Rect,
+    obstacles: List[Rect],
+    resolution: float = AUTO_PLACEMENT_RESOLUTION,
+    padding: float = 0
+) -> OccupancyGrid:
+    """
+    Lưới bool (hàng = y, cột = x) của trang, True = ô bị chiếm bởi ít nhất 1 obstacle (đã nới `padding`)
+    - Raster hoá bảo thủ: mọi ô chạm phần có diện tích của obstacle đều bị chiếm
+    - Vector hoá: cộng +1/-1 vào 4 góc của từng obstacle (difference array) rồi cumsum 2 chiều
+    - Ô thực tế có thể lớn hơn `resolution` (xem grid_resolution)
+    """
+    resolution = grid_resolution(page_rect, resolution)
+    x0, y0 = page_rect[0], page_rect[1]
+    columns = int(np.ceil((page_rect[2] - x0) / resolution))
+    rows = int(np.ceil((page_rect[3] - y0) / resolution))
+    if not obstacles:
+        return np.zeros((rows, columns), dtype=bool)
+
+    boxes = np.asarray(obstacles, dtype=np.float64).reshape(-1, 4)
+    boxes = boxes + np.array([-padding, -padding, padding, padding])
+    boxes = boxes[(boxes[:, 0] < boxes[:, 2]) & (boxes[:, 1] < boxes[:, 3])]  # loại luôn NaN
+
+    left = np.clip(np.floor((boxes[:, 0] - x0) / resolution), 0, columns).astype(np.int64)
+    top = np.clip(np.floor((boxes[:, 1] - y0) / resolution), 0, rows).astype(np.int64)
+    right = np.clip(np.ceil((boxes[:, 2] - x0) / resolution), 0, columns).astype(np.int64)
+    bottom = np.clip(np.ceil((boxes[:, 3] - y0) / resolution), 0, rows).astype(np.int64)
+    keep = (left < right) & (top < bottom)
+    left, top, right, bottom = left[keep], top[keep], right[keep], bottom[keep]
+
+    diff = np.zeros((rows + 1, columns + 1), dtype=np.int32)
+    np.add.at(diff, (top, left), 1)
+    np.add.at(diff, (top, right), -1)
+    np.add.at(diff, (bottom, left), -1)
+    np.add.at(diff, (bottom, right), 1)
+    return diff.cumsum(axis=0).cumsum(axis=1)[:rows, :columns] > 0
+
+
+def summed_area_table(grid: OccupancyGrid) -> np.ndarray:
+    """S[i, j] = số ô bị chiếm trong grid[:i, :j] (có thêm hàng/cột 0 ở đầu)"""
+    table = np.zeros((grid.shape[0] + 1, grid.shape[1] + 1), dtype=np.int64)
+    table[1:, 1:] = grid.cumsum(axis=0, dtype=np.int64).cumsum(axis=1)
+    return table
+
+
+def best_slot(
+    page_rect: Rect,
+    obstacles: List[Rect],
+    size: Tuple[float, float],
+    anchor: Optional[Tuple[float, float]] = None,
+    resolution: float = AUTO_PLACEMENT_RESOLUTION,
+    margin: float = AUTO_PLACEMENT_MARGIN,
+    padding: float = 0
+) -> Optional[Rect]:
+    """
+    Vùng trống kích thước `size` tốt nhất trên trang, None nếu không còn chỗ
+    - Trống = không ô nào trong vùng bị chiếm (obstacle nới thêm `padding`), cách mép trang ít nhất `margin`
+    - Tốt nhất = góc trên trái gần `anchor` nhất; mặc định anchor là góc dưới phải trang (chỗ ký thường gặp)
+    """
+    width, height = size
+    resolution = grid_resolution(page_rect, resolution)
+    cells_x, cells_y = int(np.ceil(width / resolution)), int(np.ceil(height / resolution))
+    grid = occupancy_grid(page_rect, obstacles, resolution, padding)
+
+    # Lề trang coi như bị chiếm
+    margin_cells = int(np.ceil(margin / resolution))
+    if margin_cells:
+        grid[:margin_cells, :] = True
+        grid[-margin_cells:, :] = True
+        grid[:, :margin_cells] = True
+        grid[:, -margin_cells:] = True
+
+    rows, columns = grid.shape
+    if cells_y > rows or cells_x > columns:
+        return None
+
+    # Tổng ô bị chiếm của mọi cửa sổ cells_y x cells_x, 4 phép trừ trên cả mảng
+    table = summed_area_table(grid)
+    occupied = (
+        table[cells_y:, cells_x:] - table[:-cells_y, cells_x:]
+        - table[cells_y:, :-cells_x] + table[:-cells_y, :-cells_x]
+    )
+    free = occupied == 0
+    if not free.any():
+        return None
+
+    if anchor is None:
+        anchor = (page_rect[2] - margin - width, page_rect[3] - margin - height)
+    ys = page_rect[1] + np.arange(free.shape[0]) * resolution
+    xs = page_rect[0] + np.arange(free.shape[1]) * resolution
+    distance = (ys[:, None] - anchor[1]) ** 2 + (xs[None, :] - anchor[0]) ** 2
+    row, column = np.unravel_index(np.argmin(np.where(free, distance, np.inf)), free.shape)
+
+    x, y = float(xs[column]), float(ys[row])
+    return (x, y, x + width, y + height)
@@ -1,27 +1,35 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Depends, Form
+from fastapi import APIRouter, HTTPException, UploadFile, File, Depends, Form, Query, Header, Response, Request
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import func
 from typing import Annotated
 import os
-from src.database import get_db
+from src.database import get_db, track_round_trips
 from dotenv import load_dotenv
 import json
-import binascii
 import base64
-import io
-from pypdf import PdfReader
-from fastapi.responses import JSONResponse
+import asyncio
+from fastapi.responses import JSONResponse, StreamingResponse
+from urllib.parse import quote
 from datetime import datetime
-from typing import Optional
-
-from src.document.schemas import SignPosition, DocumentResponse
-from src.document.utils import extract_and_verify, sign_pdf_with_stamp
-from src.models.document import Document, Signature
+from typing import Optional, Literal
+from uuid import UUID
+
+from src.document.schemas import SignPosition, DocumentSummary, SignatureLocation
+from src.document.utils import extract_and_verify, verify_all_signatures, sign_pdf_with_stamp, sign_pdf_batch, load_signer, parse_range_header, spool_upload
+from src.document.utils import find_free_slot
+from src.document.worker import SignPositionError
+from src.document.manifest import SignatureManifest, position_rect, rect_position
+from src.document.pdfmeta import file_buffer, read_pdf_info
+from src.models.document import Document
 from src.auth.dependencies import get_current_user_id
-from src.document.service import get_document_by_filename, get_signature, get_documents_by_user, create_document, get_document_by_id, delete_document_by_id
-from src.key.service import get_key
+from src.document.service import list_documents_by_user, create_document, get_document_by_id, delete_document_by_id
+from src.document.service import read_document_bytes
+from src.document.service import save_signed_document, save_signed_documents, save_verification, save_document_verifications, SignedBatchItem
+from src.document.service import get_signature_index, list_signatures_by_signer
+from src.config import SIGN_BATCH_MAX_FILES
 from src.auth.service import get_user_info
-from src.models.verificate import Verification
+from src.storage import get_blob_store
+from src.log.service import activity_log
+from src.log.utils import client_ip
 from typing import List
 
 
@@ -37,17 +45,25 @@ if not aes_key:
 router = APIRouter(tags=["Document"])
 
 
-@router.get("/", response_model=List[DocumentResponse])
+@router.get("/", response_model=List[DocumentSummary])
 async def get_user_documents(
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="Giá trị X-Next-Cursor của trang trước"),
+    status: Optional[str] = Query(None, description="Lọc theo trạng thái (uploaded, signed, verified)"),
     user_id: str = Depends(get_current_user_id),
     db: AsyncSession = Depends(get_db),
 ):
     try:
-        documents = await get_documents_by_user(db, user_id)
-        if not documents:
-            return []
-        
-        return documents
+        documents, next_cursor = await list_documents_by_user(db, user_id, limit=limit, cursor=cursor, status=status)
+
+        # Trang tiếp theo trả qua header để giữ nguyên dạng list cho client cũ
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+
+        return [DocumentSummary.model_validate(document) for document in documents]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except HTTPException:
         raise
     except Exception as e:
@@ -60,6 +76,7 @@ async def get_user_documents(
 
 @router.post('/upload')
 async def upload_file(
+    request: Request,
     file: UploadFile = File(...),
     user_id: str = Depends(get_current_user_id),
     db: AsyncSession = Depends(get_db)
@@ -71,32 +88,38 @@ async def upload_file(
         )
 
     try:
-        # Validate file size (ví dụ max 10MB)
-        file_bytes = await file.read()
+        # Đọc theo chunk, kiểm tra kích thước + tính SHA-256 trong một lượt
+        upload = await spool_upload(file)
 
-        if len(file_bytes) > 10 * 1024 * 1024:
+        if upload.size == 0:
             raise HTTPException(
                 status_code=400,
-                detail="File không được vượt quá 10MB"
+                detail="File rỗng"
             )
         
         is_signed = False
         try:
-            reader = PdfReader(io.BytesIO(file_bytes))
-            metadata = reader.metadata or {}
+            # File đã được ký trên hệ thống (cùng sha256) -> tra chỉ mục signatures, không đọc PDF
+            async with db.begin():
+                indexed = (await get_signature_index(db, [upload.sha256])).get(upload.sha256)
 
-            if "/SignaturesInfo" in metadata:
-                signatures_info = json.loads(metadata["/SignaturesInfo"])
-                for sig_info in signatures_info:
-                    if str(sig_info.get("signer_id")) == str(user_id):
+            if indexed is not None:
+                is_signed = indexed.has_signer(user_id)
+            else:
+                # Đọc Info dictionary ngay trên buffer của spool (memoryview/mmap), không copy, không parse trang
+                # Chạy trong thread: file hỏng rơi về pypdf (parse đầy đủ), không chặn event loop
+                with file_buffer(upload.file) as buffer:
+                    metadata = await asyncio.to_thread(read_pdf_info, buffer)
+
+                manifest = SignatureManifest.from_raw(metadata.get("SignaturesInfo"), metadata.get("SignatureManifest"))
+                if manifest.signatures:
+                    is_signed = manifest.has_signer(user_id)
+                
+                # tương thích ngược
+                elif "Signature" in metadata and "SignerID" in metadata:
+                    signer_id = metadata['SignerID']
+                    if str(signer_id) == str(user_id):
                         is_signed = True
-                        break
-            
-            # tương thích ngược
-            elif "/Signature" in metadata and "/SignerID" in metadata:
-                signer_id = metadata['/SignerID']
-                if str(signer_id) == str(user_id):
-                    is_signed = True
 
                 
         except Exception as e:
@@ -105,7 +128,7 @@ async def upload_file(
 
         file_name = os.path.splitext(file.filename)[0]
 
-        document = await create_document(db, user_id, file.filename, file_bytes, status="signed" if is_signed else "uploaded")
+        document = await create_document(db, user_id, file.filename, upload, status="signed" if is_signed else "uploaded")
         
         if not document:
             return JSONResponse(
@@ -117,6 +140,8 @@ async def upload_file(
                 }
             )
         
+        activity_log.record(user_id, "UPLOAD", document.document_id, client_ip(request))
+
         return {
             "status": True,
             "message": "Tải lên thành công",
@@ -136,6 +161,10 @@ async def upload_file(
 @router.get('/{document_id}/content')
 async def get_document_content(
     document_id: int,
+    request: Request,
+    format: Literal["raw", "json"] = Query("raw", description="raw: stream application/pdf, json: base64 (client cũ)"),
+    range_header: Optional[str] = Header(None, alias="Range"),
+    if_range: Optional[str] = Header(None, alias="If-Range"),
     user_id: str = Depends(get_current_user_id),
     db: AsyncSession = Depends(get_db)
 ):
@@ -144,14 +173,64 @@ async def get_document_content(
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
     
-    if not document.file_bytes:
+    if not document.storage_key:
         raise HTTPException(status_code=404, detail="Document content not available")
 
+    if format == "json":
+        activity_log.record(user_id, "DOWNLOAD", document.document_id, client_ip(request))
+        return await get_document_content_json(document)
+
+    store = get_blob_store()
+    try:
+        size = document.size_bytes if document.size_bytes is not None else await store.size(document.storage_key)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Document content not available")
+
+    etag = f'"{document.content_sha256}"'
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Content-Disposition": f"inline; filename*=utf-8''{quote(document.filename or 'document.pdf')}",
+    }
+
+    # If-Range không khớp (file đã đổi) -> bỏ qua Range, trả cả file
+    if if_range and if_range != etag:
+        range_header = None
+
     try:
-        if not isinstance(document.file_bytes, str):
-            raise ValueError("Invalid data format - expected base64 string")
+        byte_range = parse_range_header(range_header, size)
+    except ValueError:
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+
+    if byte_range is None:
+        start, end, status_code = 0, size - 1, 200
+    else:
+        start, end = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+    headers["Content-Length"] = str(end - start + 1)
+
+    # Viewer tải theo Range nhiều lần -> chỉ ghi log cho request bắt đầu từ byte 0
+    if start == 0:
+        activity_log.record(user_id, "DOWNLOAD", document.document_id, client_ip(request))
+
+    return StreamingResponse(
+        store.iter_range(document.storage_key, start, end),
+        status_code=status_code,
+        media_type="application/pdf",
+        headers=headers
+    )
 
-        file_data = base64.b64decode(document.file_bytes)
+
+async def get_document_content_json(document: Document) -> dict:
+    """Dạng JSON + base64 cũ, giữ lại cho client chưa chuyển sang stream"""
+    try:
+        file_data = await read_document_bytes(document)
         
         return {
             "filename": f"{document.filename}",
@@ -159,7 +238,9 @@ async def get_document_content(
             "mime_type": "application/pdf"
         }
         
-    except (binascii.Error, ValueError) as e:
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Document content not available")
+    except ValueError as e:
         raise HTTPException(status_code=422, detail="Invalid file data format")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
@@ -168,6 +249,7 @@ async def get_document_content(
 
 @router.post("/sign-pdf", response_model=None)
 async def sign_pdf(
+    request: Request,
     file: Annotated[UploadFile, File(..., description="PDF file to be signed")],
     position: Annotated[str, Form(..., description="JSON string of SignPosition")],
     user_id: str = Depends(get_current_user_id),
@@ -179,75 +261,52 @@ async def sign_pdf(
         if not file.content_type == "application/pdf":
             raise HTTPException(400, "Only PDF files are allowed")
 
-        pdf_bytes = await file.read()
-        if len(pdf_bytes) == 0:
+        upload = await spool_upload(file)
+        if upload.size == 0:
             raise HTTPException(400, "Empty PDF file")
+        pdf_bytes = upload.read()
 
         # 2. Parse position
         try:
             sign_position = SignPosition(**json.loads(position))
         except json.JSONDecodeError:
             raise HTTPException(422, "Invalid position format")
-        except TypeError as e:
+        except (TypeError, ValueError) as e:
             raise HTTPException(422, f"Invalid position data: {str(e)}")
         
 
         # 3. Process signing
-        try:
-            signed_pdf, sig = await sign_pdf_with_stamp(
-                db=db,
-                user_id=user_id,
-                aes_key=aes_key,  
+        # Đọc người ký (1 transaction ngắn) -> ký PDF ngoài transaction -> ghi kết quả (1 transaction)
+        with track_round_trips("sign_pdf"):
+            # File đã có trong chỉ mục -> từ chối vị trí chồng chéo trước khi gửi sang process pool
+            if (await find_indexed_overlaps(db, [(upload.sha256, [sign_position])]))[0]:
+                raise HTTPException(400, "Signature position overlaps existing signature")
+
+            signer = await load_signer(db, user_id, aes_key)
+
+            signed_pdf, entry = await sign_pdf_with_stamp(
+                signer=signer,
                 pdf_bytes=pdf_bytes,
                 position=sign_position
             )
 
-            # Check if document already exists
-            document = await get_document_by_filename(db, file.filename, user_id)
-            if not document:
-                # Create new document record
-                document = Document(
-                    user_id=user_id,
-                    filename=file.filename,
-                    status="signed",
-                    file_bytes=base64.b64encode(signed_pdf).decode('utf-8')  
-                )
-                db.add(document)      
-            else:
-                # Update existing document status
-                document.status = "signed"
-                document.file_bytes = base64.b64encode(signed_pdf).decode('utf-8')  
-                document.created_at = func.now()
-
-            await db.commit()
-            await db.refresh(document)
-
-            key = await get_key(db, user_id)
-
-            # Create signature record
-            signature = Signature(
-                document_id=document.document_id,
-                user_id=user_id,
-                key_id=key.key_id,
-                signature=sig
-            )
-            db.add(signature)
-            await db.commit() 
-            await db.refresh(signature)
+            try:
+                signed = await save_signed_document(db, signer, file.filename, signed_pdf, entry, source_sha256=upload.sha256)
+            except Exception as e:
+                raise HTTPException(500, f"Signing failed: {str(e)}")
 
-        except Exception as e:
-            await db.rollback()
-            raise HTTPException(500, f"Signing failed: {str(e)}")
+        activity_log.record(user_id, "SIGN", signed.document_id, client_ip(request))
 
         # 4. Return response
         return {
             "message": "PDF signed successfully",
             "status": "success",
             "data": {
-                "document_id": str(document.document_id),
-                "filename": document.filename,
-                "signature_id": str(signature.signature_id),
-                "signed_at": document.created_at.isoformat() if document.created_at else None
+                "document_id": str(signed.document_id),
+                "filename": signed.filename,
+                "signature_id": str(signed.signature_id),
+                "signed_at": signed.created_at.isoformat() if signed.created_at else None,
+                "placement": stamp_placement(entry)
             }
         }
     
@@ -258,8 +317,162 @@ async def sign_pdf(
     
 
 
+@router.post("/sign-batch", response_model=None)
+async def sign_batch(
+    request: Request,
+    files: Annotated[List[UploadFile], File(..., description="PDF files to be signed")],
+    positions: Annotated[str, Form(..., description="JSON list theo thứ tự files, mỗi phần tử là SignPosition hoặc list SignPosition")],
+    user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Ký nhiều PDF (mỗi file 1 hoặc nhiều vị trí) trong 1 request
+    - Khoá ký được load 1 lần, phần xử lý PDF chia ra process pool
+    - Toàn bộ Document/Signature được ghi trong 1 transaction bằng insert nhiều dòng
+    - Mỗi file có kết quả riêng, file lỗi không làm hỏng cả lô
+    """
+    if len(files) > SIGN_BATCH_MAX_FILES:
+        raise HTTPException(400, f"Tối đa {SIGN_BATCH_MAX_FILES} file mỗi lô")
+
+    try:
+        raw_positions = json.loads(positions)
+    except json.JSONDecodeError:
+        raise HTTPException(422, "Invalid position format")
+    if not isinstance(raw_positions, list) or len(raw_positions) != len(files):
+        raise HTTPException(422, "positions phải là list có cùng số phần tử với files")
+
+    results = [{"index": index, "filename": file.filename, "status": "error"} for index, file in enumerate(files)]
+    jobs = []  # (index, pdf bytes, positions, sha256)
+    seen_filenames = set()
+
+    # 1. Kiểm tra từng file, lỗi chỉ ảnh hưởng file đó
+    for index, (file, raw) in enumerate(zip(files, raw_positions)):
+        try:
+            if file.content_type != "application/pdf":
+                raise HTTPException(400, "Only PDF files are allowed")
+            if file.filename in seen_filenames:
+                raise HTTPException(400, "Duplicate filename in batch")
+
+            try:
+                file_positions = [SignPosition(**item) for item in (raw if isinstance(raw, list) else [raw])]
+            except (TypeError, ValueError) as e:
+                raise HTTPException(422, f"Invalid position data: {str(e)}")
+            if not file_positions:
+                raise HTTPException(422, "Invalid position data: empty")
+
+            upload = await spool_upload(file)
+            if upload.size == 0:
+                raise HTTPException(400, "Empty PDF file")
+
+            seen_filenames.add(file.filename)
+            jobs.append((index, upload.read(), file_positions, upload.sha256))
+        except HTTPException as e:
+            results[index]["error"] = e.detail
+
+    # 2. Ký song song trên process pool với cùng 1 khoá
+    with track_round_trips("sign_batch"):
+        # Vị trí chồng chéo với chữ ký đã có trong chỉ mục -> loại trước, không gửi sang process pool
+        overlaps = await find_indexed_overlaps(db, [(sha256, file_positions) for _, _, file_positions, sha256 in jobs])
+        for (index, _, _, _), overlap in zip(jobs, overlaps):
+            if overlap:
+                results[index]["error"] = "Signature position overlaps existing signature"
+        jobs = [job for job, overlap in zip(jobs, overlaps) if not overlap]
+
+        signer = await load_signer(db, user_id, aes_key)
+
+        outcomes = await sign_pdf_batch(signer, [(pdf_bytes, file_positions) for _, pdf_bytes, file_positions, _ in jobs])
+
+        signed_items = []  # (index, SignedBatchItem)
+        for (index, _, _, sha256), outcome in zip(jobs, outcomes):
+            if isinstance(outcome, SignPositionError):
+                results[index]["error"] = str(outcome)
+            elif isinstance(outcome, HTTPException):
+                results[index]["error"] = outcome.detail
+            elif isinstance(outcome, Exception):
+                results[index]["error"] = f"Signing failed: {str(outcome)}"
+            else:
+                signed_pdf, entries = outcome
+                signed_items.append((index, SignedBatchItem(files[index].filename, signed_pdf, entries, source_sha256=sha256)))
+
+        # 3. Ghi toàn bộ kết quả trong 1 transaction
+        try:
+            saved = await save_signed_documents(db, signer, [item for _, item in signed_items])
+        except Exception as e:
+            for index, _ in signed_items:
+                results[index]["error"] = f"Signing failed: {str(e)}"
+            saved = []
+
+    for (index, item), document in zip(signed_items, saved):
+        results[index].update({
+            "status": "signed",
+            "document_id": str(document.document_id),
+            "signature_ids": [str(signature_id) for signature_id in document.signature_ids],
+            "placements": [stamp_placement(entry) for entry in item.signatures],
+            "signed_at": document.created_at.isoformat() if document.created_at else None,
+        })
+        activity_log.record(user_id, "SIGN", document.document_id, client_ip(request))
+
+    signed_count = sum(result["status"] == "signed" for result in results)
+    return {
+        "message": f"Signed {signed_count}/{len(results)} PDF files",
+        "status": "success" if signed_count == len(results) else "partial" if signed_count else "error",
+        "data": {
+            "signed": signed_count,
+            "failed": len(results) - signed_count,
+            "results": results
+        }
+    }
+
+
+def stamp_placement(entry: dict) -> dict:
+    """Vùng stamp đã dùng (trả về cho client, nhất là khi placement auto)"""
+    return {key: entry.get(key) for key in ("page", "x", "y", "width", "height")}
+
+
+async def find_indexed_overlaps(db: AsyncSession, jobs: List[tuple]) -> List[bool]:
+    """
+    Kiểm tra chồng chéo bằng chỉ mục signatures, mỗi job là (sha256 file, các SignPosition)
+    - 1 truy vấn cho mọi file; file chưa có trong chỉ mục -> False (worker vẫn kiểm tra trên manifest)
+    """
+    if not jobs:
+        return []
+    async with db.begin():
+        index = await get_signature_index(db, [sha256 for sha256, _ in jobs])
+
+    return [
+        sha256 in index and any(
+            index[sha256].overlaps(position.page, position_rect(position.x, position.y))
+            for position in positions if position.placement == "manual"
+        )
+        for sha256, positions in jobs
+    ]
+
+
+@router.get("/signatures", response_model=List[SignatureLocation])
+async def get_signatures_by_signer(
+    response: Response,
+    signer_id: Optional[UUID] = Query(None, description="Người ký cần tra (mặc định: chính mình)"),
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[int] = Query(None, description="Giá trị X-Next-Cursor của trang trước"),
+    user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Người ký signer_id đã ký những document nào (trong các document của mình) và ở đâu
+    - Đọc chỉ mục signatures, không mở file PDF
+    """
+    rows, next_cursor = await list_signatures_by_signer(
+        db, user_id, str(signer_id) if signer_id else user_id, limit=limit, cursor=cursor
+    )
+
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = str(next_cursor)
+    return [SignatureLocation.model_validate(row) for row in rows]
+
+
 @router.post("/verify-pdf")
 async def verify_pdf(
+    request: Request,
     file: UploadFile = File(..., description="PDF file to verify"),
     public_key: str = Form(..., description="PEM formatted public key"),
     user_id: str = Depends(get_current_user_id),
@@ -271,9 +484,10 @@ async def verify_pdf(
         if not file.content_type == "application/pdf":
             raise HTTPException(400, "Only PDF files are allowed")
 
-        pdf_bytes = await file.read()
-        if len(pdf_bytes) == 0:
+        upload = await spool_upload(file)
+        if upload.size == 0:
             raise HTTPException(400, "Empty PDF file")
+        pdf_bytes = upload.read()
 
         # 2. Clean and validate public key
         try:
@@ -285,7 +499,9 @@ async def verify_pdf(
 
         target_user_id = None
         if signature_to_verify:
-            user = await get_user_info(db, signature_to_verify)
+            # Transaction đọc ngắn, kết thúc trước bước ghi kết quả
+            async with db.begin():
+                user = await get_user_info(db, signature_to_verify)
             if user:
                 target_user_id = user.user_id
 
@@ -295,45 +511,17 @@ async def verify_pdf(
             pdf_bytes=pdf_bytes,  
             public_key=cleaned_key,
             user_id=user_id,
-            signature_to_verify=target_user_id
+            signature_to_verify=target_user_id,
+            pdf_sha256=upload.sha256
         )
 
         if result['valid']:
 
-            # 4. Update database based on verification result
-            document = await get_document_by_filename(db, file.filename, user_id)
-            if not document:
-                # Create new document record if it doesn't exist
-                document = Document(
-                    user_id=user_id,
-                    filename=file.filename,
-                    status="verified",
-                    file_bytes=base64.b64encode(pdf_bytes).decode('utf-8')  
-                )
-                db.add(document)
-                
-            else:
-                # Update existing document status
-                document.status = "verified"
-            
-            await db.commit()
-            await db.refresh(document)
-        
-
-            # Get the signature for this document 
-            signature = await get_signature(db, document.document_id, user_id)
-            
-            if signature:
-                # Create verification record
-                verification = Verification(
-                    signature_id=signature.signature_id,
-                    user_id=user_id,
-                    is_valid=result["valid"],
-                )
-                db.add(verification)
-                await db.commit()
-                await db.refresh(verification)
+            # 4. Update database based on verification result (1 transaction)
+            with track_round_trips("verify_pdf"):
+                document_id, _ = await save_verification(db, user_id, file.filename, upload, result["valid"])
 
+            activity_log.record(user_id, "VERIFY", document_id, client_ip(request))
 
             response_data = {
                 "status": "success",
@@ -361,6 +549,141 @@ async def verify_pdf(
         raise HTTPException(500, f"Internal verification error")
 
 
+@router.post("/verify-all")
+async def verify_all_pdf(
+    request: Request,
+    file: UploadFile = File(..., description="PDF file to verify"),
+    user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Xác thực tất cả chữ ký trong PDF trong 1 lần parse
+    - Public key của từng người ký lấy từ bảng keys theo signer_id (không cần gửi PEM)
+    - Trả về kết quả từng chữ ký và kết luận chung cho cả tài liệu
+    """
+    if not file.content_type == "application/pdf":
+        raise HTTPException(400, "Only PDF files are allowed")
+
+    upload = await spool_upload(file)
+    if upload.size == 0:
+        raise HTTPException(400, "Empty PDF file")
+
+    try:
+        result = await verify_all_signatures(db, upload.read(), upload.sha256)
+
+        if result["valid"]:
+            with track_round_trips("verify_all"):
+                document_id, _ = await save_verification(db, user_id, file.filename, upload, True)
+            activity_log.record(user_id, "VERIFY", document_id, client_ip(request))
+    except HTTPException:
+        raise
+    except Exception:
+        raise HTTPException(500, "Internal verification error")
+
+    return {
+        "status": "success" if result["valid"] else "error",
+        "code": 200 if result["valid"] else 400,
+        "message": result["message"],
+        "data": {
+            "is_valid": result["valid"],
+            "result_code": result["code"],
+            "total_signatures": result["total_signatures"],
+            "valid_signatures": result.get("valid_signatures", 0),
+            "signatures": result["signatures"],
+            "verification_time": datetime.now().isoformat(),
+        }
+    }
+
+
+@router.post("/{document_id}/verify")
+async def verify_stored_document(
+    document_id: int,
+    request: Request,
+    user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Xác thực document đã lưu theo document_id (không cần upload lại file hay gửi public key)
+    - Nội dung đọc từ blob store, public key của người ký lấy qua cache theo signer_id
+    - Mỗi chữ ký có trong bảng signatures được ghi 1 dòng Verification (ghi theo lô)
+    """
+    async with db.begin():
+        document = await get_document_by_id(db, document_id, user_id)
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+    if not document.storage_key:
+        raise HTTPException(status_code=404, detail="Document content not available")
+
+    try:
+        pdf_bytes = await read_document_bytes(document)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Document content not available")
+
+    try:
+        result = await verify_all_signatures(db, pdf_bytes, document.content_sha256)
+        with track_round_trips("verify_document"):
+            verification_ids = await save_document_verifications(db, document_id, user_id, result["signatures"])
+    except Exception:
+        raise HTTPException(500, "Internal verification error")
+
+    activity_log.record(user_id, "VERIFY", document_id, client_ip(request))
+
+    return {
+        "status": "success" if result["valid"] else "error",
+        "code": 200 if result["valid"] else 400,
+        "message": result["message"],
+        "data": {
+            "document_id": document_id,
+            "is_valid": result["valid"],
+            "result_code": result["code"],
+            "total_signatures": result["total_signatures"],
+            "valid_signatures": result.get("valid_signatures", 0),
+            "signatures": result["signatures"],
+            "verification_ids": verification_ids,
+            "verification_time": datetime.now().isoformat(),
+        }
+    }
+
+
+@router.get("/{document_id}/free-slot")
+async def get_free_slot(
+    document_id: int,
+    page: int = Query(..., ge=1),
+    x: float = Query(..., ge=-1e6, le=1e6, description="Vị trí ký mong muốn, cùng hệ toạ độ với SignPosition"),
+    y: float = Query(..., ge=-1e6, le=1e6),
+    user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Vị trí ký trống gần (x, y) nhất trên trang của document đã lưu
+    - Kết quả (x, y) gửi thẳng vào /sign-pdf được, không phải thử lại khi bị từ chối vì chồng chéo
+    """
+    async with db.begin():
+        document = await get_document_by_id(db, document_id, user_id)
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+    if not document.storage_key:
+        raise HTTPException(status_code=404, detail="Document content not available")
+
+    try:
+        pdf_bytes = await read_document_bytes(document)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Document content not available")
+
+    rect = await find_free_slot(pdf_bytes, page, x, y)
+    if rect is None:
+        raise HTTPException(status_code=409, detail="No free slot on this page")
+
+    slot_x, slot_y = rect_position(rect)
+    return {
+        "page": page,
+        "x": slot_x,
+        "y": slot_y,
+        "moved": (slot_x, slot_y) != (x, y),
+        "rect": {"x": rect[0], "y": rect[1], "width": rect[2] - rect[0], "height": rect[3] - rect[1]},
+    }
+
+
 @router.delete("/{document_id}")
 async def delete_document(
     document_id: int,
@@ -2,7 +2,7 @@
 from pydantic import BaseModel, validator
 from datetime import datetime
 from uuid import UUID
-from typing import Optional
+from typing import Literal, Optional
 
 class DocumentCreate(BaseModel):
     user_id: UUID
@@ -12,16 +12,51 @@ class DocumentCreate(BaseModel):
 class DocumentResponse(DocumentCreate):
     document_id: int
     created_at: datetime
-    file_bytes: bytes
+    content_sha256: Optional[str] = None
+    size_bytes: Optional[int] = None
+
+
+class DocumentSummary(BaseModel):
+    """Thông tin tóm tắt dùng cho danh sách (không có nội dung file)"""
+    document_id: int
+    user_id: UUID
+    filename: str
+    status: str
+    size_bytes: Optional[int] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class SignatureLocation(BaseModel):
+    """1 chữ ký trong chỉ mục signatures: document nào, trang nào, vùng stamp nào"""
+    signature_id: int
+    document_id: int
+    filename: str
+    signed_at: Optional[datetime] = None
+    page: int
+    rect_x: float
+    rect_y: float
+    rect_width: float
+    rect_height: float
+    content_hash: Optional[str] = None
+    algorithm: Optional[str] = None
+    manifest_version: Optional[int] = None
+
+    class Config:
+        from_attributes = True
 
 
 class SignPosition(BaseModel):
     page: int
-    x: float
-    y: float
+    x: Optional[float] = None
+    y: Optional[float] = None
     scale: float
     width: int
     height: int
+    # auto: server tự chọn vùng trống trên trang, bỏ qua x, y
+    placement: Literal["manual", "auto"] = "manual"
 
     @validator('page', pre=True)
     def parse_page(cls, v):
@@ -30,6 +65,18 @@ class SignPosition(BaseModel):
         except (ValueError, TypeError):
             raise ValueError('page must be convertible to int')
 
+    @validator('placement', always=True)
+    def check_placement(cls, v, values):
+        if v == "manual" and (values.get('x') is None or values.get('y') is None):
+            raise ValueError('x and y are required for manual placement')
+        return v
+
+    def coordinates(self) -> tuple:
+        """(page, x, y) gửi sang worker, x/y = None khi placement auto"""
+        if self.placement == "auto":
+            return self.page, None, None
+        return self.page, self.x, self.y
+
 class VerifyPDFResponse(BaseModel):
     valid: bool
     message: str
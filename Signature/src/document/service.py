@@ -1,17 +1,16 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from src.models import Document, Signature
-from typing import List
+from sqlalchemy import select, insert, update, func, tuple_, literal, Row
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from src.models import Document, Signature, Verification
+from src.storage import get_blob_store, StoredBlob
+from src.document.utils import SpooledUpload, Signer
+from src.document.manifest import SignatureManifest, stamp_rect, SIGNATURE_ALGORITHM
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
 import base64
+import hashlib
  
-async def get_document_by_filename(db: AsyncSession, filename: str, user_id: str) -> Document:
-    """Kiểm tra xem document đã tồn tại theo filename"""
-    result = await db.execute(
-        select(Document).where((Document.filename == filename) & (Document.user_id == user_id))
-    )
-    return result.scalar_one_or_none()
-
-
 async def get_document_by_id(db: AsyncSession, document_id: str, user_id: str) -> Document:
     """Kiểm tra xem document đã tồn tại theo document_id"""
     result = await db.execute(
@@ -20,48 +19,265 @@ async def get_document_by_id(db: AsyncSession, document_id: str, user_id: str) -
     return result.scalar_one_or_none()
 
 
-async def get_documents_by_user(db: AsyncSession, user_id: str) -> List[Document]:
-    result = await db.execute(
-        select(Document).where(Document.user_id == user_id)
-    )
-    return result.scalars().all()  # Trả về tất cả kết quả dạng list
+def encode_cursor(created_at: datetime, document_id: int) -> str:
+    """Cursor keyset = (created_at, document_id) của phần tử cuối trang"""
+    raw = f"{created_at.isoformat()}|{document_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
 
 
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, document_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), int(document_id)
+    except Exception as e:
+        raise ValueError("Cursor không hợp lệ") from e
 
-async def get_signature(db: AsyncSession, document_id: str, user_id: str) -> Signature:
-    result = await db.execute(
-        select(Signature).where((Signature.document_id == document_id) & (Signature.user_id == user_id))
-    )
-    return result.scalar_one_or_none()
 
+async def list_documents_by_user(
+    db: AsyncSession,
+    user_id: str,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    status: Optional[str] = None
+) -> Tuple[List[Row], Optional[str]]:
+    """
+    Danh sách document (mới nhất trước) theo keyset pagination
+    - Chỉ select các cột tóm tắt, không đụng tới nội dung file
+    - Dùng index documents(user_id, created_at)
+    - Trả về (rows, next_cursor), next_cursor = None nếu hết dữ liệu
+    """
+    stmt = select(
+        Document.document_id,
+        Document.user_id,
+        Document.filename,
+        Document.status,
+        Document.size_bytes,
+        Document.created_at,
+    ).where(Document.user_id == user_id)
+
+    if status:
+        stmt = stmt.where(Document.status == status)
 
-async def create_document(db: AsyncSession, user_id: str, filename: str, file_bytes: bytes, status: str = 'uploaded') -> Document:
-    existing_doc = await db.execute(
-        select(Document).where(
-            (Document.user_id == user_id) & 
-            (Document.filename == filename)
+    if cursor:
+        created_at, document_id = decode_cursor(cursor)
+        stmt = stmt.where(
+            tuple_(Document.created_at, Document.document_id) < tuple_(created_at, document_id)
         )
-    )
-    if existing_doc.scalar_one_or_none():
-        return None
-    
+
+    stmt = stmt.order_by(Document.created_at.desc(), Document.document_id.desc()).limit(limit + 1)
+
+    result = await db.execute(stmt)
+    rows = result.all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].document_id)
+
+    return rows, next_cursor
+
+
+INDEX_COLUMNS = (
+    "page", "rect_x", "rect_y", "rect_width", "rect_height", "content_hash", "algorithm", "manifest_version"
+)
+
+
+def signature_index_values(sig: Dict) -> dict:
+    """
+    Các cột chỉ mục của signatures lấy từ 1 mục manifest (v2 hoặc v3)
+    - Mục v2 không có version/algorithm; content_hash tính lại từ signed_content nếu thiếu
+    """
+    rect = stamp_rect(sig)
     try:
-        new_document = Document(
-            user_id=user_id,
-            filename=filename,
-            status=status,
-            file_bytes=base64.b64encode(file_bytes).decode('utf-8'),
+        page = int(sig.get("page", 1))
+    except (TypeError, ValueError):
+        page = None
+
+    content_hash = sig.get("content_hash")
+    if not content_hash and "signed_content" in sig:
+        content_hash = hashlib.sha256(str(sig["signed_content"]).encode()).hexdigest()
+
+    return {
+        "page": page if rect is not None else None,
+        "rect_x": rect[0] if rect else None,
+        "rect_y": rect[1] if rect else None,
+        "rect_width": rect[2] - rect[0] if rect else None,
+        "rect_height": rect[3] - rect[1] if rect else None,
+        "content_hash": content_hash,
+        "algorithm": sig.get("algorithm", SIGNATURE_ALGORITHM),
+        "manifest_version": sig.get("version", 2),
+    }
+
+
+def _index_entry(row: Row) -> Dict:
+    """Dòng signatures -> mục dạng manifest (đủ để kiểm tra chồng chéo / tìm người ký)"""
+    entry = {
+        "signature": row.signature,
+        "signer_id": str(row.user_id) if row.user_id else None,
+        "page": row.page,
+        "x": row.rect_x,
+        "y": row.rect_y,
+        "width": row.rect_width,
+        "height": row.rect_height,
+        "content_hash": row.content_hash,
+        "algorithm": row.algorithm,
+    }
+    if row.manifest_version is not None and row.manifest_version >= 3:
+        entry["version"] = row.manifest_version
+    return entry
+
+
+async def get_signature_index(db: AsyncSession, content_sha256s: List[str]) -> Dict[str, SignatureManifest]:
+    """
+    Chữ ký đã ghi trong chỉ mục signatures của các document có nội dung (sha256) cho trước, 1 truy vấn
+    - Trả về sha256 -> SignatureManifest dựng từ các dòng; sha256 không có dòng nào thì không có trong kết quả
+      (file chưa từng được ký/backfill trên hệ thống -> phải đọc metadata PDF)
+    """
+    if not content_sha256s:
+        return {}
+
+    rows = (await db.execute(
+        select(
+            Document.content_sha256,
+            Signature.signature,
+            Signature.user_id,
+            *(getattr(Signature, column) for column in INDEX_COLUMNS)
         )
+        .join(Document, Document.document_id == Signature.document_id)
+        .where(Document.content_sha256.in_(set(content_sha256s)) & Signature.page.isnot(None))
+        .order_by(Signature.signature_id)
+    )).all()
 
-        db.add(new_document)
-        await db.commit()
-        await db.refresh(new_document)
-        return new_document
-        
+    entries: Dict[str, Dict[str, Dict]] = {}
+    for row in rows:
+        # Nhiều document có thể dùng chung 1 blob -> gộp theo giá trị chữ ký
+        entries.setdefault(row.content_sha256, {}).setdefault(row.signature, _index_entry(row))
+    return {sha256: SignatureManifest.from_signatures(list(by_signature.values())) for sha256, by_signature in entries.items()}
+
+
+async def list_signatures_by_signer(
+    db: AsyncSession,
+    owner_id: str,
+    signer_id: str,
+    limit: int = 50,
+    cursor: Optional[int] = None
+) -> Tuple[List[Row], Optional[int]]:
+    """
+    Các chữ ký của signer_id trên document của owner_id (mới nhất trước), keyset theo signature_id
+    - Chỉ đọc chỉ mục signatures + documents, không mở file PDF
+    - Dùng index signatures(user_id, signature_id)
+    - Trả về (rows, next_cursor), next_cursor = None nếu hết dữ liệu
+    """
+    stmt = (
+        select(
+            Signature.signature_id,
+            Signature.document_id,
+            Document.filename,
+            Signature.signed_at,
+            *(getattr(Signature, column) for column in INDEX_COLUMNS)
+        )
+        .join(Document, Document.document_id == Signature.document_id)
+        .where((Signature.user_id == signer_id) & (Document.user_id == owner_id) & Signature.page.isnot(None))
+    )
+    if cursor is not None:
+        stmt = stmt.where(Signature.signature_id < cursor)
+
+    rows = (await db.execute(stmt.order_by(Signature.signature_id.desc()).limit(limit + 1))).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = rows[-1].signature_id
+    return rows, next_cursor
+
+
+async def store_document_bytes(file_bytes: bytes) -> StoredBlob:
+    """Ghi nội dung file vào blob store (content-addressed)"""
+    return await get_blob_store().put(file_bytes)
+
+
+async def store_document_upload(upload: SpooledUpload) -> StoredBlob:
+    """Ghi file upload (đã spool) vào blob store, copy theo chunk"""
+    return await get_blob_store().put_stream(upload.file, upload.sha256, upload.size)
+
+
+async def read_document_bytes(document: Document) -> bytes:
+    """Đọc nội dung file của document từ blob store"""
+    return await get_blob_store().get(document.storage_key)
+
+
+def apply_blob(document: Document, blob: StoredBlob) -> None:
+    """Gắn blob (digest, kích thước, key) vào document"""
+    document.content_sha256 = blob.sha256
+    document.size_bytes = blob.size
+    document.storage_key = blob.storage_key
+
+
+def blob_values(blob: StoredBlob) -> dict:
+    """Các cột blob của documents (dùng cho insert/update dạng Core)"""
+    return {
+        "content_sha256": blob.sha256,
+        "size_bytes": blob.size,
+        "storage_key": blob.storage_key,
+    }
+
+
+async def lock_blobs(db: AsyncSession, storage_keys: List[str]) -> None:
+    """
+    Khoá theo blob (pg_advisory_xact_lock) tới hết transaction hiện tại
+    - Ghi blob + INSERT/UPDATE document và đếm tham chiếu + xoá blob đều giữ khoá này
+      -> không xoá mất blob mà 1 document vừa được ghi trỏ tới
+    - Khoá theo thứ tự key để các transaction khoá nhiều blob không deadlock
+    """
+    for storage_key in sorted(set(storage_keys)):
+        await db.execute(select(func.pg_advisory_xact_lock(func.hashtext(storage_key))))
+
+
+async def release_blob(db: AsyncSession, storage_key: str) -> None:
+    """
+    Xoá blob khi không còn document nào tham chiếu (nhiều document có thể dùng chung 1 blob)
+    - Đếm + xoá trong 1 transaction riêng, giữ khoá của blob (gọi sau khi transaction ghi đã kết thúc)
+    """
+    if not storage_key:
+        return
+
+    async with db.begin():
+        await lock_blobs(db, [storage_key])
+        result = await db.execute(
+            select(func.count()).select_from(Document).where(Document.storage_key == storage_key)
+        )
+        if result.scalar_one() == 0:
+            await get_blob_store().delete(storage_key)
+
+
+async def create_document(db: AsyncSession, user_id: str, filename: str, upload: SpooledUpload, status: str = 'uploaded') -> Optional[Row]:
+    """
+    Tạo document mới, trả về None nếu user đã có file cùng tên
+    - INSERT ... ON CONFLICT (user_id, filename) DO NOTHING: 1 câu lệnh, không race như select-rồi-insert
+    - Blob được ghi trong transaction, sau khi giữ khoá của blob
+    """
+    storage_key = get_blob_store().key_for(upload.sha256)
+
+    try:
+        async with db.begin():
+            await lock_blobs(db, [storage_key])
+            blob = await store_document_upload(upload)
+            document = (await db.execute(
+                pg_insert(Document)
+                .values(user_id=user_id, filename=filename, status=status, **blob_values(blob))
+                .on_conflict_do_nothing(constraint="uq_documents_user_id_filename")
+                .returning(Document.document_id, Document.filename)
+            )).first()
     except Exception:
-        await db.rollback()
+        await release_blob(db, storage_key)
         raise
 
+    if document is None:
+        # Trùng tên: blob vừa ghi có thể không còn ai dùng
+        await release_blob(db, storage_key)
+    return document
+
 async def delete_document_by_id(db: AsyncSession, document_id: int) -> bool:
 
     try:
@@ -76,10 +292,305 @@ async def delete_document_by_id(db: AsyncSession, document_id: int) -> bool:
             return False  
             
         # Thực hiện xóa
+        storage_key = document.storage_key
         await db.delete(document)
         await db.commit()
+
+        await release_blob(db, storage_key)
         return True
         
     except Exception as e:
         await db.rollback()
-        raise
\ No newline at end of file
+        raise
+
+
+@dataclass
+class SignedDocument:
+    document_id: int
+    filename: str
+    created_at: Optional[datetime]
+    signature_id: int
+
+
+async def save_signed_document(
+    db: AsyncSession,
+    signer: Signer,
+    filename: str,
+    signed_pdf: bytes,
+    entry: Dict,
+    source_sha256: Optional[str] = None
+) -> SignedDocument:
+    """
+    Ghi kết quả ký trong 1 transaction: blob + document (tạo mới hoặc cập nhật) + bản ghi Signature
+    - entry là mục manifest của chữ ký: dòng Signature có luôn trang, vùng stamp, content_hash...
+    - INSERT/UPDATE ... RETURNING thay cho commit + refresh
+    - Lỗi giữa chừng -> rollback toàn bộ, không còn document "signed" mà thiếu chữ ký
+    - Blob mới được ghi khi đã giữ khoá của blob; blob cũ (nếu được thay) chỉ bị xoá sau khi commit
+    """
+    async with db.begin():
+        await lock_blobs(db, [get_blob_store().key_for(hashlib.sha256(signed_pdf).hexdigest())])
+        blob = await store_document_bytes(signed_pdf)
+
+        existing = (await db.execute(
+            select(Document.document_id, Document.storage_key, Document.content_sha256)
+            .where((Document.user_id == signer.user_id) & (Document.filename == filename))
+            .with_for_update()
+        )).first()
+
+        returning = (Document.document_id, Document.filename, Document.created_at)
+        if existing:
+            document = (await db.execute(
+                update(Document)
+                .where(Document.document_id == existing.document_id)
+                .values(status="signed", created_at=func.now(), **blob_values(blob))
+                .returning(*returning)
+            )).one()
+            await _detach_stale_index(db, [(existing, source_sha256)])
+        else:
+            # Upsert: request song song cùng tên file không vi phạm unique (user_id, filename)
+            values = {"status": "signed", **blob_values(blob)}
+            document = (await db.execute(
+                pg_insert(Document)
+                .values(user_id=signer.user_id, filename=filename, **values)
+                .on_conflict_do_update(
+                    constraint="uq_documents_user_id_filename",
+                    set_={**values, "created_at": func.now()}
+                )
+                .returning(*returning)
+            )).one()
+
+        signature_id = (await db.execute(
+            insert(Signature)
+            .values(
+                document_id=document.document_id,
+                user_id=signer.user_id,
+                key_id=signer.key_id,
+                signature=entry["signature"],
+                **signature_index_values(entry)
+            )
+            .returning(Signature.signature_id)
+        )).scalar_one()
+
+    if existing and existing.storage_key != blob.storage_key:
+        await release_blob(db, existing.storage_key)
+
+    return SignedDocument(
+        document_id=document.document_id,
+        filename=document.filename,
+        created_at=document.created_at,
+        signature_id=signature_id
+    )
+
+
+async def _detach_stale_index(db: AsyncSession, documents: List[Tuple[Row, Optional[str]]]) -> None:
+    """
+    Document bị thay bằng file ký từ 1 nguồn khác nội dung đang lưu (không phải ký tiếp trên chính file đó)
+    -> chữ ký cũ không còn trong file: xoá thông tin chỉ mục của các dòng đó (dòng vẫn giữ cho lịch sử xác thực)
+    - documents: (dòng document hiện có, sha256 file trước khi ký); sha256 None = không rõ, bỏ qua
+    """
+    stale_ids = [
+        row.document_id for row, source_sha256 in documents
+        if source_sha256 is not None and row.content_sha256 != source_sha256
+    ]
+    if stale_ids:
+        await db.execute(
+            update(Signature)
+            .where(Signature.document_id.in_(stale_ids))
+            .values({column: None for column in INDEX_COLUMNS})
+        )
+
+
+@dataclass
+class SignedBatchItem:
+    filename: str
+    signed_pdf: bytes
+    signatures: List[Dict]  # mục manifest của các chữ ký mới
+    source_sha256: Optional[str] = None  # sha256 file trước khi ký
+
+
+@dataclass
+class SignedBatchDocument:
+    document_id: int
+    filename: str
+    created_at: Optional[datetime]
+    signature_ids: List[int]
+
+
+async def save_signed_documents(
+    db: AsyncSession,
+    signer: Signer,
+    items: List[SignedBatchItem]
+) -> List[SignedBatchDocument]:
+    """
+    Ghi kết quả ký theo lô trong 1 transaction (filename trong lô phải khác nhau)
+    - 1 SELECT ... FOR UPDATE lấy blob cũ, 1 INSERT nhiều dòng ON CONFLICT DO UPDATE cho documents,
+      1 INSERT nhiều dòng cho signatures, tất cả dùng RETURNING
+    - Blob mới được ghi khi đã giữ khoá của các blob
+    - Trả về theo thứ tự items; blob cũ (nếu được thay) chỉ bị xoá sau khi commit
+    """
+    if not items:
+        return []
+
+    digests = [hashlib.sha256(item.signed_pdf).hexdigest() for item in items]
+    async with db.begin():
+        await lock_blobs(db, [get_blob_store().key_for(digest) for digest in digests])
+        blobs = [await store_document_bytes(item.signed_pdf) for item in items]
+
+        existing = {row.filename: row for row in (await db.execute(
+            select(Document.document_id, Document.filename, Document.storage_key, Document.content_sha256)
+            .where((Document.user_id == signer.user_id) & (Document.filename.in_([item.filename for item in items])))
+            .with_for_update()
+        )).all()}
+        await _detach_stale_index(db, [
+            (existing[item.filename], item.source_sha256) for item in items if item.filename in existing
+        ])
+
+        stmt = pg_insert(Document).values([
+            {"user_id": signer.user_id, "filename": item.filename, "status": "signed", **blob_values(blob)}
+            for item, blob in zip(items, blobs)
+        ])
+        documents = (await db.execute(
+            stmt.on_conflict_do_update(
+                constraint="uq_documents_user_id_filename",
+                set_={
+                    "status": stmt.excluded.status,
+                    "content_sha256": stmt.excluded.content_sha256,
+                    "size_bytes": stmt.excluded.size_bytes,
+                    "storage_key": stmt.excluded.storage_key,
+                    "created_at": func.now(),
+                }
+            )
+            .returning(Document.document_id, Document.filename, Document.created_at)
+        )).all()
+        documents = {row.filename: row for row in documents}
+
+        signature_rows = (await db.execute(
+            insert(Signature)
+            .values([
+                {
+                    "document_id": documents[item.filename].document_id,
+                    "user_id": signer.user_id,
+                    "key_id": signer.key_id,
+                    "signature": entry["signature"],
+                    **signature_index_values(entry),
+                }
+                for item in items
+                for entry in item.signatures
+            ])
+            .returning(Signature.signature_id, Signature.signature)
+        )).all()
+        # Chữ ký RSA-PSS có salt ngẫu nhiên nên giá trị chữ ký là duy nhất
+        signature_ids = {row.signature: row.signature_id for row in signature_rows}
+
+    for item, blob in zip(items, blobs):
+        old_storage_key = existing[item.filename].storage_key if item.filename in existing else None
+        if old_storage_key and old_storage_key != blob.storage_key:
+            await release_blob(db, old_storage_key)
+
+    return [
+        SignedBatchDocument(
+            document_id=documents[item.filename].document_id,
+            filename=item.filename,
+            created_at=documents[item.filename].created_at,
+            signature_ids=[signature_ids[entry["signature"]] for entry in item.signatures]
+        )
+        for item in items
+    ]
+
+
+async def save_verification(
+    db: AsyncSession,
+    user_id: str,
+    filename: str,
+    upload: SpooledUpload,
+    is_valid: bool
+) -> Tuple[int, Optional[int]]:
+    """
+    Ghi kết quả xác thực trong 1 transaction: document "verified" + bản ghi Verification
+    - Document đã có: 1 câu UPDATE ... RETURNING; chưa có: lưu blob rồi INSERT ... ON CONFLICT ... RETURNING
+    - Verification được INSERT ... SELECT từ chữ ký mới nhất của user trên document
+    - Trả về (document_id, verification_id), verification_id = None nếu document chưa có chữ ký của user
+    """
+    async with db.begin():
+        document_id = (await db.execute(
+            update(Document)
+            .where((Document.user_id == user_id) & (Document.filename == filename))
+            .values(status="verified")
+            .returning(Document.document_id)
+        )).scalars().first()
+
+        if document_id is None:
+            await lock_blobs(db, [get_blob_store().key_for(upload.sha256)])
+            blob = await store_document_upload(upload)
+            document_id = (await db.execute(
+                pg_insert(Document)
+                .values(user_id=user_id, filename=filename, status="verified", **blob_values(blob))
+                .on_conflict_do_update(
+                    constraint="uq_documents_user_id_filename",
+                    set_={"status": "verified"}
+                )
+                .returning(Document.document_id)
+            )).scalar_one()
+
+        latest_signature = (
+            select(
+                Signature.signature_id,
+                literal(user_id, Verification.user_id.type),
+                literal(is_valid),
+            )
+            .where((Signature.document_id == document_id) & (Signature.user_id == user_id))
+            .order_by(Signature.signature_id.desc())
+            .limit(1)
+        )
+        verification_id = (await db.execute(
+            insert(Verification)
+            .from_select(["signature_id", "user_id", "is_valid"], latest_signature)
+            .returning(Verification.verification_id)
+        )).scalar_one_or_none()
+
+    return document_id, verification_id
+
+
+async def save_document_verifications(
+    db: AsyncSession,
+    document_id: int,
+    user_id: str,
+    reports: List[dict]
+) -> List[int]:
+    """
+    Ghi kết quả xác thực từng chữ ký của 1 document đã lưu, trong 1 transaction
+    - Ghép report với bảng signatures theo giá trị chữ ký (1 SELECT), rồi 1 INSERT nhiều dòng
+    - Document chuyển sang "verified" khi mọi chữ ký hợp lệ
+    - Trả về verification_id của các dòng đã ghi (chữ ký không có trong bảng signatures bị bỏ qua)
+    """
+    results = {report["signature"]: report["valid"] for report in reports if report.get("signature")}
+
+    async with db.begin():
+        if reports and all(report["valid"] for report in reports):
+            await db.execute(
+                update(Document)
+                .where(Document.document_id == document_id)
+                .values(status="verified")
+            )
+
+        if not results:
+            return []
+
+        signature_rows = (await db.execute(
+            select(Signature.signature_id, Signature.signature)
+            .where((Signature.document_id == document_id) & (Signature.signature.in_(list(results))))
+        )).all()
+        if not signature_rows:
+            return []
+
+        verification_ids = (await db.execute(
+            insert(Verification)
+            .values([
+                {"signature_id": row.signature_id, "user_id": user_id, "is_valid": results[row.signature]}
+                for row in signature_rows
+            ])
+            .returning(Verification.verification_id)
+        )).scalars().all()
+
+    return list(verification_ids)
+
@@ -0,0 +1,146 @@
+# Chỉ mục không gian cho các vùng chữ nhật trên 1 trang PDF (stamp chữ ký, vùng loại trừ)
+# Lưới đều: trang chia thành ô vuông cạnh cell_size, mỗi ô giữ vị trí các rect phủ lên nó
+import math
+from collections import defaultdict
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from src.config import SPATIAL_GRID_CELL_SIZE, SPATIAL_GRID_MAX_CELLS, FREE_SLOT_STEP, FREE_SLOT_MAX_CANDIDATES
+
+Rect = Tuple[float, float, float, float]
+
+
+def is_finite(rect: Rect) -> bool:
+    return all(math.isfinite(value) for value in rect)
+
+
+def is_empty(rect: Rect) -> bool:
+    return rect[0] >= rect[2] or rect[1] >= rect[3]
+
+
+def rects_intersect(a: Rect, b: Rect) -> bool:
+    """Giao nhau có diện tích (chạm cạnh không tính), cùng quy ước với fitz.Rect.intersects"""
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+class PageGrid:
+    """
+    Lưới đều của 1 trang: tìm rect giao với 1 vùng chỉ xét các ô vùng đó phủ, không duyệt mọi rect của trang
+    - Mỗi rect kèm 1 item (ví dụ index chữ ký trong manifest), giữ theo thứ tự thêm vào
+    - Quy ước giao nhau giống fitz.Rect.intersects: phải có diện tích, rect rỗng không giao với gì
+    - Rect lấy từ metadata do người dùng gửi lên: rect phủ quá max_cells ô (hoặc toạ độ không hữu hạn)
+      không được rải vào lưới mà nằm trong danh sách riêng, được so trực tiếp ở mọi lần tra
+      -> mỗi lần thêm/tra tốn tối đa max_cells ô, không phụ thuộc kích thước rect
+    """
+
+    def __init__(self, cell_size: float = SPATIAL_GRID_CELL_SIZE, max_cells: int = SPATIAL_GRID_MAX_CELLS):
+        self.cell_size = cell_size
+        self.max_cells = max_cells
+        self.rects: List[Rect] = []
+        self.items: List[Optional[int]] = []
+        self._cells: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+        self._oversized: List[int] = []  # vị trí các rect không nằm trong lưới
+
+    @classmethod
+    def from_rects(cls, rects: Iterable[Rect], cell_size: float = SPATIAL_GRID_CELL_SIZE) -> "PageGrid":
+        grid = cls(cell_size)
+        for index, rect in enumerate(rects):
+            grid.insert(rect, index)
+        return grid
+
+    def __len__(self) -> int:
+        return len(self.rects)
+
+    def _cell_range(self, rect: Rect) -> Optional[Tuple[int, int, int, int]]:
+        """Các ô rect phủ, None nếu quá max_cells ô hoặc toạ độ không hữu hạn"""
+        if not is_finite(rect):
+            return None
+        size = self.cell_size
+        cx0, cy0 = math.floor(rect[0] / size), math.floor(rect[1] / size)
+        cx1, cy1 = math.floor(rect[2] / size), math.floor(rect[3] / size)
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) > self.max_cells:
+            return None
+        return cx0, cy0, cx1, cy1
+
+    @staticmethod
+    def _cells_of(cell_range: Tuple[int, int, int, int]) -> Iterator[Tuple[int, int]]:
+        cx0, cy0, cx1, cy1 = cell_range
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                yield cx, cy
+
+    def insert(self, rect: Rect, item: Optional[int] = None) -> None:
+        position = len(self.rects)
+        self.rects.append(rect)
+        self.items.append(item)
+        if is_empty(rect):
+            return
+
+        cell_range = self._cell_range(rect)
+        if cell_range is None:
+            self._oversized.append(position)
+            return
+        for cell in self._cells_of(cell_range):
+            self._cells[cell].append(position)
+
+    def _candidates(self, rect: Rect) -> Iterator[int]:
+        """Vị trí các rect có thể giao với `rect` (có thể lặp lại)"""
+        cell_range = self._cell_range(rect)
+        if cell_range is None:
+            # Vùng tra quá lớn: duyệt thẳng danh sách rect thay vì từng ô
+            yield from range(len(self.rects))
+            return
+        yield from self._oversized
+        for cell in self._cells_of(cell_range):
+            yield from self._cells.get(cell, ())
+
+    def query(self, rect: Rect) -> List[int]:
+        """Vị trí (theo thứ tự thêm vào) các rect giao với `rect`"""
+        if not self.rects or is_empty(rect):
+            return []
+        found = set()
+        for position in self._candidates(rect):
+            if position not in found and rects_intersect(rect, self.rects[position]):
+                found.add(position)
+        return sorted(found)
+
+    def intersects(self, rect: Rect) -> bool:
+        if not self.rects or is_empty(rect):
+            return False
+        return any(rects_intersect(rect, self.rects[position]) for position in self._candidates(rect))
+
+    def nearest_free(
+        self,
+        target: Rect,
+        bounds: Rect,
+        step: float = FREE_SLOT_STEP,
+        gap: float = 0
+    ) -> Optional[Rect]:
+        """
+        Vùng trống cùng kích thước với `target`, gần target nhất, nằm trọn trong `bounds`
+        - Dò các điểm cách target bội số của `step` theo khoảng cách tăng dần
+          (trang lớn: step được nới ra để số điểm dò không quá FREE_SLOT_MAX_CANDIDATES)
+        - Vùng trống = không giao với rect nào đã có sau khi nới thêm `gap` mỗi phía
+        - None nếu trang không còn chỗ
+        """
+        if not is_finite(target) or not is_finite(bounds):
+            return None
+        width, height = target[2] - target[0], target[3] - target[1]
+        if width <= 0 or height <= 0 or step <= 0:
+            return None
+        if width > bounds[2] - bounds[0] or height > bounds[3] - bounds[1]:
+            return None
+        area = (bounds[2] - bounds[0] - width + step) * (bounds[3] - bounds[1] - height + step)
+        step = max(step, math.sqrt(area / FREE_SLOT_MAX_CANDIDATES))
+
+        # Đưa target vào trong trang trước khi dò
+        x = min(max(target[0], bounds[0]), bounds[2] - width)
+        y = min(max(target[1], bounds[1]), bounds[3] - height)
+
+        columns = range(-math.floor((x - bounds[0]) / step), math.floor((bounds[2] - width - x) / step) + 1)
+        rows = range(-math.floor((y - bounds[1]) / step), math.floor((bounds[3] - height - y) / step) + 1)
+        for i, j in sorted(((i, j) for i in columns for j in rows), key=lambda offset: offset[0] ** 2 + offset[1] ** 2):
+            candidate = (x + i * step, y + j * step, x + i * step + width, y + j * step + height)
+            padded = (candidate[0] - gap, candidate[1] - gap, candidate[2] + gap, candidate[3] + gap)
+            if not self.intersects(padded):
+                return candidate
+        return None
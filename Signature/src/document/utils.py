@@ -1,186 +1,286 @@
-from pypdf import PdfReader, PdfWriter
+import asyncio
 import io
-from fastapi import HTTPException
-import fitz  # PyMuPDF
+from fastapi import HTTPException, UploadFile, status
 import hashlib
 import json
 from datetime import datetime
-from typing import List, Dict, Optional
-from collections import defaultdict
+from typing import List, Dict, Optional, BinaryIO, Tuple, Union
+from dataclasses import dataclass
 
 from sqlalchemy.ext.asyncio import AsyncSession
+from cryptography.hazmat.primitives.asymmetric.rsa import RSAPrivateKey
 from src.document.schemas import SignPosition
-from src.key.service import sign_data, verify_data
-from src.auth.service import get_current_user
+from src.key.service import get_user_with_key, get_public_keys, load_signing_key
+from src.key.utils import private_key_der, verify_bytes
+from src.key.cache import PublicKeyEntry
+from src.document.cache import verification_cache
+from src.config import MAX_UPLOAD_BYTES, UPLOAD_CHUNK_SIZE, PDF_POOL_SIZE, VERIFICATION_MAX_SIGNATURES
+from src.document.worker import sign_pdf_sync, sign_pdf_multi_sync, derive_signed_contents_sync, find_free_slot_sync, SignPositionError
+from src.document.manifest import SignatureManifest, Rect, is_v3, stamp_rect
+from src.document.pdfmeta import read_signature_manifest
+from src.executors import run_in_pdf_pool
 
 
-async def get_existing_signatures(doc: fitz.Document) -> Dict[str, List[Dict]]:
-    """Lấy thông tin các chữ ký hiện có từ metadata với xử lý lỗi chi tiết hơn"""
+@dataclass(frozen=True)
+class Signer:
+    """Người ký + khoá đã load, đọc 1 lần trước khi xử lý PDF"""
+    user_id: str
+    username: str
+    key_id: int
+    private_key: RSAPrivateKey
+
+
+async def load_signer(db: AsyncSession, user_id: str, aes_key: str) -> Signer:
+    """
+    Đọc user + khoá ký trong 1 transaction ngắn (1 truy vấn)
+    - Transaction kết thúc trước khi xử lý PDF nên không giữ connection trong lúc ký
+    """
+    async with db.begin():
+        row = await get_user_with_key(db, user_id)
+
+    if not row:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    user, key = row
+    if key is None:
+        raise HTTPException(status_code=400, detail="Không tìm thấy khoá cho người dùng này")
+
     try:
-        metadata = doc.metadata or {}
-        if "/SignaturesInfo" not in metadata:
-            return {}
-            
-        try:
-            signatures_info = json.loads(metadata["/SignaturesInfo"])
-            if not isinstance(signatures_info, list):
-                return {}
-        except (json.JSONDecodeError, TypeError) as e:
-            print(f"Error parsing SignaturesInfo: {e}")
-            return {}
-
-        result = defaultdict(list)
-        for sig in signatures_info:
-            try:
-                page = str(sig.get("page", 1))
-                result[page].append({
-                    'x': float(sig['x']),
-                    'y': float(sig['y']),
-                    'width': float(sig['width']),
-                    'height': float(sig['height']),
-                    'signature': sig['signature']
-                })
-            except (ValueError, KeyError) as e:
-                print(f"Invalid signature format: {e}")
-                continue
-                
-        return dict(result)
-    except Exception as e:
-        print(f"Unexpected error in get_existing_signatures: {e}")
-        return {}
-    
+        private_key = await load_signing_key(key, aes_key)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return Signer(
+        user_id=str(user.user_id),
+        username=user.username,
+        key_id=key.key_id,
+        private_key=private_key
+    )
+
 
 async def sign_pdf_with_stamp(
-    db: AsyncSession,
-    user_id: str,
-    aes_key: str,
+    signer: Signer,
     pdf_bytes: bytes,
     position: SignPosition
-) -> tuple[bytes, str]:
+) -> tuple[bytes, Dict]:
+    """
+    Ký PDF và đóng dấu chữ ký
+    - Không truy cập database: người ký đã được đọc trước bằng load_signer
+    - Toàn bộ phần nặng CPU (parse, trích nội dung, ký RSA, vẽ stamp, lưu) chạy trong process pool
+    - Trả về (pdf đã ký, mục manifest của chữ ký)
+    """
     try:
-        # Xác thực người dùng
-        user = await get_current_user(db, user_id)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-
-        # Mở PDF và kiểm tra trang
-        doc = fitz.open("pdf", pdf_bytes)
-        if position.page < 1 or position.page > len(doc):
-            raise HTTPException(status_code=400, detail="Invalid page number")
-        page = doc[position.page - 1]
-
-        # Kích thước cố định cho chữ ký
-        stamp_width, stamp_height = 180, 50
-        x, y = position.x - 48, position.y - 200
-        new_rect = fitz.Rect(x, y, x + stamp_width, y + stamp_height)
-
-        # Kiểm tra chồng chéo với các chữ ký hiện có
-        existing_signatures = await get_existing_signatures(doc)
-        for sig in existing_signatures.get(str(position.page), []):
-            sig_rect = fitz.Rect(sig['x'], sig['y'], 
-                               sig['x'] + sig['width'], 
-                               sig['y'] + sig['height'])
-            if new_rect.intersects(sig_rect):
-                raise HTTPException(
-                    status_code=400,
-                    detail="Signature position overlaps existing signature"
-                )
-
-        # Tạo danh sách tất cả vùng loại trừ (bao gồm chữ ký mới)
-        all_exclusion_rects = [fitz.Rect(x-5, y-5, x+stamp_width+5, y+stamp_height+5)]
-        for sig in existing_signatures.get(str(position.page), []):
-            all_exclusion_rects.append(fitz.Rect(
-                sig['x'] - 5,
-                sig['y'] - 5,
-                sig['x'] + sig['width'] + 5,
-                sig['y'] + sig['height'] + 5
-            ))
-
-        # Tính toán vùng nội dung
-        content_rect = page.rect
-        for rect in all_exclusion_rects:
-            content_rect -= rect
-        
-        # Lấy nội dung không bao gồm tất cả vùng chữ ký
-        text_blocks = page.get_text("blocks", clip=content_rect) or []
-        clean_content = "\n".join([block[4] for block in text_blocks if len(block) > 4]).encode()
-        clean_hash = hashlib.sha256(clean_content).hexdigest()
-
-        # Tạo chữ ký số
-        signature = await sign_data(db, user_id, aes_key, clean_content)
-
-        # Thêm watermark vào PDF
-        stamp_rect = fitz.Rect(x, y, x + stamp_width, y + stamp_height)
-        page.draw_rect(stamp_rect, color=(1, 1, 1), fill=(1, 1, 1), overlay=True)
-        page.draw_rect(stamp_rect, color=(0, 0, 0), fill=None, width=1, overlay=True)
-        
-        page.insert_text(
-            (x + 10, y + 20), 
-            f"From: {user.username}",
-            fontname="helv",
-            fontsize=14,
-            color=(0, 0, 0),
-            overlay=True
+        return await run_in_pdf_pool(
+            sign_pdf_sync,
+            pdf_bytes,
+            private_key_der(signer.private_key),
+            signer.username,
+            signer.user_id,
+            *position.coordinates()
         )
-        page.insert_text(
-            (x + 10, y + 40), 
-            f"Date: {datetime.now().strftime('%d/%m/%Y %H:%M')}",
-            fontname="helv",
-            fontsize=14,
-            color=(0, 0, 0),
-            overlay=True
+
+    except SignPositionError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error during signing: {str(e)}"
         )
 
-        # Lưu PDF và cập nhật metadata
-        watermarked_pdf = io.BytesIO()
-        doc.save(watermarked_pdf)
-        doc.close()
-
-        final_reader = PdfReader(watermarked_pdf)
-        final_writer = PdfWriter()
-        for p in final_reader.pages:
-            final_writer.add_page(p)
-        
-        existing_metadata = dict(final_reader.metadata or {})
-        signatures_info = json.loads(existing_metadata.get("/SignaturesInfo", "[]"))
-        
-        new_signature_info = {
-            "signature": signature,
-            "signer": user.username,
-            "signer_id": user.user_id,
-            "sign_date": datetime.now().isoformat(),
-            "content_hash": clean_hash,
-            "signed_content": clean_content.decode('utf-8'),  # Lưu nội dung đã ký
-            "page": position.page,
-            "x": x,
-            "y": y,
-            "width": stamp_width,
-            "height": stamp_height,
-            "version": 2  # Phiên bản mới
-        }
-        signatures_info.append(new_signature_info)
-        
-        final_writer.add_metadata({
-            **existing_metadata,
-            "/SignaturesInfo": json.dumps(signatures_info, ensure_ascii=False),
-            "/LastSignature": signature,
-            "/LastSigner": user.username,
-            "/LastSignerID": user_id,
-            "/LastSignDate": datetime.now().isoformat(),
-        })
-        
-        output = io.BytesIO()
-        final_writer.write(output)
-        return output.getvalue(), signature
 
+
+async def sign_pdf_batch(
+    signer: Signer,
+    jobs: List[Tuple[bytes, List[SignPosition]]]
+) -> List[Union[Tuple[bytes, List[Dict]], Exception]]:
+    """
+    Ký nhiều file song song trên process pool bằng cùng 1 khoá
+    - Mỗi job là (pdf bytes, các vị trí ký trên file đó), mọi vị trí được ký trong 1 lượt worker
+    - Tối đa PDF_POOL_SIZE job cùng lúc để 1 lô không chiếm hết hàng đợi của pool
+    - Trả về theo thứ tự jobs: (pdf đã ký, các mục manifest mới) hoặc Exception của job đó
+    """
+    key_der = private_key_der(signer.private_key)
+    slots = asyncio.Semaphore(PDF_POOL_SIZE)
+
+    async def sign_one(pdf_bytes: bytes, positions: List[SignPosition]):
+        async with slots:
+            return await run_in_pdf_pool(
+                sign_pdf_multi_sync,
+                pdf_bytes,
+                key_der,
+                signer.username,
+                signer.user_id,
+                [position.coordinates() for position in positions]
+            )
+
+    return await asyncio.gather(
+        *(sign_one(pdf_bytes, positions) for pdf_bytes, positions in jobs),
+        return_exceptions=True
+    )
+
+
+
+async def find_free_slot(pdf_bytes: bytes, page: int, x: float, y: float) -> Optional[Rect]:
+    """Vùng stamp trống gần vị trí (x, y) nhất trên trang, tính trong process pool"""
+    try:
+        return await run_in_pdf_pool(find_free_slot_sync, pdf_bytes, page, x, y)
+    except SignPositionError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
-            detail=f"Error during signing: {str(e)}"
+            detail=f"Error finding free slot: {str(e)}"
+        )
+
+
+def read_signatures_info(pdf_bytes: bytes) -> List[Dict]:
+    """
+    Đọc danh sách chữ ký của PDF: mục v2 trong /SignaturesInfo + mục v3 trong /SignatureManifest
+    - Chỉ đọc trailer, xref và Info dictionary (pdfmeta), không dựng cây trang
+    """
+    return read_signature_manifest(pdf_bytes).signatures
+
+
+def verify_signature_entry(
+    sig: Dict,
+    key: Optional[PublicKeyEntry],
+    derived: Optional[Tuple[bytes, bool]] = None
+) -> Dict:
+    """
+    Xác thực 1 mục chữ ký bằng public key của người ký
+    - v2: nội dung đã ký lấy từ signed_content
+    - v3: nội dung dựng lại từ PDF, derived = (nội dung, trang có bị sửa sau khi ký hay không)
+    - Hàm đồng bộ, chạy trong thread để nhiều chữ ký được xác thực song song
+    """
+    report = {
+        "signer": sig.get("signer"),
+        "signer_id": sig.get("signer_id"),
+        "sign_date": sig.get("sign_date"),
+        "page": sig.get("page"),
+        "signature": sig.get("signature"),
+    }
+
+    unchanged = True
+    if is_v3(sig) and key is None:
+        # Không có khoá thì không dựng lại nội dung (tốn 1 lần mở revision) cho chữ ký không thể hợp lệ
+        return {**report, "valid": False, "code": "KEY_NOT_FOUND",
+                "message": "Không tìm thấy khoá của người ký"}
+    if is_v3(sig):
+        # Không đọc được revision lúc ký -> file đã bị ghi lại toàn bộ sau khi ký
+        clean_content, unchanged = derived if derived is not None else (b"", False)
+    elif "signed_content" in sig:
+        clean_content = str(sig["signed_content"]).encode()
+    else:
+        clean_content = None
+
+    if clean_content is None or "signature" not in sig:
+        return {**report, "valid": False, "code": "MISSING_SIGNED_CONTENT",
+                "message": "Không tìm thấy nội dung đã ký"}
+
+    current_hash = hashlib.sha256(clean_content).hexdigest()
+    if current_hash != sig.get("content_hash") or not unchanged:
+        return {**report, "valid": False, "code": "CONTENT_MODIFIED",
+                "message": "Nội dung đã bị thay đổi sau khi ký"}
+
+    if key is None:
+        return {**report, "valid": False, "code": "KEY_NOT_FOUND",
+                "message": "Không tìm thấy khoá của người ký"}
+
+    if not verify_bytes(key.public_key, clean_content, str(sig["signature"])):
+        return {**report, "valid": False, "code": "INVALID_SIGNATURE",
+                "message": "Chữ ký không hợp lệ"}
+    return {**report, "valid": True, "code": "VERIFIED", "message": "Chữ ký hợp lệ"}
+
+
+async def load_signature_entries(pdf_bytes: bytes, pdf_sha256: str) -> Tuple[List[Dict], Optional[List[Dict]]]:
+    """
+    Danh sách chữ ký của PDF -> (entries, full)
+    - entries: bản gọn (không có signed_content), lấy từ verification_cache nếu PDF đã từng được parse
+    - full: bản đầy đủ nếu vừa phải parse, None nếu lấy từ cache
+    - Raise ValueError nếu manifest có quá VERIFICATION_MAX_SIGNATURES chữ ký
+    """
+    entries = verification_cache.get_entries(pdf_sha256)
+    full = None
+    if entries is None:
+        full = await asyncio.to_thread(read_signatures_info, pdf_bytes)
+        entries = [{k: v for k, v in sig.items() if k != "signed_content"} for sig in full]
+        verification_cache.put_entries(pdf_sha256, entries)
+
+    if len(entries) > VERIFICATION_MAX_SIGNATURES:
+        raise ValueError(f"Tài liệu có quá nhiều chữ ký ({len(entries)} > {VERIFICATION_MAX_SIGNATURES})")
+    return entries, full
+
+
+async def verify_signature_entries(
+    pdf_bytes: bytes,
+    pdf_sha256: str,
+    entries: List[Dict],
+    full: Optional[List[Dict]],
+    keys: Dict[int, Optional[PublicKeyEntry]]
+) -> Dict[int, Dict]:
+    """
+    Xác thực các chữ ký theo vị trí trong entries -> {index: report}
+    - Kết quả lấy từ verification_cache nếu có (giữ verified_at gốc), phần còn lại
+      xác thực song song trên thread pool rồi đưa vào cache
+    - Chữ ký v3: nội dung được dựng lại từ revision trước khi ký, 1 lượt trong process pool
+      (chỉ với chữ ký có khoá của người ký; không có khoá thì KEY_NOT_FOUND, không cần dựng lại)
+    - Chỉ parse lại PDF khi có chữ ký v2 cache miss mà chưa có bản đầy đủ
+    """
+    reports = {}
+    misses = []
+    for index, key in keys.items():
+        signature = entries[index].get("signature")
+        cached = None
+        if key is not None and isinstance(signature, str):
+            cached = verification_cache.get(pdf_sha256, signature, key)
+        if cached is not None:
+            reports[index] = cached
+        else:
+            misses.append(index)
+
+    if not misses:
+        return reports
+
+    derived = {}
+    v3_misses = [index for index in misses if is_v3(entries[index]) and keys[index] is not None]
+    if v3_misses:
+        manifest = SignatureManifest.from_signatures(entries)
+        jobs = []
+        for index in v3_misses:
+            sig = entries[index]
+            rect = stamp_rect(sig)
+            page = sig.get("page")
+            if rect and isinstance(page, int):
+                jobs.append((sig.get("rev"), page, manifest.exclusion_rects(page, rect, upto=index), manifest.exclusion_rects(page, rect)))
+            else:
+                jobs.append((sig.get("rev"), page, [], []))
+        derived = dict(zip(v3_misses, await run_in_pdf_pool(derive_signed_contents_sync, pdf_bytes, jobs)))
+
+    if full is None and any(not is_v3(entries[index]) for index in misses):
+        full = await asyncio.to_thread(read_signatures_info, pdf_bytes)
+
+    fresh = await asyncio.gather(*(
+        asyncio.to_thread(
+            verify_signature_entry,
+            entries[index] if is_v3(entries[index]) else full[index],
+            keys[index],
+            derived.get(index)
         )
+        for index in misses
+    ))
+    verified_at = datetime.now().isoformat()
+    for index, report in zip(misses, fresh):
+        report = {**report, "verified_at": verified_at, "cached": False}
+        key = keys[index]
+        if key is not None and isinstance(report["signature"], str):
+            verification_cache.put(pdf_sha256, report["signature"], key, report)
+        reports[index] = report
 
+    return reports
 
 
 async def extract_and_verify(
@@ -188,16 +288,15 @@ async def extract_and_verify(
     pdf_bytes: bytes,
     public_key: bytes,
     user_id: str,
-    signature_to_verify: Optional[str] = None
+    signature_to_verify: Optional[str] = None,
+    pdf_sha256: Optional[str] = None
 ) -> dict:
     try:
-        # 1. Đọc metadata
-        reader = PdfReader(io.BytesIO(pdf_bytes))
-        metadata = dict(reader.metadata or {})
-        
-        # 2. Kiểm tra thông tin chữ ký
-        signatures_info = json.loads(metadata.get("/SignaturesInfo", "[]"))
-        if not signatures_info:
+        pdf_sha256 = pdf_sha256 or hashlib.sha256(pdf_bytes).hexdigest()
+
+        # 1-2. Danh sách chữ ký (cache theo sha256 của file, hoặc đọc metadata)
+        entries, full = await load_signature_entries(pdf_bytes, pdf_sha256)
+        if not entries:
             return {
                 "valid": False,
                 "code": "NO_SIGNATURES",
@@ -205,55 +304,29 @@ async def extract_and_verify(
             }
 
         # 3. Tìm chữ ký cần xác thực
-        target_sig = None
-        if signature_to_verify:
-            target_sig = next((sig for sig in signatures_info if sig.get("signer_id") == signature_to_verify), None)
-        else:
-            target_sig = next((sig for sig in signatures_info if sig.get("signer_id") == user_id), None)
+        target_id = signature_to_verify or user_id
+        index = next((i for i, sig in enumerate(entries) if sig.get("signer_id") == target_id), None)
 
-        if not target_sig:
+        if index is None:
             return {
                 "valid": False,
                 "code": "SIGNATURE_NOT_FOUND",
                 "message": "Không tìm thấy chữ ký cần xác thực"
             }
+        target_sig = entries[index]
 
-        # 4. Lấy nội dung đã ký từ chính chữ ký đó
-        if "signed_content" not in target_sig:
-            return {
-                "valid": False,
-                "code": "MISSING_SIGNED_CONTENT",
-                "message": "Không tìm thấy nội dung đã ký"
-            }
+        # 4-6. Kiểm tra hash + chữ ký số bằng public key client gửi (có cache)
+        key = PublicKeyEntry.from_pem(public_key)
+        report = (await verify_signature_entries(pdf_bytes, pdf_sha256, entries, full, {index: key}))[index]
 
-        clean_content = target_sig["signed_content"].encode()
-        current_hash = hashlib.sha256(clean_content).hexdigest()
-
-        # 5. Kiểm tra hash
-        if current_hash != target_sig["content_hash"]:
+        if not report["valid"]:
             return {
                 "valid": False,
-                "code": "CONTENT_MODIFIED",
-                "message": "Nội dung đã bị thay đổi sau khi ký",
-                "original_hash": target_sig["content_hash"],
-                "current_hash": current_hash
-            }
-
-        # 6. Xác thực chữ ký số
-        verify_result = await verify_data(
-            db=db,
-            user_id=user_id,
-            public_key=public_key,
-            data=clean_content,
-            signature=target_sig["signature"]
-        )
-
-        if not verify_result.get("valid"):
-            return {
-                **verify_result,
-                "code": "INVALID_SIGNATURE",
+                "code": report["code"],
+                "message": report["message"],
                 "signer": target_sig.get("signer"),
-                "sign_date": target_sig.get("sign_date")
+                "sign_date": target_sig.get("sign_date"),
+                "verified_at": report["verified_at"]
             }
 
         return {
@@ -264,13 +337,15 @@ async def extract_and_verify(
             "signer_id": target_sig.get("signer_id"),
             "sign_date": target_sig.get("sign_date"),
             "signature_area": {
-                "page": target_sig["page"],
-                "x": target_sig["x"],
-                "y": target_sig["y"],  
-                "width": target_sig["width"],
-                "height": target_sig["height"]
+                "page": target_sig.get("page"),
+                "x": target_sig.get("x"),
+                "y": target_sig.get("y"),
+                "width": target_sig.get("width"),
+                "height": target_sig.get("height")
             },
-            "total_signatures": len(signatures_info)
+            "total_signatures": len(entries),
+            "verified_at": report["verified_at"],
+            "cached": report["cached"]
         }
 
     except Exception as e:
@@ -278,4 +353,118 @@ async def extract_and_verify(
             "valid": False,
             "code": "VERIFICATION_ERROR",
             "message": f"Lỗi xác thực: {str(e)}"
-        }
\ No newline at end of file
+        }
+
+
+async def verify_all_signatures(db: AsyncSession, pdf_bytes: bytes, pdf_sha256: Optional[str] = None) -> dict:
+    """
+    Xác thực toàn bộ chữ ký trong PDF
+    - Parse metadata 1 lần (trong thread), public key của mọi signer_id lấy từ cache hoặc 1 truy vấn IN
+    - Kết quả từng chữ ký lấy từ verification_cache nếu file, chữ ký và khoá không đổi;
+      phần còn lại được xác thực song song trên thread pool
+    - Trả về báo cáo từng chữ ký + kết luận chung (valid khi có chữ ký và tất cả hợp lệ)
+    """
+    try:
+        pdf_sha256 = pdf_sha256 or hashlib.sha256(pdf_bytes).hexdigest()
+        entries, full = await load_signature_entries(pdf_bytes, pdf_sha256)
+    except Exception as e:
+        return {"valid": False, "code": "VERIFICATION_ERROR",
+                "message": f"Lỗi xác thực: {str(e)}", "total_signatures": 0, "signatures": []}
+
+    if not entries:
+        return {"valid": False, "code": "NO_SIGNATURES",
+                "message": "Tài liệu không có chữ ký nào", "total_signatures": 0, "signatures": []}
+
+    async with db.begin():
+        public_keys = await get_public_keys(
+            db, {sig.get("signer_id") for sig in entries if sig.get("signer_id")}
+        )
+
+    keys = {index: public_keys.get(str(sig.get("signer_id"))) for index, sig in enumerate(entries)}
+    reports = await verify_signature_entries(pdf_bytes, pdf_sha256, entries, full, keys)
+    reports = [reports[index] for index in range(len(entries))]
+
+    valid_count = sum(1 for report in reports if report["valid"])
+    all_valid = valid_count == len(reports)
+    return {
+        "valid": all_valid,
+        "code": "VERIFIED" if all_valid else "INVALID_SIGNATURES",
+        "message": "Tất cả chữ ký hợp lệ" if all_valid else "Có chữ ký không hợp lệ",
+        "total_signatures": len(reports),
+        "valid_signatures": valid_count,
+        "signatures": [{"index": index, **report} for index, report in enumerate(reports)]
+    }
+
+
+def parse_range_header(range_header: Optional[str], size: int) -> Optional[tuple[int, int]]:
+    """
+    Phân tích header Range (chỉ hỗ trợ 1 khoảng bytes)
+    - Trả về (start, end) với end tính cả byte cuối
+    - Trả về None nếu không có Range, sai cú pháp hoặc nhiều khoảng (trả cả file)
+    - Raise ValueError nếu khoảng không thể đáp ứng (416)
+    """
+    if not range_header:
+        return None
+
+    unit, _, ranges = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in ranges:
+        return None
+
+    start_str, sep, end_str = ranges.strip().partition("-")
+    if not sep or not (start_str or end_str):
+        return None
+    if not (start_str or "0").isdigit() or not (end_str or "0").isdigit():
+        return None
+
+    if not start_str:
+        # bytes=-N: N byte cuối file
+        suffix = int(end_str)
+        if suffix == 0 or size == 0:
+            raise ValueError("Range nằm ngoài kích thước file")
+        return max(size - suffix, 0), size - 1
+
+    start = int(start_str)
+    end = int(end_str) if end_str else size - 1
+    if end_str and start > end:
+        return None
+    if start >= size:
+        raise ValueError("Range nằm ngoài kích thước file")
+
+    return start, min(end, size - 1)
+
+
+@dataclass
+class SpooledUpload:
+    """File upload đã nằm trong SpooledTemporaryFile (RAM, tràn ra đĩa khi lớn) kèm kích thước và SHA-256"""
+    file: BinaryIO
+    size: int
+    sha256: str
+
+    def read(self) -> bytes:
+        """Đọc toàn bộ nội dung (chỉ dùng khi thật sự cần bytes, ví dụ để ký)"""
+        self.file.seek(0)
+        return self.file.read()
+
+
+async def spool_upload(file: UploadFile, max_bytes: int = MAX_UPLOAD_BYTES) -> SpooledUpload:
+    """
+    Đọc file upload theo từng chunk
+    - Dừng và trả 413 ngay khi vượt max_bytes, không đọc hết file
+    - Tính SHA-256 trong cùng một lượt đọc
+    - Không copy dữ liệu: file vẫn nằm trong spool của UploadFile, con trỏ được đưa về đầu
+    """
+    hasher = hashlib.sha256()
+    size = 0
+
+    await file.seek(0)
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        size += len(chunk)
+        if size > max_bytes:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"File không được vượt quá {max_bytes // (1024 * 1024)}MB"
+            )
+        hasher.update(chunk)
+
+    await file.seek(0)
+    return SpooledUpload(file=file.file, size=size, sha256=hasher.hexdigest())
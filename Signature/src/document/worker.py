@@ -0,0 +1,344 @@
+# Xử lý PDF nặng CPU, chạy trong process pool (src/executors.py)
+# Chỉ nhận/trả bytes và kiểu dữ liệu đơn giản để truyền được qua process
+import os
+import hashlib
+import tempfile
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import fitz  # PyMuPDF
+from cryptography.hazmat.primitives.serialization import load_der_private_key
+
+from src.key.utils import sign_bytes
+from src.document.manifest import (
+    SignatureManifest, Rect, MANIFEST_KEY, LEGACY_KEY, SIGNATURE_ALGORITHM, EXCLUSION_PADDING,
+    STAMP_WIDTH, STAMP_HEIGHT, position_rect
+)
+from src.document.spatial import PageGrid
+from src.document.placement import best_slot
+from src.document.pdfmeta import PdfMetadataError, file_buffer, read_info, revision_ends
+
+
+class SignPositionError(ValueError):
+    """Vị trí ký không hợp lệ (trang không tồn tại, chồng lên chữ ký khác)"""
+
+
+def _info_xref(doc: fitz.Document, create: bool = False) -> int:
+    """xref của Info dictionary trong trailer (0 nếu chưa có)"""
+    kind, value = doc.xref_get_key(-1, "Info")
+    if kind == "xref":
+        return int(value.split()[0])
+    if not create:
+        return 0
+
+    xref = doc.get_new_xref()
+    doc.update_object(xref, "<<>>")
+    doc.xref_set_key(-1, "Info", f"{xref} 0 R")
+    return xref
+
+
+def _pdf_text_string(value: str) -> str:
+    """Mã hoá str thành PDF string (literal nếu ASCII, UTF-16BE nếu có ký tự khác)"""
+    if value.isascii():
+        escaped = (
+            value.replace("\\", "\\\\")
+            .replace("(", "\\(")
+            .replace(")", "\\)")
+            .replace("\r", "\\r")
+            .replace("\n", "\\n")
+        )
+        return f"({escaped})"
+    return "<FEFF" + value.encode("utf-16-be").hex().upper() + ">"
+
+
+def read_info_value(doc: fitz.Document, key: str) -> Optional[str]:
+    """Đọc 1 giá trị dạng string trong Info dictionary (key không có dấu /)"""
+    xref = _info_xref(doc)
+    if not xref:
+        return None
+    kind, value = doc.xref_get_key(xref, key)
+    return value if kind == "string" else None
+
+
+def write_info_values(doc: fitz.Document, values: Dict[str, str]) -> None:
+    """Ghi các giá trị string vào Info dictionary, giữ nguyên các key khác"""
+    xref = _info_xref(doc, create=True)
+    for key, value in values.items():
+        doc.xref_set_key(xref, key, _pdf_text_string(value))
+
+def read_manifest(doc: fitz.Document, path: Optional[str] = None, pdf_bytes: Optional[bytes] = None) -> SignatureManifest:
+    """
+    Chữ ký hiện có của doc (v2 trong /SignaturesInfo + v3 trong /SignatureManifest)
+    - Có path/pdf_bytes: đọc Info bằng pdfmeta (trên mmap của file hoặc bytes), cùng bộ đọc với phía xác thực
+    - Không đọc được theo đường nhanh thì lấy qua fitz
+    """
+    if path or pdf_bytes is not None:
+        try:
+            if pdf_bytes is not None:
+                info = read_info(pdf_bytes)
+            else:
+                with open(path, "rb") as f, file_buffer(f) as buffer:
+                    info = read_info(buffer)
+            return SignatureManifest.from_raw(info.get(LEGACY_KEY), info.get(MANIFEST_KEY))
+        except (OSError, PdfMetadataError):
+            pass
+    return SignatureManifest.from_raw(read_info_value(doc, LEGACY_KEY), read_info_value(doc, MANIFEST_KEY))
+
+
+def _filter_blocks(blocks: List[tuple], exclusion_rects: List[Rect]) -> bytes:
+    # Vùng loại trừ nằm trong lưới: mỗi block chỉ so với các vùng ở gần (trang có hàng trăm stamp)
+    grid = PageGrid.from_rects(exclusion_rects)
+    return "\n".join(
+        block[4] for block in blocks
+        if len(block) > 4 and not grid.intersects(tuple(block[:4]))
+    ).encode()
+
+
+def derive_signed_content(
+    page: fitz.Page,
+    exclusion_rects: List[Rect],
+    blocks: Optional[List[tuple]] = None
+) -> bytes:
+    """Nội dung được ký (v3): các text block của trang không giao với vùng loại trừ nào"""
+    if blocks is None:
+        blocks = page.get_text("blocks") or []
+    return _filter_blocks(blocks, exclusion_rects)
+
+
+def auto_stamp_rect(page: fitz.Page, manifest: SignatureManifest, page_number: int, blocks: List[tuple]) -> Optional[Rect]:
+    """
+    Vùng stamp trống tốt nhất trên trang (placement "auto")
+    - Obstacle = text/image block của trang + stamp hiện có, nới EXCLUSION_PADDING
+      -> nội dung đã ký giữ được toàn bộ text của trang
+    """
+    obstacles = [tuple(block[:4]) for block in blocks] + manifest.page_rects(page_number)
+    return best_slot(tuple(page.rect), obstacles, (STAMP_WIDTH, STAMP_HEIGHT), padding=EXCLUSION_PADDING)
+
+
+def derive_signed_contents_sync(
+    pdf_bytes: bytes,
+    jobs: List[Tuple[int, int, List[Rect], List[Rect]]]
+) -> List[Optional[Tuple[bytes, bool]]]:
+    """
+    Dựng lại nội dung đã ký của các chữ ký v3 (chạy trong process con)
+    - Mỗi job là (rev, page, vùng loại trừ lúc ký, vùng mọi stamp trên trang hiện tại)
+    - Trả về (nội dung đã ký, unchanged) theo thứ tự jobs; unchanged = text ngoài mọi stamp
+      của trang ở revision lúc ký và ở bản hiện tại giống nhau (không bị sửa bằng update sau đó)
+    - None nếu revision/trang không đọc được; mỗi revision file[:rev] chỉ mở 1 lần
+    - rev lấy từ manifest (không tin được): chỉ nhận rev kết thúc đúng 1 revision thật (sau %%EOF),
+      không để fitz sửa lỗi và mở các đoạn cắt tuỳ ý của file
+    """
+    results: List[Optional[Tuple[bytes, bool]]] = [None] * len(jobs)
+    by_rev = defaultdict(list)
+    for index, job in enumerate(jobs):
+        by_rev[job[0]].append(index)
+
+    ends = revision_ends(pdf_bytes)
+    current = fitz.open(stream=pdf_bytes, filetype="pdf")
+    current_blocks: Dict[int, List[tuple]] = {}
+    with current:
+        for rev, indices in by_rev.items():
+            if not isinstance(rev, int) or not any(start <= rev <= stop for start, stop in ends):
+                continue
+            try:
+                doc = fitz.open(stream=pdf_bytes[:rev], filetype="pdf")
+            except Exception:
+                continue
+            with doc:
+                for index in indices:
+                    _, page_number, exclusion_rects, stamp_rects = jobs[index]
+                    if not isinstance(page_number, int) or not 1 <= page_number <= min(len(doc), len(current)):
+                        continue
+                    blocks = doc[page_number - 1].get_text("blocks") or []
+                    if page_number not in current_blocks:
+                        current_blocks[page_number] = current[page_number - 1].get_text("blocks") or []
+                    unchanged = (
+                        _filter_blocks(blocks, stamp_rects)
+                        == _filter_blocks(current_blocks[page_number], stamp_rects)
+                    )
+                    results[index] = (_filter_blocks(blocks, exclusion_rects), unchanged)
+
+    return results
+
+
+def find_free_slot_sync(
+    pdf_bytes: bytes,
+    page_number: int,
+    position_x: float,
+    position_y: float
+) -> Optional[Rect]:
+    """
+    Vùng stamp trống gần vị trí ký (x, y) nhất trên trang (chạy trong process con)
+    - Chỉ xét stamp của các chữ ký hiện có (lưới trong manifest), trong khung trang
+    - None nếu trang không còn chỗ; raise SignPositionError nếu trang không tồn tại
+    """
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    with doc:
+        if page_number < 1 or page_number > len(doc):
+            raise SignPositionError("Invalid page number")
+        manifest = read_manifest(doc, pdf_bytes=pdf_bytes)
+        return manifest.free_slot(page_number, position_rect(position_x, position_y), tuple(doc[page_number - 1].rect))
+
+
+def sign_pdf_sync(
+    pdf_bytes: bytes,
+    private_key_der: bytes,
+    signer: str,
+    signer_id: str,
+    page_number: int,
+    position_x: float,
+    position_y: float
+) -> tuple[bytes, Dict]:
+    """
+    Ký + đóng dấu PDF tại 1 vị trí (chạy trong process con)
+    - Trả về (pdf đã ký, mục manifest của chữ ký)
+    - Raise SignPositionError nếu vị trí ký không hợp lệ
+    """
+    signed_pdf, entries = sign_pdf_multi_sync(
+        pdf_bytes, private_key_der, signer, signer_id, [(page_number, position_x, position_y)]
+    )
+    return signed_pdf, entries[0]
+
+
+def sign_pdf_multi_sync(
+    pdf_bytes: bytes,
+    private_key_der: bytes,
+    signer: str,
+    signer_id: str,
+    positions: List[Tuple[int, Optional[float], Optional[float]]]
+) -> tuple[bytes, List[Dict]]:
+    """
+    Ký + đóng dấu PDF tại nhiều vị trí (page, x, y) trong cùng một lượt (chạy trong process con)
+    - x, y là None -> tự chọn vùng trống trên trang (placement "auto")
+    - Mọi vị trí được kiểm tra và ký trên revision trước khi ký, sau đó mới vẽ stamp
+    - Lưu kiểu incremental (append-only): revision trước khi ký là file[:rev], ghi vào manifest v3
+      để bên xác thực dựng lại được nội dung đã ký
+    - Trả về (pdf đã ký, các mục manifest v3 mới theo thứ tự positions: chữ ký base64, trang, vùng stamp,
+      content_hash...) để ghi vào chỉ mục signatures
+    - Raise SignPositionError nếu có vị trí không hợp lệ (cả file không được ký)
+    """
+    # Key được chính hệ thống sinh ra và giải mã -> bỏ bước kiểm tra RSA tốn thời gian
+    private_key = load_der_private_key(private_key_der, password=None, unsafe_skip_rsa_key_validation=True)
+
+    # Incremental save của MuPDF chỉ ghi được vào chính file đã mở
+    with tempfile.TemporaryDirectory(prefix="sign-") as tmp_dir:
+        path = os.path.join(tmp_dir, "document.pdf")
+        with open(path, "wb") as f:
+            f.write(pdf_bytes)
+
+        doc = fitz.open(path)
+        try:
+            if not doc.can_save_incrementally():
+                # File bị MuPDF sửa lỗi khi mở -> ghi lại bản đã sửa trước,
+                # để revision trước khi ký luôn là phần đầu của file kết quả
+                repaired = doc.tobytes()
+                doc.close()
+                with open(path, "wb") as f:
+                    f.write(repaired)
+                doc = fitz.open(path)
+                if not doc.can_save_incrementally():
+                    raise ValueError("PDF không hỗ trợ lưu incremental")
+
+            rev = os.path.getsize(path)
+            manifest = read_manifest(doc, path)
+            stamps = [
+                _sign_position(doc, manifest, private_key, signer, signer_id, rev, page_number, position_x, position_y)
+                for page_number, position_x, position_y in positions
+            ]
+            for page_number, rect in stamps:
+                _draw_stamp(doc[page_number - 1], rect, signer)
+
+            last = manifest.entries[-1]
+            write_info_values(doc, {
+                MANIFEST_KEY: manifest.manifest_json(),
+                "LastSignature": last["signature"],
+                "LastSigner": signer,
+                "LastSignerID": signer_id,
+                "LastSignDate": last["sign_date"],
+            })
+
+            doc.save(path, incremental=True, encryption=fitz.PDF_ENCRYPT_KEEP)
+            doc.close()
+            with open(path, "rb") as f:
+                return f.read(), manifest.entries[-len(positions):]
+        finally:
+            if not doc.is_closed:
+                doc.close()
+
+
+def _sign_position(
+    doc: fitz.Document,
+    manifest: SignatureManifest,
+    private_key,
+    signer: str,
+    signer_id: str,
+    rev: int,
+    page_number: int,
+    position_x: Optional[float],
+    position_y: Optional[float]
+) -> Tuple[int, Rect]:
+    """Kiểm tra vị trí, ký nội dung trang và thêm mục v3 vào manifest -> (trang, vùng stamp)"""
+    # Kiểm tra trang
+    if page_number < 1 or page_number > len(doc):
+        raise SignPositionError("Invalid page number")
+    page = doc[page_number - 1]
+    blocks = page.get_text("blocks") or []
+
+    # Kích thước cố định cho chữ ký
+    if position_x is None or position_y is None:
+        new_rect = auto_stamp_rect(page, manifest, page_number, blocks)
+        if new_rect is None:
+            raise SignPositionError("No free space on page for automatic placement")
+    else:
+        new_rect = position_rect(position_x, position_y)
+    x, y = new_rect[0], new_rect[1]
+
+    # Kiểm tra chồng chéo với các chữ ký hiện có (kể cả vị trí trước đó trong cùng lượt)
+    if manifest.overlaps(page_number, new_rect):
+        raise SignPositionError("Signature position overlaps existing signature")
+
+    # Nội dung ký: text của trang ngoài vùng stamp mới và các stamp trước đó
+    clean_content = derive_signed_content(page, manifest.exclusion_rects(page_number, new_rect), blocks)
+    signature = sign_bytes(private_key, clean_content)
+
+    manifest.append({
+        "signature": signature,
+        "signer": signer,
+        "signer_id": signer_id,
+        "sign_date": datetime.now().isoformat(),
+        "content_hash": hashlib.sha256(clean_content).hexdigest(),
+        "algorithm": SIGNATURE_ALGORITHM,
+        "rev": rev,
+        "page": page_number,
+        "x": x,
+        "y": y,
+        "width": new_rect[2] - x,
+        "height": new_rect[3] - y,
+    })
+    return page_number, new_rect
+
+
+def _draw_stamp(page: fitz.Page, rect: Rect, signer: str) -> None:
+    """Vẽ khung stamp + người ký + thời gian"""
+    x, y = rect[0], rect[1]
+    stamp_rect = fitz.Rect(rect)
+    page.draw_rect(stamp_rect, color=(1, 1, 1), fill=(1, 1, 1), overlay=True)
+    page.draw_rect(stamp_rect, color=(0, 0, 0), fill=None, width=1, overlay=True)
+
+    page.insert_text(
+        (x + 10, y + 20),
+        f"From: {signer}",
+        fontname="helv",
+        fontsize=14,
+        color=(0, 0, 0),
+        overlay=True
+    )
+    page.insert_text(
+        (x + 10, y + 40),
+        f"Date: {datetime.now().strftime('%d/%m/%Y %H:%M')}",
+        fontname="helv",
+        fontsize=14,
+        color=(0, 0, 0),
+        overlay=True
+    )
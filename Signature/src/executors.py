@@ -0,0 +1,143 @@
+# Executor cho các tác vụ CPU-bound, tách khỏi event loop
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable
+
+from fastapi import HTTPException, status
+
+from src import metrics
+from src.config import (
+    PDF_POOL_SIZE, PDF_POOL_QUEUE_DEPTH,
+    AUTH_POOL_SIZE, AUTH_POOL_QUEUE_DEPTH, AUTH_QUEUE_TIMEOUT
+)
+
+
+_pdf_pool: ProcessPoolExecutor = None
+_pdf_in_flight = 0
+
+_auth_pool: ThreadPoolExecutor = None
+_auth_slots: asyncio.Semaphore = None
+_auth_waiting = 0
+_auth_running = 0
+_auth_rejected = 0
+
+
+def get_pdf_pool() -> ProcessPoolExecutor:
+    """
+    Process pool cho xử lý PDF
+    - Dùng "spawn" để process con không kế thừa thread/event loop của worker uvicorn
+    - Chỉ bytes và dữ liệu đơn giản được truyền qua lại giữa các process
+    """
+    global _pdf_pool
+    if _pdf_pool is None:
+        _pdf_pool = ProcessPoolExecutor(
+            max_workers=PDF_POOL_SIZE,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _pdf_pool
+
+
+async def run_in_pdf_pool(fn: Callable[..., Any], *args: Any) -> Any:
+    """
+    Chạy fn(*args) trong process pool và chờ kết quả
+    - Tối đa PDF_POOL_SIZE việc đang chạy + PDF_POOL_QUEUE_DEPTH việc chờ
+    - Quá giới hạn -> 503 ngay thay vì xếp hàng vô hạn
+    """
+    global _pdf_pool, _pdf_in_flight
+
+    if _pdf_in_flight >= PDF_POOL_SIZE + PDF_POOL_QUEUE_DEPTH:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Hệ thống đang bận xử lý PDF, vui lòng thử lại sau",
+            headers={"Retry-After": "1"}
+        )
+
+    _pdf_in_flight += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_pdf_pool(), fn, *args)
+    except BrokenProcessPool:
+        # Process con chết (OOM, segfault trong thư viện PDF) -> tạo pool mới cho lần sau
+        _pdf_pool = None
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Tiến trình xử lý PDF bị lỗi, vui lòng thử lại",
+            headers={"Retry-After": "1"}
+        )
+    finally:
+        _pdf_in_flight -= 1
+
+
+def get_auth_pool() -> ThreadPoolExecutor:
+    """Thread pool riêng cho bcrypt, không dùng chung default executor với phần còn lại"""
+    global _auth_pool, _auth_slots
+    if _auth_pool is None:
+        _auth_pool = ThreadPoolExecutor(max_workers=AUTH_POOL_SIZE, thread_name_prefix="auth")
+    if _auth_slots is None:
+        _auth_slots = asyncio.Semaphore(AUTH_POOL_SIZE)
+    return _auth_pool
+
+
+def _auth_overloaded() -> HTTPException:
+    global _auth_rejected
+    _auth_rejected += 1
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Quá nhiều yêu cầu xác thực, vui lòng thử lại sau",
+        headers={"Retry-After": "1"}
+    )
+
+
+async def run_in_auth_pool(fn: Callable[..., Any], *args: Any) -> Any:
+    """
+    Chạy fn(*args) trong auth thread pool và chờ kết quả
+    - Tối đa AUTH_POOL_SIZE việc chạy cùng lúc, AUTH_POOL_QUEUE_DEPTH việc chờ
+    - Hàng đợi đầy hoặc chờ quá AUTH_QUEUE_TIMEOUT giây -> 429
+      (đợt dò mật khẩu hàng loạt bị từ chối sớm, không làm nghẽn các endpoint khác)
+    """
+    global _auth_waiting, _auth_running
+
+    pool = get_auth_pool()
+    if _auth_waiting >= AUTH_POOL_QUEUE_DEPTH:
+        raise _auth_overloaded()
+
+    _auth_waiting += 1
+    try:
+        await asyncio.wait_for(_auth_slots.acquire(), timeout=AUTH_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise _auth_overloaded()
+    finally:
+        _auth_waiting -= 1
+
+    _auth_running += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(pool, fn, *args)
+    finally:
+        _auth_running -= 1
+        _auth_slots.release()
+
+
+def auth_pool_stats() -> dict:
+    return {
+        "size": AUTH_POOL_SIZE,
+        "running": _auth_running,
+        "waiting": _auth_waiting,
+        "rejected": _auth_rejected,
+    }
+
+
+metrics.register("auth_pool", auth_pool_stats)
+
+
+def shutdown_executors() -> None:
+    global _pdf_pool, _auth_pool, _auth_slots
+    if _pdf_pool is not None:
+        _pdf_pool.shutdown(wait=True, cancel_futures=True)
+        _pdf_pool = None
+    if _auth_pool is not None:
+        _auth_pool.shutdown(wait=True, cancel_futures=True)
+        _auth_pool = None
+        _auth_slots = None
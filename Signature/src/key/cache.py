@@ -0,0 +1,175 @@
+# Cache private key đã giải mã (tránh PBKDF2 + AES-GCM + load PEM mỗi lần ký)
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+
+from cryptography.hazmat.primitives.asymmetric.rsa import RSAPrivateKey, RSAPublicKey
+from cryptography.hazmat.primitives.serialization import load_pem_public_key
+
+from src import metrics
+from src.config import KEY_CACHE_MAX_SIZE, KEY_CACHE_TTL_SECONDS, PUBLIC_KEY_CACHE_MAX_SIZE, PUBLIC_KEY_CACHE_TTL_SECONDS
+
+
+class PrivateKeyCache:
+    """
+    Cache LRU + TTL các RSAPrivateKey đã load, key theo key_id
+    - Hết TTL hoặc vượt max_size -> bỏ entry cũ nhất
+    - Khi bị loại, cache chỉ bỏ tham chiếu của chính nó (nơi khác đang dùng key vẫn giữ được);
+      OpenSSL giải phóng các thành phần bí mật bằng BN_clear_free (ghi đè 0) khi object được thu hồi.
+      Python không cho xoá trực tiếp bộ nhớ của object nên không có zeroize chủ động.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[int, tuple[float, RSAPrivateKey]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key_id: int) -> Optional[RSAPrivateKey]:
+        with self._lock:
+            entry = self._entries.get(key_id)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, private_key = entry
+            if expires_at <= time.monotonic():
+                self._evict(key_id)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key_id)
+            self.hits += 1
+            return private_key
+
+    def put(self, key_id: int, private_key: RSAPrivateKey) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key_id] = (time.monotonic() + self.ttl_seconds, private_key)
+            self._entries.move_to_end(key_id)
+            while len(self._entries) > self.max_size:
+                self._evict(next(iter(self._entries)))
+
+    def invalidate(self, key_id: int) -> None:
+        """Xoá ngay key khỏi cache (ví dụ khi khoá bị thu hồi)"""
+        with self._lock:
+            if key_id in self._entries:
+                self._evict(key_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            for key_id in list(self._entries):
+                self._evict(key_id)
+
+    def _evict(self, key_id: int) -> None:
+        self._entries.pop(key_id)
+        self.evictions += 1
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+private_key_cache = PrivateKeyCache(KEY_CACHE_MAX_SIZE, KEY_CACHE_TTL_SECONDS)
+metrics.register("private_key_cache", private_key_cache.stats)
+
+
+@dataclass(frozen=True)
+class PublicKeyEntry:
+    """Public key của 1 người dùng: PEM gốc + object đã load + fingerprint (sha256 của PEM)"""
+    key_id: Optional[int]
+    pem: bytes
+    public_key: RSAPublicKey
+    revoked_at: Optional[datetime]
+    fingerprint: str
+
+    @classmethod
+    def from_pem(cls, pem: bytes, key_id: Optional[int] = None, revoked_at: Optional[datetime] = None) -> "PublicKeyEntry":
+        """Load PEM (raise ValueError nếu sai định dạng)"""
+        return cls(key_id, pem, load_pem_public_key(pem), revoked_at, hashlib.sha256(pem).hexdigest())
+
+
+class PublicKeyCache:
+    """
+    Cache LRU + TTL các public key đã load, key theo user_id (str)
+    - Dùng khi xác thực chữ ký: bỏ qua truy vấn keys + load_pem_public_key với người ký quen thuộc
+    - TTL giới hạn thời gian một thay đổi trên bảng keys từ instance khác chưa được thấy
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple[float, PublicKeyEntry]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_many(self, user_ids: Iterable[str]) -> Dict[str, PublicKeyEntry]:
+        """Các entry còn hạn trong cache, user_id không có trong kết quả là miss"""
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for user_id in user_ids:
+                entry = self._entries.get(user_id)
+                if entry is None or entry[0] <= now:
+                    if entry is not None:
+                        del self._entries[user_id]
+                        self.evictions += 1
+                    self.misses += 1
+                    continue
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                found[user_id] = entry[1]
+        return found
+
+    def put(self, user_id: str, entry: PublicKeyEntry) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl_seconds, entry)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, user_id: str) -> None:
+        with self._lock:
+            if self._entries.pop(user_id, None) is not None:
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+public_key_cache = PublicKeyCache(PUBLIC_KEY_CACHE_MAX_SIZE, PUBLIC_KEY_CACHE_TTL_SECONDS)
+metrics.register("public_key_cache", public_key_cache.stats)
@@ -0,0 +1,116 @@
+# Pool cặp khoá RSA sinh sẵn để đăng ký không phải chờ sinh khoá
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Optional
+
+from src import metrics
+from src.config import KEYPAIR_POOL_SIZE, KEYPAIR_POOL_REFILL_INTERVAL
+from src.key.service import generate_rsa_key_pair
+from src.key.utils import encrypt_private_key_envelope, base_public_key
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class PreparedKeyPair:
+    """Cặp khoá đã sẵn sàng lưu DB: public key (base64 PEM) + private key đã mã hoá envelope"""
+    public_key: str
+    encrypted: dict
+
+
+def prepare_key_pair() -> PreparedKeyPair:
+    """Sinh RSA-2048 + mã hoá private key (CPU-bound, chạy ngoài event loop)"""
+    private_key, public_key = generate_rsa_key_pair()
+    return PreparedKeyPair(
+        public_key=base_public_key(public_key),
+        encrypted=encrypt_private_key_envelope(private_key)
+    )
+
+
+class KeyPairPool:
+    """
+    Hàng đợi có giới hạn các cặp khoá sinh sẵn
+    - Task nền giữ pool đầy, mỗi lần sinh 1 cặp trong thread rồi nghỉ refill_interval
+    - Private key trong pool luôn ở dạng đã mã hoá, không giữ bản rõ trong bộ nhớ
+    - Pool rỗng -> người gọi tự sinh trực tiếp (fallback)
+    """
+
+    def __init__(self, max_size: int, refill_interval: float):
+        self.max_size = max_size
+        self.refill_interval = refill_interval
+        self._pairs: "deque[PreparedKeyPair]" = deque()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+        self.generated = 0
+        self._generate_seconds = 0.0
+
+    def pop(self) -> Optional[PreparedKeyPair]:
+        try:
+            pair = self._pairs.popleft()
+            self.hits += 1
+        except IndexError:
+            pair = None
+            self.misses += 1
+        self._wakeup.set()
+        return pair
+
+    async def acquire(self) -> PreparedKeyPair:
+        """Lấy 1 cặp khoá từ pool, pool rỗng thì sinh ngay (trong thread)"""
+        pair = self.pop()
+        if pair is None:
+            pair = await asyncio.to_thread(prepare_key_pair)
+        return pair
+
+    def start(self) -> None:
+        if self.max_size > 0 and self._task is None:
+            self._task = asyncio.create_task(self._refill_loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._pairs.clear()
+
+    async def _refill_loop(self) -> None:
+        while True:
+            try:
+                while len(self._pairs) < self.max_size:
+                    started = time.perf_counter()
+                    pair = await asyncio.to_thread(prepare_key_pair)
+                    self._generate_seconds += time.perf_counter() - started
+                    self.generated += 1
+                    self._pairs.append(pair)
+                    await asyncio.sleep(self.refill_interval)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Sinh cặp khoá cho pool thất bại: %s", e)
+                await asyncio.sleep(max(self.refill_interval, 1.0))
+                continue
+
+            self._wakeup.clear()
+            await self._wakeup.wait()
+
+    def stats(self) -> dict:
+        return {
+            "depth": len(self._pairs),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "generated": self.generated,
+            "avg_generate_ms": round(self._generate_seconds / self.generated * 1000, 2) if self.generated else 0.0,
+            "refill_rate_per_s": round(self.generated / self._generate_seconds, 2) if self._generate_seconds else 0.0,
+        }
+
+
+key_pair_pool = KeyPairPool(KEYPAIR_POOL_SIZE, KEYPAIR_POOL_REFILL_INTERVAL)
+metrics.register("key_pair_pool", key_pair_pool.stats)
@@ -0,0 +1,117 @@
+# Job re-wrap private key sang KEK hiện tại (xoay master key, chuyển key cũ sang envelope)
+# Chạy tay: python -m src.key.rewrap
+import asyncio
+import logging
+from typing import Dict
+
+from sqlalchemy import select, or_
+
+from src.config import AES_KEY, AES_KEY_PREVIOUS, KEY_REWRAP_BATCH_SIZE, KEY_REWRAP_BATCH_PAUSE
+from src.database import AsyncSessionLocal
+from src.key.utils import get_keyring, decrypt_private_key, encrypt_private_key_envelope
+from src.models import Key
+from cryptography.hazmat.primitives.serialization import load_pem_private_key
+
+logger = logging.getLogger(__name__)
+
+
+# Các cột của Key mà re-wrap đọc/ghi
+KEY_FIELDS = ("encrypted_private", "salt", "nonce", "wrapped_dek", "kek_version")
+
+
+def _legacy_decrypt(fields: Dict) -> bytes:
+    """Key cũ mã hoá bằng PBKDF2(AES_KEY, salt) -> thử master key hiện tại rồi tới key trước đó"""
+    last_error = None
+    for master_key in (AES_KEY, AES_KEY_PREVIOUS):
+        if not master_key:
+            continue
+        try:
+            return decrypt_private_key(
+                {"encrypted_key": fields["encrypted_private"], "salt": fields["salt"], "nonce": fields["nonce"]},
+                master_key
+            )
+        except ValueError as e:
+            last_error = e
+    raise ValueError("Không giải mã được key cũ") from last_error
+
+
+def rewrap_values(fields: Dict) -> Dict:
+    """
+    Giá trị mới của các cột KEY_FIELDS theo KEK hiện tại (hàm sync, CPU-bound: PBKDF2/RSA)
+    - fields: giá trị hiện tại của KEY_FIELDS, không đụng tới ORM
+    """
+    keyring = get_keyring()
+
+    if fields["wrapped_dek"]:
+        # Chỉ wrap lại DEK, phần private key đã mã hoá giữ nguyên
+        dek = keyring.unwrap(fields["wrapped_dek"], fields["kek_version"])
+        return {"wrapped_dek": keyring.wrap(dek), "kek_version": keyring.current_version}
+
+    # Key cũ: giải mã 1 lần bằng PBKDF2 rồi chuyển sang envelope
+    private_key = load_pem_private_key(_legacy_decrypt(fields), password=None)
+    encrypted_data = encrypt_private_key_envelope(private_key, keyring)
+    return {
+        "encrypted_private": encrypted_data["encrypted_key"],
+        "nonce": encrypted_data["nonce"],
+        "wrapped_dek": encrypted_data["wrapped_dek"],
+        "kek_version": encrypted_data["kek_version"],
+        "salt": None,
+    }
+
+
+async def rewrap_key(key: Key) -> None:
+    """Cập nhật 1 bản ghi Key sang KEK hiện tại: tính toán trong thread, chỉ gán cột trên event loop"""
+    values = await asyncio.to_thread(rewrap_values, {name: getattr(key, name) for name in KEY_FIELDS})
+    for name, value in values.items():
+        setattr(key, name, value)
+
+
+async def rewrap_keys(
+    batch_size: int = KEY_REWRAP_BATCH_SIZE,
+    batch_pause: float = KEY_REWRAP_BATCH_PAUSE
+) -> dict:
+    """
+    Re-wrap toàn bộ key chưa dùng KEK hiện tại, theo từng lô
+    - Mỗi lô là 1 transaction ngắn, khoá dòng bằng FOR UPDATE SKIP LOCKED
+      nên có thể chạy song song với traffic bình thường
+    - Duyệt theo key_id tăng dần: dòng lỗi được bỏ qua, job luôn tiến tới cuối bảng
+    """
+    current_version = get_keyring().current_version
+    last_key_id = 0
+    stats = {"rewrapped": 0, "failed": 0}
+
+    while True:
+        async with AsyncSessionLocal() as db:
+            async with db.begin():
+                result = await db.execute(
+                    select(Key)
+                    .where(Key.key_id > last_key_id)
+                    .where(or_(Key.kek_version.is_(None), Key.kek_version != current_version))
+                    .order_by(Key.key_id)
+                    .limit(batch_size)
+                    .with_for_update(skip_locked=True)
+                )
+                keys = result.scalars().all()
+                if not keys:
+                    break
+
+                for key in keys:
+                    try:
+                        await rewrap_key(key)
+                        stats["rewrapped"] += 1
+                    except Exception as e:
+                        logger.error("Re-wrap key %s thất bại: %s", key.key_id, e)
+                        stats["failed"] += 1
+                    last_key_id = key.key_id
+
+        if len(keys) < batch_size:
+            break
+        await asyncio.sleep(batch_pause)
+
+    logger.info("Re-wrap xong: %s", stats)
+    return stats
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    print(asyncio.run(rewrap_keys()))
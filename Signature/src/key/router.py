@@ -2,7 +2,7 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from src.database import get_db
-from src.key.service import get_public_key, get_private_key, sign_data, verify_data, generate_rsa_key_pair
+from src.key.service import get_public_key, get_private_key, sign_data, verify_data, generate_rsa_key_pair, revoke_key
 from src.auth.dependencies import get_current_user_id
 from src.key.schemas import VerifyRequest, SignRequest
 from dotenv import load_dotenv
@@ -73,6 +73,29 @@ async def verify(
     return verify
 
 
+@router.post("/revoke")
+async def revoke(
+    user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Thu hồi khoá hiện tại của người dùng
+    - Khoá bị xoá khỏi cache ngay lập tức, không thể dùng để ký nữa
+    """
+    key_id = await revoke_key(db, user_id)
+    if key_id is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Not found active key"
+        )
+
+    return {
+        "status": True,
+        "message": "Revoke key success",
+        "key_id": key_id
+    }
+
+
 @router.post("/create-key")
 async def create(
     user_id: str = Depends(get_current_user_id),
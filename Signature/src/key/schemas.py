@@ -18,8 +18,10 @@ class VerifyRequest(BaseModel):
 class KeyCreate(KeyBase):
     public_key: str
     encrypted_private: str
-    salt: str
+    salt: Optional[str] = None
     nonce: str
+    wrapped_dek: Optional[str] = None
+    kek_version: Optional[int] = None
 
 class KeyResponse(KeyBase):
     key_id: int
@@ -1,12 +1,17 @@
 # Logic sinh khoá, mã hoá private key
 from cryptography.hazmat.primitives.asymmetric import rsa
-from src.key.utils import decrypt_private_key
+from src.key.utils import decrypt_private_key, decrypt_private_key_envelope, sign_bytes
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from src.models import Key
+from sqlalchemy import select, update, func
+from src.models import Key, User
+from src.key.cache import private_key_cache, public_key_cache, PublicKeyEntry
+from typing import Dict, Iterable, Optional
+import asyncio
 import base64
+import uuid
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.asymmetric import padding
+from cryptography.hazmat.primitives.asymmetric.rsa import RSAPrivateKey
 from cryptography.hazmat.primitives.serialization import load_pem_private_key, load_pem_public_key
 from src.key.schemas import PublicResponse, PrivateResponse
 from cryptography.exceptions import InvalidSignature
@@ -33,6 +38,16 @@ async def get_key(db: AsyncSession, user_id: str):
     return result.scalar_one_or_none()
 
 
+async def get_user_with_key(db: AsyncSession, user_id: str):
+    """User và Key của user trong 1 truy vấn -> (User, Key | None), None nếu không có user"""
+    result = await db.execute(
+        select(User, Key)
+        .outerjoin(Key, Key.user_id == User.user_id)
+        .where(User.user_id == user_id)
+    )
+    return result.first()
+
+
 async def get_public_key(db: AsyncSession, user_id: str):
     """
     Lấy public key của người dùng hiện tại
@@ -53,17 +68,57 @@ async def get_public_key(db: AsyncSession, user_id: str):
     return public_key
 
 
-# Get private key from db and decode
-async def get_private_key(db: AsyncSession, user_id: str, aes_key: str):
+async def get_public_keys(db: AsyncSession, user_ids: Iterable[str]) -> Dict[str, PublicKeyEntry]:
+    """
+    Public key đã load của nhiều người dùng -> {user_id: PublicKeyEntry}
+    - Lấy từ public_key_cache trước, phần còn thiếu đọc bằng 1 truy vấn IN rồi đưa vào cache
+    - user_id không đúng định dạng UUID hoặc không có khoá thì không có trong kết quả
+    """
+    valid_ids = set()
+    for user_id in user_ids:
+        try:
+            valid_ids.add(str(uuid.UUID(str(user_id))))
+        except ValueError:
+            continue
+
+    entries = public_key_cache.get_many(valid_ids)
+    missing = valid_ids - entries.keys()
+    if not missing:
+        return entries
 
-    key = await db.execute(select(Key).where(Key.user_id == user_id))
-    key = key.scalar_one_or_none()
+    result = await db.execute(
+        select(Key.user_id, Key.key_id, Key.public_key, Key.revoked_at)
+        .where(Key.user_id.in_([uuid.UUID(user_id) for user_id in missing]))
+    )
+    for user_id, key_id, public_key, revoked_at in result.all():
+        if not public_key:
+            continue
+        try:
+            entry = PublicKeyEntry.from_pem(base64.b64decode(public_key), key_id, revoked_at)
+        except ValueError:
+            continue
+        entries[str(user_id)] = entry
+        public_key_cache.put(str(user_id), entry)
 
-    if not key:
-        raise ValueError("Không tìm thấy khoá cho người dùng này")
-    
+    return entries
+
+
+def decrypt_key_row(key: Key, aes_key: str) -> bytes:
+    """
+    Giải mã private key (PEM) từ bản ghi Key
+    - Key mới: unwrap DEK bằng KEK (1 phép AES) rồi AES-GCM
+    - Key cũ (chưa re-wrap): PBKDF2 từ aes_key + salt
+    """
     try:
-        private_key = decrypt_private_key(
+        if key.wrapped_dek:
+            return decrypt_private_key_envelope({
+                "encrypted_key": key.encrypted_private,
+                "nonce": key.nonce,
+                "wrapped_dek": key.wrapped_dek,
+                "kek_version": key.kek_version
+            })
+
+        return decrypt_private_key(
             {
                 "encrypted_key": key.encrypted_private,
                 "salt": key.salt,
@@ -71,34 +126,83 @@ async def get_private_key(db: AsyncSession, user_id: str, aes_key: str):
             },
             aes_key
         )
-
-        return private_key
-    
     except ValueError as e:
         raise ValueError("Giải mã thất bại") from e
     except Exception as e:
         raise ValueError(f"Lỗi khi giải mã private key: {str(e)}") from e
 
 
+# Get private key from db and decode
+async def get_private_key(db: AsyncSession, user_id: str, aes_key: str):
+
+    key = await db.execute(select(Key).where(Key.user_id == user_id))
+    key = key.scalar_one_or_none()
+
+    if not key:
+        raise ValueError("Không tìm thấy khoá cho người dùng này")
+    
+    return decrypt_key_row(key, aes_key)
+
+
+def _load_private_key(key: Key, aes_key: str) -> RSAPrivateKey:
+    return load_pem_private_key(decrypt_key_row(key, aes_key), password=None)
+
+
+async def load_signing_key(key: Key, aes_key: str) -> RSAPrivateKey:
+    """
+    Private key đã load từ bản ghi Key, ưu tiên lấy từ cache theo key_id
+    - Khoá đã thu hồi (revoked_at) bị xoá khỏi cache ngay và không được dùng
+    - Cache miss: giải mã (PBKDF2 + AES-GCM) và load PEM trong thread
+    """
+    if key.revoked_at is not None:
+        private_key_cache.invalidate(key.key_id)
+        raise ValueError("Khoá của người dùng đã bị thu hồi")
+
+    private_key = private_key_cache.get(key.key_id)
+    if private_key is None:
+        private_key = await asyncio.to_thread(_load_private_key, key, aes_key)
+        private_key_cache.put(key.key_id, private_key)
+
+    return private_key
+
+
+async def get_signing_key(db: AsyncSession, user_id: str, aes_key: str) -> tuple[int, RSAPrivateKey]:
+    """Trả về (key_id, private key đã load) của người dùng"""
+    key = await db.execute(select(Key).where(Key.user_id == user_id))
+    key = key.scalar_one_or_none()
+
+    if not key:
+        raise ValueError("Không tìm thấy khoá cho người dùng này")
+
+    return key.key_id, await load_signing_key(key, aes_key)
+
+
+async def revoke_key(db: AsyncSession, user_id: str) -> Optional[int]:
+    """Thu hồi khoá của người dùng, trả về key_id (None nếu không có khoá còn hiệu lực)"""
+    result = await db.execute(
+        update(Key)
+        .where((Key.user_id == user_id) & (Key.revoked_at.is_(None)))
+        .values(revoked_at=func.now())
+        .returning(Key.key_id)
+    )
+    key_id = result.scalar_one_or_none()
+    await db.commit()
+
+    if key_id is not None:
+        private_key_cache.invalidate(key_id)
+        public_key_cache.invalidate(str(user_id))
+    return key_id
+
+
 # hieu suất, 
 # Ký số
 async def sign_data(db: AsyncSession, user_id: str, aes_key: str, data: bytes):
     """
     Ký dữ liệu bằng private key của người dùng
     """
-    private_key = await get_private_key(db, user_id, aes_key)
-    private_key_obj = load_pem_private_key(private_key, password=None)
-
-    signature = private_key_obj.sign(
-        data,
-        padding.PSS(
-            mgf=padding.MGF1(hashes.SHA1()),
-            salt_length=padding.PSS.MAX_LENGTH
-        ),
-        hashes.SHA1() # sử dụng SHA-1 để hash dữ liệu trước khi ký
-    )
-    
-    return base64.b64encode(signature).decode()
+    _, private_key_obj = await get_signing_key(db, user_id, aes_key)
+
+    return sign_bytes(private_key_obj, data)
 
 
 # Xác thực chữ ký
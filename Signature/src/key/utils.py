@@ -4,6 +4,10 @@ from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import padding
+from cryptography.hazmat.primitives.keywrap import aes_key_wrap, aes_key_unwrap, InvalidUnwrap
+from cryptography.exceptions import InvalidSignature
+from src.config import AES_KEY, KEK_VERSION, AES_KEY_PREVIOUS, KEK_PREVIOUS_VERSION, KEK_SALT
 import base64
 import os
 
@@ -15,6 +19,48 @@ def base_public_key(public_key):
     )
     return base64.b64encode(pem_bytes).decode()
  
+def private_key_der(private_key) -> bytes:
+    """ Serialize private key (PKCS8 DER, không mã hoá) để gửi sang process ký PDF """
+    return private_key.private_bytes(
+        encoding = serialization.Encoding.DER,
+        format = serialization.PrivateFormat.PKCS8,
+        encryption_algorithm = serialization.NoEncryption()
+    )
+
+
+# ----------------------------
+# Ký dữ liệu (RSA-PSS + SHA-1)
+# ----------------------------
+def sign_bytes(private_key, data: bytes) -> str:
+    """ Ký data bằng private key đã load, trả về chữ ký base64 """
+    signature = private_key.sign(
+        data,
+        padding.PSS(
+            mgf=padding.MGF1(hashes.SHA1()),
+            salt_length=padding.PSS.MAX_LENGTH
+        ),
+        hashes.SHA1() # sử dụng SHA-1 để hash dữ liệu trước khi ký
+    )
+    return base64.b64encode(signature).decode()
+
+
+def verify_bytes(public_key, data: bytes, signature: str) -> bool:
+    """ Xác thực chữ ký base64 bằng public key đã load (cùng thuật toán với sign_bytes) """
+    try:
+        public_key.verify(
+            base64.b64decode(signature),
+            data,
+            padding.PSS(
+                mgf=padding.MGF1(hashes.SHA1()),
+                salt_length=padding.PSS.MAX_LENGTH
+            ),
+            hashes.SHA1()
+        )
+        return True
+    except (InvalidSignature, ValueError, TypeError):
+        return False
+
+
 # ----------------------------
 # Tạo key từ password
 # ----------------------------
@@ -87,3 +133,90 @@ def decrypt_private_key(encrypted_data: dict, aes_key: str):
     
     return private_pem
 
+
+
+
+# ----------------------------
+# Envelope encryption
+# ----------------------------
+class KeyRing:
+    """
+    Các KEK (key-encryption key) theo version
+    - Mỗi KEK được dẫn xuất bằng PBKDF2 đúng 1 lần khi khởi tạo
+    - Mỗi private key được mã hoá bằng DEK riêng, DEK được wrap bằng KEK (AES key wrap)
+      -> giải mã chỉ tốn 1 lần unwrap + 1 lần AES-GCM, không chạy PBKDF2
+    """
+
+    def __init__(self, master_keys: dict, current_version: int):
+        if current_version not in master_keys:
+            raise ValueError("Không tìm thấy master key cho KEK hiện tại")
+        self.current_version = current_version
+        self._keks = {
+            version: _derive_key(master_key, f"{KEK_SALT}:{version}".encode())
+            for version, master_key in master_keys.items()
+        }
+
+    def wrap(self, dek: bytes) -> str:
+        """Wrap DEK bằng KEK hiện tại (base64)"""
+        return base64.b64encode(aes_key_wrap(self._keks[self.current_version], dek)).decode()
+
+    def unwrap(self, wrapped_dek: str, version: int) -> bytes:
+        kek = self._keks.get(version)
+        if kek is None:
+            raise ValueError(f"Không có KEK version {version}")
+        try:
+            return aes_key_unwrap(kek, base64.b64decode(wrapped_dek))
+        except InvalidUnwrap as e:
+            raise ValueError("Unwrap DEK thất bại") from e
+
+
+_keyring: KeyRing = None
+
+
+def get_keyring() -> KeyRing:
+    """KeyRing dùng chung, dẫn xuất từ AES_KEY (+ AES_KEY_PREVIOUS khi đang xoay key)"""
+    global _keyring
+    if _keyring is None:
+        if not AES_KEY:
+            raise ValueError("Not found aes key")
+        master_keys = {KEK_VERSION: AES_KEY}
+        if AES_KEY_PREVIOUS and KEK_PREVIOUS_VERSION != KEK_VERSION:
+            master_keys[KEK_PREVIOUS_VERSION] = AES_KEY_PREVIOUS
+        _keyring = KeyRing(master_keys, KEK_VERSION)
+    return _keyring
+
+
+def encrypt_private_key_envelope(private_key, keyring: KeyRing = None) -> dict:
+    keyring = keyring or get_keyring()
+
+    # Serialize private key 
+    private_pem = private_key.private_bytes(
+        encoding = serialization.Encoding.PEM,
+        format = serialization.PrivateFormat.PKCS8,
+        encryption_algorithm = serialization.NoEncryption()
+    )
+
+    # DEK ngẫu nhiên cho riêng key này
+    dek = AESGCM.generate_key(bit_length=256)
+    nonce = os.urandom(12)
+    encrypted_data = AESGCM(dek).encrypt(nonce, private_pem, None)
+
+    return {
+        "encrypted_key": base64.b64encode(encrypted_data).decode(),
+        "nonce": base64.b64encode(nonce).decode(),
+        "wrapped_dek": keyring.wrap(dek),
+        "kek_version": keyring.current_version
+    }
+
+
+def decrypt_private_key_envelope(encrypted_data: dict, keyring: KeyRing = None) -> bytes:
+    keyring = keyring or get_keyring()
+
+    dek = keyring.unwrap(encrypted_data["wrapped_dek"], encrypted_data["kek_version"])
+    nonce = base64.b64decode(encrypted_data["nonce"])
+    encrypted_key = base64.b64decode(encrypted_data["encrypted_key"])
+
+    try:
+        return AESGCM(dek).decrypt(nonce, encrypted_key, None)
+    except Exception as e:
+        raise ValueError("Giải mã thất bại") from e
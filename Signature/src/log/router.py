@@ -1 +1,32 @@
-# API tạo khoá, thu hồi khoá
+# API xem activity log
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+
+from src.database import get_db
+from src.auth.dependencies import get_current_user_id
+from src.log.schemas import ActivityLogResponse, ActivityType
+from src.log.service import list_activity_logs
+
+router = APIRouter(tags=["Log"])
+
+
+@router.get("/", response_model=List[ActivityLogResponse])
+async def get_activity_logs(
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="Giá trị X-Next-Cursor của trang trước"),
+    activity_type: Optional[ActivityType] = Query(None, description="Lọc theo loại (SIGN, VERIFY, SHARE, UPLOAD, DOWNLOAD)"),
+    user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db),
+):
+    """Activity log của người dùng hiện tại, mới nhất trước, phân trang theo cursor"""
+    try:
+        logs, next_cursor = await list_activity_logs(db, user_id, limit=limit, cursor=cursor, activity_type=activity_type)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+
+    return [ActivityLogResponse.model_validate(log) for log in logs]
@@ -1 +1,19 @@
-# Pydantic models (KeyCreate, KeyRevoke)
\ No newline at end of file
+# Pydantic models (ActivityLog)
+from pydantic import BaseModel
+from datetime import datetime
+from uuid import UUID
+from typing import Optional, Literal
+
+ActivityType = Literal["SIGN", "VERIFY", "SHARE", "UPLOAD", "DOWNLOAD"]
+
+
+class ActivityLogResponse(BaseModel):
+    log_id: int
+    user_id: UUID
+    activity_type: str
+    document_id: Optional[int] = None
+    ip_address: Optional[str] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
@@ -1 +1,203 @@
-# Logic sinh khoá, mã hoá private key
\ No newline at end of file
+# Ghi activity log theo lô: event vào hàng đợi asyncio, task nền INSERT nhiều dòng một lần
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+from sqlalchemy import select, insert, tuple_, Row
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src import metrics
+from src.config import ACTIVITY_LOG_BATCH_SIZE, ACTIVITY_LOG_FLUSH_INTERVAL_MS, ACTIVITY_LOG_QUEUE_SIZE
+from src.database import AsyncSessionLocal
+from src.document.service import encode_cursor, decode_cursor
+from src.log.schemas import ActivityType
+from src.models import ActivityLog
+
+logger = logging.getLogger(__name__)
+
+# Sentinel stop() đưa vào hàng đợi: task nền ghi nốt rồi tự kết thúc
+_STOP = object()
+
+
+class ActivityLogWriter:
+    """
+    Buffer activity log trong bộ nhớ, ghi xuống database theo lô
+    - Flush khi đủ batch_size event hoặc sau flush_interval_ms kể từ event đầu tiên của lô
+    - Mỗi lô là 1 câu INSERT nhiều dòng (tối đa batch_size dòng)
+    - Hàng đợi có giới hạn: đầy thì bỏ event (không chặn request)
+    - stop() ghi nốt lô đang dở và toàn bộ event còn trong hàng đợi: gửi sentinel rồi chờ task,
+      không huỷ task giữa lúc đang INSERT (huỷ sau commit sẽ ghi lặp lô đó)
+    """
+
+    def __init__(self, batch_size: int, flush_interval_ms: int, max_queue: int):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self._queue: "asyncio.Queue[dict]" = asyncio.Queue(maxsize=max_queue)
+        self._pending: List[dict] = []
+        self._task: Optional[asyncio.Task] = None
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.failed = 0
+
+    def record(
+        self,
+        user_id: str,
+        activity_type: ActivityType,
+        document_id: Optional[int] = None,
+        ip_address: Optional[str] = None
+    ) -> None:
+        """Thêm 1 event vào hàng đợi (không chờ database)"""
+        try:
+            self._queue.put_nowait({
+                "user_id": user_id,
+                "activity_type": activity_type,
+                "document_id": document_id,
+                "ip_address": ip_address,
+                # Thời điểm xảy ra, không phải thời điểm flush
+                "created_at": datetime.now(timezone.utc).replace(tzinfo=None),
+            })
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            if not self._task.done():
+                await self._queue.put(_STOP)
+            await self._task
+            self._task = None
+
+        # Task chưa từng chạy: tự ghi phần còn lại
+        await self._drain()
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            if not self._pending:
+                item = await self._queue.get()
+                if item is _STOP:
+                    break
+                self._pending.append(item)
+            deadline = loop.time() + self.flush_interval
+
+            while len(self._pending) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+
+                if item is _STOP:
+                    # Ghi ngay lô đang gom, không chờ hết flush_interval
+                    stopping = True
+                    break
+                self._pending.append(item)
+
+            await self._flush_pending()
+
+        await self._drain()
+
+    async def _drain(self) -> None:
+        """Ghi lô đang dở + toàn bộ event còn trong hàng đợi (kể cả event đến sau sentinel), không chờ"""
+        while self._pending or not self._queue.empty():
+            while len(self._pending) < self.batch_size and not self._queue.empty():
+                item = self._queue.get_nowait()
+                if item is not _STOP:
+                    self._pending.append(item)
+            if self._pending:
+                await self._flush_pending()
+
+    async def _flush_pending(self) -> None:
+        await self._insert_batch(self._pending)
+        self._pending = []
+
+    async def _insert_batch(self, batch: List[dict]) -> None:
+        """
+        INSERT nhiều dòng trong 1 transaction
+        - IntegrityError (vd. document/user đã bị xoá trong lúc event chờ flush): chia đôi lô và ghi lại,
+          chỉ các dòng vi phạm bị bỏ, không kéo theo các event khác trong lô
+        """
+        try:
+            async with AsyncSessionLocal() as db:
+                async with db.begin():
+                    await db.execute(insert(ActivityLog).values(batch))
+            self.written += len(batch)
+            self.batches += 1
+        except IntegrityError as e:
+            if len(batch) > 1:
+                middle = len(batch) // 2
+                await self._insert_batch(batch[:middle])
+                await self._insert_batch(batch[middle:])
+                return
+            self.failed += 1
+            logger.warning("Bỏ activity log %s (document %s): %s",
+                           batch[0]["activity_type"], batch[0]["document_id"], e.orig)
+        except Exception as e:
+            self.failed += len(batch)
+            logger.error("Ghi %s activity log thất bại: %s", len(batch), e)
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "pending": len(self._pending),
+            "written": self.written,
+            "batches": self.batches,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+
+activity_log = ActivityLogWriter(ACTIVITY_LOG_BATCH_SIZE, ACTIVITY_LOG_FLUSH_INTERVAL_MS, ACTIVITY_LOG_QUEUE_SIZE)
+metrics.register("activity_log", activity_log.stats)
+
+
+async def list_activity_logs(
+    db: AsyncSession,
+    user_id: str,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    activity_type: Optional[str] = None
+) -> Tuple[List[Row], Optional[str]]:
+    """
+    Activity log của user (mới nhất trước) theo keyset pagination
+    - Dùng index activity_logs(user_id, created_at)
+    - Trả về (rows, next_cursor), next_cursor = None nếu hết dữ liệu
+    """
+    stmt = select(
+        ActivityLog.log_id,
+        ActivityLog.user_id,
+        ActivityLog.activity_type,
+        ActivityLog.document_id,
+        ActivityLog.ip_address,
+        ActivityLog.created_at,
+    ).where(ActivityLog.user_id == user_id)
+
+    if activity_type:
+        stmt = stmt.where(ActivityLog.activity_type == activity_type)
+
+    if cursor:
+        created_at, log_id = decode_cursor(cursor)
+        stmt = stmt.where(tuple_(ActivityLog.created_at, ActivityLog.log_id) < tuple_(created_at, log_id))
+
+    stmt = stmt.order_by(ActivityLog.created_at.desc(), ActivityLog.log_id.desc()).limit(limit + 1)
+
+    rows = (await db.execute(stmt)).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].log_id)
+
+    return rows, next_cursor
@@ -1 +1,9 @@
-# Hàm liên quán đến RSA
\ No newline at end of file
+# Hàm tiện ích cho activity log
+from typing import Optional
+
+from fastapi import Request
+
+
+def client_ip(request: Request) -> Optional[str]:
+    """IP của client (tối đa 45 ký tự như cột ip_address)"""
+    return request.client.host[:45] if request.client else None
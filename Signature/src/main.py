@@ -1,10 +1,51 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from src.auth.router import router as auth_router
 from src.key.router import router as key_router
 from src.document.router import router as document_router
+from src.log.router import router as log_router
+from src.middleware import LimitUploadSizeMiddleware
+from src.config import MAX_REQUEST_BYTES, MAX_BATCH_REQUEST_BYTES, KEY_REWRAP_ON_STARTUP
+from src.key.utils import get_keyring
+from src.key.rewrap import rewrap_keys
+from src.key.pool import key_pair_pool
+from src.log.service import activity_log
+from src.auth.revocation import get_revocation_store, close_revocation_store, start_revocation_sync, stop_revocation_sync
+from src.executors import get_pdf_pool, shutdown_executors
+from src import metrics
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Khởi động
+    get_pdf_pool()
+    get_keyring()  # dẫn xuất KEK 1 lần
+    get_revocation_store()
+    start_revocation_sync()
+    rewrap_task = asyncio.create_task(rewrap_keys()) if KEY_REWRAP_ON_STARTUP else None
+    key_pair_pool.start()
+    activity_log.start()
+    yield
+    # Tắt
+    if rewrap_task:
+        rewrap_task.cancel()
+    await key_pair_pool.stop()
+    await activity_log.stop()  # ghi nốt log còn trong hàng đợi
+    shutdown_executors()
+    await stop_revocation_sync()
+    close_revocation_store()
+
+
+app = FastAPI(lifespan=lifespan)
+
+# Chặn body quá lớn ngay khi nhận byte (trước khi multipart parser đọc hết file)
+# Thêm trước CORS: middleware thêm sau nằm ngoài, nên response 413 vẫn có header CORS
+app.add_middleware(
+    LimitUploadSizeMiddleware,
+    max_body_size=MAX_REQUEST_BYTES,
+    path_limits={"/document/sign-batch": MAX_BATCH_REQUEST_BYTES}
+)
 
 # Cấu hình CORS
 origins = [
@@ -18,13 +59,21 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],  # Rõ ràng hơn
     allow_headers=["*"],
-    expose_headers=["X-Signature", "Content-Disposition"]  # Thêm headers cần expose
+    expose_headers=["X-Signature", "Content-Disposition", "Content-Range", "Content-Length", "Accept-Ranges", "ETag", "X-Next-Cursor"]  # Thêm headers cần expose
 )
 
 app.include_router(auth_router, prefix="/auth")
 app.include_router(key_router, prefix="/key")
 app.include_router(document_router, prefix="/document")
+app.include_router(log_router, prefix="/log")
 
 @app.get('/')
 async def root():
-    return {"message": "Welcome you to my app"}
\ No newline at end of file
+    return {"message": "Welcome you to my app"}
+
+
+@app.get('/metrics', dependencies=[Depends(metrics.require_metrics_token)])
+async def get_metrics():
+    """Số liệu nội bộ: cache, pool (dùng để tinh chỉnh cấu hình); cần METRICS_TOKEN"""
+    # Một số collector đọc backend (vd. SQLite của danh sách token thu hồi) -> chạy ngoài event loop
+    return await asyncio.to_thread(metrics.collect)
\ No newline at end of file
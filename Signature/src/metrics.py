@@ -0,0 +1,34 @@
+# Metrics nội bộ (cache hit/miss, pool, ...) trả về qua GET /metrics
+import hmac
+from typing import Callable, Dict, Optional
+
+from fastapi import Header, HTTPException, status
+
+from src.config import METRICS_TOKEN
+
+_collectors: Dict[str, Callable[[], dict]] = {}
+
+
+def register(name: str, collector: Callable[[], dict]) -> None:
+    """Đăng ký một nguồn metrics, collector trả về dict số liệu hiện tại"""
+    _collectors[name] = collector
+
+
+def collect() -> Dict[str, dict]:
+    return {name: collector() for name, collector in _collectors.items()}
+
+
+def require_metrics_token(authorization: Optional[str] = Header(None)) -> None:
+    """
+    Dependency của GET /metrics: số liệu nội bộ không công khai
+    - Chưa cấu hình METRICS_TOKEN -> endpoint coi như không tồn tại (404)
+    - Sai/thiếu token -> 401
+    """
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not authorization or not hmac.compare_digest(authorization.encode(), f"Bearer {METRICS_TOKEN}".encode()):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Metrics token không hợp lệ",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
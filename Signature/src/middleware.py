@@ -0,0 +1,56 @@
+# ASGI middleware dùng chung
+from fastapi import HTTPException, status
+from fastapi.responses import JSONResponse
+
+
+class LimitUploadSizeMiddleware:
+    """
+    Giới hạn kích thước body của request
+    - Content-Length vượt giới hạn -> trả 413 ngay, không đọc body
+    - Body dạng chunked -> đếm byte khi nhận và dừng ngay khi vượt giới hạn,
+      không đợi multipart parser đọc hết file
+    - path_limits: giới hạn riêng cho từng path (ví dụ endpoint nhận nhiều file)
+    """
+
+    def __init__(self, app, max_body_size: int, path_limits: dict = None):
+        self.app = app
+        self.max_body_size = max_body_size
+        self.path_limits = path_limits or {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("POST", "PUT", "PATCH"):
+            await self.app(scope, receive, send)
+            return
+
+        max_body_size = self.path_limits.get(scope["path"], self.max_body_size)
+
+        headers = dict(scope.get("headers") or [])
+        content_length = headers.get(b"content-length")
+        if content_length and content_length.isdigit() and int(content_length) > max_body_size:
+            response = JSONResponse(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                content={"detail": self._detail(max_body_size)}
+            )
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_body_size:
+                    # HTTPException được FastAPI giữ nguyên khi parse form -> client nhận 413
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=self._detail(max_body_size)
+                    )
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+    @staticmethod
+    def _detail(max_body_size: int) -> str:
+        return f"Request không được vượt quá {max_body_size // (1024 * 1024)}MB"
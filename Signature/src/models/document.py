@@ -1,6 +1,6 @@
 # SQLAlchemy models (Document, Signature)
 
-from sqlalchemy import Column, UUID, Text, String, DateTime, ForeignKey, Integer
+from sqlalchemy import Column, UUID, Text, String, DateTime, ForeignKey, Integer, BigInteger, Float, Index, UniqueConstraint
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from src.models import Base
@@ -12,14 +12,29 @@ class Document(Base):
     user_id = Column(UUID, ForeignKey('users.user_id', ondelete='CASCADE'))
     filename = Column(String(255))
     status = Column(String(255))
-    file_bytes = Column(Text)
+    # Nội dung file nằm trong blob store, bảng chỉ giữ digest/kích thước/key
+    content_sha256 = Column(String(64), index=True)
+    size_bytes = Column(BigInteger)
+    storage_key = Column(String(255))
     created_at = Column(DateTime, server_default=func.now())
+    # Job backfill đã đọc manifest của file (NULL = chưa, cần quét)
+    signatures_indexed_at = Column(DateTime)
 
     # Relationship
     user = relationship("User", back_populates="documents")
-    signature = relationship("Signature", back_populates="document", uselist=False)
+    signatures = relationship("Signature", back_populates="document")
     shared_documents = relationship("SharedDocument", back_populates="document")
     activity_logs = relationship("ActivityLog", back_populates="document")
+
+    __table_args__ = (
+        Index("ix_documents_user_id_created_at", "user_id", "created_at"),  # listing keyset
+        Index("ix_documents_user_id_document_id", "user_id", "document_id"),
+        UniqueConstraint("user_id", "filename", name="uq_documents_user_id_filename"),
+        Index(
+            "ix_documents_signatures_unindexed", "document_id",
+            postgresql_where=signatures_indexed_at.is_(None)
+        ),  # backfill
+    )
     
 class Signature(Base):
     __tablename__ = "signatures"
@@ -30,13 +45,28 @@ class Signature(Base):
     key_id = Column(Integer, ForeignKey('keys.key_id', ondelete='SET NULL'))
     signature = Column(Text)
     signed_at = Column(DateTime, server_default=func.now())
+    # Chỉ mục chữ ký (trùng với mục trong manifest của PDF) -> tra cứu/kiểm tra chồng chéo không cần parse PDF
+    page = Column(Integer)
+    rect_x = Column(Float)
+    rect_y = Column(Float)
+    rect_width = Column(Float)
+    rect_height = Column(Float)
+    content_hash = Column(String(64))
+    algorithm = Column(String(32))
+    manifest_version = Column(Integer)
 
     # Relationship
-    document = relationship("Document", back_populates="signature")
+    document = relationship("Document", back_populates="signatures")
     key = relationship('Key', back_populates='signatures')
     verifications = relationship('Verification', back_populates='signature')
     signer = relationship('User', back_populates='signatures')
 
+    __table_args__ = (
+        Index("ix_signatures_document_id_user_id", "document_id", "user_id"),
+        Index("ix_signatures_user_id_signature_id", "user_id", "signature_id"),  # tra cứu theo người ký
+        Index("ix_signatures_document_id_page", "document_id", "page"),  # kiểm tra chồng chéo
+    )
+
 class SharedDocument(Base):
     __tablename__ = 'shared_documents'
 
@@ -12,8 +12,10 @@ class Key(Base):
     user_id = Column(UUID, ForeignKey('users.user_id', ondelete='CASCADE'), unique=True)
     public_key = Column(Text)
     encrypted_private = Column(Text) 
-    salt = Column(Text)
+    salt = Column(Text)  # chỉ dùng cho key cũ (PBKDF2 theo từng dòng)
     nonce = Column(Text)
+    wrapped_dek = Column(Text)  # DEK đã wrap bằng KEK (envelope encryption)
+    kek_version = Column(Integer)
     revoked_at = Column(DateTime)
     created_at = Column(DateTime, server_default=func.now())
     
@@ -0,0 +1,193 @@
+# Blob store cho nội dung tài liệu (content-addressed theo SHA-256)
+import asyncio
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import AsyncIterator, BinaryIO, Callable, Optional
+
+from src.config import STORAGE_BACKEND, STORAGE_LOCAL_ROOT, STORAGE_CHUNK_SIZE
+
+
+@dataclass(frozen=True)
+class StoredBlob:
+    storage_key: str
+    sha256: str
+    size: int
+
+
+class BlobStore(ABC):
+    """
+    Interface chung cho các backend lưu blob
+    - Backend phải cài đặt các hàm sync (abstractmethod); put_file có cài đặt mặc định
+    - Các hàm async mặc định chạy hàm sync trong thread để không chặn event loop
+    """
+
+    @abstractmethod
+    def key_for(self, digest: str) -> str:
+        """Key của blob theo digest (biết trước khi ghi, dùng để khoá theo blob)"""
+        ...
+
+    @abstractmethod
+    def put_bytes(self, data: bytes) -> StoredBlob:
+        ...
+
+    def put_file(self, fileobj: BinaryIO, sha256: str, size: int) -> StoredBlob:
+        """Ghi blob từ file-like (digest đã tính sẵn khi nhận upload)"""
+        fileobj.seek(0)
+        return self.put_bytes(fileobj.read())
+
+    @abstractmethod
+    def read_bytes(self, storage_key: str) -> bytes:
+        ...
+
+    @abstractmethod
+    def remove(self, storage_key: str) -> None:
+        ...
+
+    @abstractmethod
+    def contains(self, storage_key: str) -> bool:
+        ...
+
+    @abstractmethod
+    def open_reader(self, storage_key: str) -> BinaryIO:
+        """Mở blob để đọc tuần tự (seek/read)"""
+        ...
+
+    @abstractmethod
+    def size_of(self, storage_key: str) -> int:
+        ...
+
+    async def put(self, data: bytes) -> StoredBlob:
+        return await asyncio.to_thread(self.put_bytes, data)
+
+    async def put_stream(self, fileobj: BinaryIO, sha256: str, size: int) -> StoredBlob:
+        return await asyncio.to_thread(self.put_file, fileobj, sha256, size)
+
+    async def get(self, storage_key: str) -> bytes:
+        return await asyncio.to_thread(self.read_bytes, storage_key)
+
+    async def delete(self, storage_key: str) -> None:
+        await asyncio.to_thread(self.remove, storage_key)
+
+    async def exists(self, storage_key: str) -> bool:
+        return await asyncio.to_thread(self.contains, storage_key)
+
+    async def size(self, storage_key: str) -> int:
+        return await asyncio.to_thread(self.size_of, storage_key)
+
+    async def iter_range(
+        self,
+        storage_key: str,
+        start: int = 0,
+        end: Optional[int] = None,
+        chunk_size: int = STORAGE_CHUNK_SIZE
+    ) -> AsyncIterator[bytes]:
+        """
+        Đọc blob theo từng chunk trong khoảng [start, end] (end tính cả byte cuối)
+        - Dùng cho StreamingResponse, không bao giờ giữ cả file trong bộ nhớ
+        """
+        f = await asyncio.to_thread(self.open_reader, storage_key)
+        try:
+            await asyncio.to_thread(f.seek, start)
+            remaining = None if end is None else end - start + 1
+
+            while remaining is None or remaining > 0:
+                to_read = chunk_size if remaining is None else min(chunk_size, remaining)
+                chunk = await asyncio.to_thread(f.read, to_read)
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+        finally:
+            await asyncio.to_thread(f.close)
+
+
+class LocalBlobStore(BlobStore):
+    """
+    Lưu blob trên filesystem: <root>/sha256/ab/cd/<digest>
+    - Cùng nội dung -> cùng key (tự động khử trùng lặp)
+    - Ghi ra file tạm rồi os.replace để không bao giờ đọc phải file ghi dở
+    """
+
+    _KEY_PATTERN = re.compile(r"^sha256/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}$")
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+
+    @staticmethod
+    def key_for(digest: str) -> str:
+        return f"sha256/{digest[:2]}/{digest[2:4]}/{digest}"
+
+    def _path(self, storage_key: str) -> str:
+        if not self._KEY_PATTERN.match(storage_key or ""):
+            raise ValueError(f"Storage key không hợp lệ: {storage_key}")
+        return os.path.join(self.root, *storage_key.split("/"))
+
+    def put_bytes(self, data: bytes) -> StoredBlob:
+        digest = hashlib.sha256(data).hexdigest()
+        return self._write(digest, len(data), lambda f: f.write(data))
+
+    def put_file(self, fileobj: BinaryIO, sha256: str, size: int) -> StoredBlob:
+        def copy(f):
+            fileobj.seek(0)
+            shutil.copyfileobj(fileobj, f, STORAGE_CHUNK_SIZE)
+
+        return self._write(sha256, size, copy)
+
+    def _write(self, digest: str, size: int, write: Callable[[BinaryIO], None]) -> StoredBlob:
+        storage_key = self.key_for(digest)
+        path = self._path(storage_key)
+
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    write(f)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+                raise
+
+        return StoredBlob(storage_key=storage_key, sha256=digest, size=size)
+
+    def read_bytes(self, storage_key: str) -> bytes:
+        with open(self._path(storage_key), "rb") as f:
+            return f.read()
+
+    def remove(self, storage_key: str) -> None:
+        try:
+            os.unlink(self._path(storage_key))
+        except FileNotFoundError:
+            pass
+
+    def contains(self, storage_key: str) -> bool:
+        return os.path.exists(self._path(storage_key))
+
+    def open_reader(self, storage_key: str) -> BinaryIO:
+        return open(self._path(storage_key), "rb")
+
+    def size_of(self, storage_key: str) -> int:
+        return os.path.getsize(self._path(storage_key))
+
+
+_blob_store: BlobStore = None
+
+
+def get_blob_store() -> BlobStore:
+    """Trả về blob store dùng chung theo cấu hình STORAGE_BACKEND"""
+    global _blob_store
+    if _blob_store is None:
+        if STORAGE_BACKEND == "local":
+            _blob_store = LocalBlobStore(STORAGE_LOCAL_ROOT)
+        else:
+            raise ValueError(f"STORAGE_BACKEND không được hỗ trợ: {STORAGE_BACKEND}")
+    return _blob_store
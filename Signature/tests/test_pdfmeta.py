@@ -0,0 +1,48 @@
+# Đọc cấu trúc PDF không qua parser đầy đủ (src/document/pdfmeta.py)
+import zlib
+
+import fitz  # PyMuPDF
+import pytest
+
+from src.document.pdfmeta import PdfInfoReader, PdfMetadataError, Name, MAX_STREAM_SIZE, revision_ends
+
+
+def _incremental_pdf(tmp_path) -> tuple:
+    """PDF 2 revision (lưu incremental) -> (bytes, độ dài revision đầu)"""
+    path = str(tmp_path / "doc.pdf")
+    doc = fitz.open()
+    doc.new_page().insert_text((72, 72), "Hello")
+    doc.save(path)
+    doc.close()
+    with open(path, "rb") as f:
+        first_length = len(f.read())
+
+    doc = fitz.open(path)
+    doc.set_metadata({"title": "v2"})
+    doc.save(path, incremental=True, encryption=fitz.PDF_ENCRYPT_KEEP)
+    doc.close()
+    with open(path, "rb") as f:
+        return f.read(), first_length
+
+
+def test_revision_ends_match_saved_revisions(tmp_path):
+    data, first_length = _incremental_pdf(tmp_path)
+    ends = revision_ends(data)
+
+    assert len(ends) == 2
+    assert any(start <= first_length <= stop for start, stop in ends)
+    assert ends[-1][1] == len(data)
+
+
+def test_revision_ends_ignore_eof_without_startxref(tmp_path):
+    data, _ = _incremental_pdf(tmp_path)
+    forged = data[:100] + b"%%EOF\n" + data[100:]
+
+    assert len(revision_ends(forged)) == 2
+    assert not any(start <= 106 <= stop for start, stop in revision_ends(forged))
+
+
+def test_flate_output_is_capped():
+    bomb = zlib.compress(b"\0" * (MAX_STREAM_SIZE + 1))
+    with pytest.raises(PdfMetadataError):
+        PdfInfoReader._decode({"Filter": Name("FlateDecode")}, bomb)
@@ -0,0 +1,67 @@
+# Tự đặt vị trí stamp (src/document/placement.py): occupancy grid + summed-area table
+import math
+import random
+import time
+
+import pytest
+
+from src.document.placement import best_slot, grid_resolution, occupancy_grid
+from src.document.spatial import rects_intersect
+
+LETTER = (0, 0, 612, 792)
+
+
+def test_best_slot_avoids_obstacles():
+    random.seed(3)
+    obstacles = []
+    for _ in range(200):
+        x, y = random.uniform(0, 560), random.uniform(0, 740)
+        obstacles.append((x, y, x + random.uniform(5, 60), y + random.uniform(5, 30)))
+
+    slot = best_slot(LETTER, obstacles, (180, 50), margin=10)
+    assert slot is not None
+    assert not any(rects_intersect(slot, obstacle) for obstacle in obstacles)
+    assert 10 <= slot[0] and slot[2] <= 602 and 10 <= slot[1] and slot[3] <= 782
+
+
+def test_best_slot_full_page():
+    assert best_slot(LETTER, [LETTER], (180, 50)) is None
+
+
+def test_grid_resolution_unchanged_for_normal_pages():
+    assert grid_resolution(LETTER, 2, max_cells=1_000_000) == 2
+
+
+@pytest.mark.parametrize("page", [
+    (0, 0, 14400, 14400),  # kích thước trang tối đa của PDF (200 inch)
+    (0, 0, 1e9, 1e9),
+    (0, 0, 1e9, 1),
+    (0, 0, 0.5, 1e12),
+])
+def test_grid_stays_under_cell_budget(page):
+    resolution = grid_resolution(page, 2, max_cells=10_000)
+    assert math.ceil((page[2] - page[0]) / resolution) * math.ceil((page[3] - page[1]) / resolution) <= 10_000
+
+
+def test_huge_page_is_bounded():
+    page = (0, 0, 1e9, 1e9)
+    obstacle = (0, 0, 5e8, 1e9)
+
+    started = time.perf_counter()
+    grid = occupancy_grid(page, [obstacle])
+    slot = best_slot(page, [obstacle], (180, 50))
+    assert time.perf_counter() - started < 5
+
+    assert grid.size <= 1_000_000
+    assert slot is not None and not rects_intersect(slot, obstacle)
+
+
+@pytest.mark.parametrize("page", [
+    (0, 0, 0, 792),
+    (0, 0, 612, -1),
+    (0, 0, float("inf"), 792),
+    (0, 0, float("nan"), 792),
+])
+def test_invalid_page_rejected(page):
+    with pytest.raises(ValueError):
+        best_slot(page, [], (180, 50))
@@ -0,0 +1,78 @@
+# Kế hoạch truy vấn (EXPLAIN) của các câu lệnh hot-path: phải dùng đúng index đã thêm
+# Chỉ chạy với Postgres: DB_URL=postgresql+asyncpg://... pytest tests/test_query_plans.py
+# Schema được tạo trong 1 transaction và rollback khi xong, không để lại dữ liệu
+import asyncio
+import os
+import uuid
+from datetime import datetime
+
+import pytest
+
+DB_URL = os.getenv("DB_URL", "")
+if not DB_URL.startswith("postgresql"):
+    pytest.skip("Cần DB_URL trỏ tới Postgres", allow_module_level=True)
+
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from src.models import Base
+from src.document.service import encode_cursor, list_documents_by_user
+from src.key.service import get_key, get_public_key
+
+
+async def _explain(call) -> str:
+    """
+    Chạy call(db) rồi EXPLAIN đúng câu lệnh (và tham số) mà nó gửi xuống database
+    - enable_seqscan = off: bảng rỗng thì seq scan luôn rẻ nhất, tắt để thấy index planner chọn
+    """
+    engine = create_async_engine(DB_URL)
+    try:
+        async with engine.connect() as conn:
+            await conn.begin()
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.execute(text("SET LOCAL enable_seqscan = off"))
+
+            statements = []
+
+            def capture(connection, cursor, statement, parameters, context, executemany):
+                statements.append((statement, parameters))
+
+            event.listen(conn.sync_connection, "before_cursor_execute", capture)
+            await call(AsyncSession(bind=conn))
+            event.remove(conn.sync_connection, "before_cursor_execute", capture)
+
+            assert len(statements) == 1
+            statement, parameters = statements[0]
+            plan = (await conn.exec_driver_sql(f"EXPLAIN {statement}", parameters)).scalars().all()
+            await conn.rollback()
+            return "\n".join(plan)
+    finally:
+        await engine.dispose()
+
+
+def explain(call) -> str:
+    """Kế hoạch của câu lệnh call(db) gửi đi; không kết nối được Postgres thì bỏ qua test"""
+    try:
+        return asyncio.run(_explain(call))
+    except OSError as e:
+        pytest.skip(f"Không kết nối được Postgres: {e}")
+
+
+USER_ID = str(uuid.uuid4())
+
+
+def test_list_documents_uses_user_created_index():
+    plan = explain(lambda db: list_documents_by_user(db, USER_ID, limit=20))
+    assert "ix_documents_user_id_created_at" in plan, plan
+
+
+def test_list_documents_with_cursor_uses_user_created_index():
+    cursor = encode_cursor(datetime(2026, 1, 1), 100)
+    plan = explain(lambda db: list_documents_by_user(db, USER_ID, limit=20, cursor=cursor))
+    assert "ix_documents_user_id_created_at" in plan, plan
+
+
+@pytest.mark.parametrize("lookup", [get_key, get_public_key])
+def test_key_lookup_uses_user_unique_index(lookup):
+    plan = explain(lambda db: lookup(db, USER_ID))
+    assert "keys_user_id_key" in plan, plan
@@ -0,0 +1,91 @@
+# Chỉ mục không gian của stamp (src/document/spatial.py) + manifest dựng từ metadata PDF
+import json
+import random
+import time
+
+from src.document.manifest import SignatureManifest, MANIFEST_VERSION
+from src.document.spatial import PageGrid, rects_intersect
+
+
+def _manifest(*signatures) -> SignatureManifest:
+    return SignatureManifest.from_raw(None, json.dumps({"version": MANIFEST_VERSION, "signatures": list(signatures)}))
+
+
+def _entry(x, y, width, height, page=1):
+    return {"signature": "s", "signer_id": "u", "page": page, "x": x, "y": y,
+            "width": width, "height": height, "version": MANIFEST_VERSION}
+
+
+def test_query_matches_brute_force():
+    random.seed(7)
+    rects = []
+    for _ in range(300):
+        x, y = random.uniform(-50, 650), random.uniform(-50, 850)
+        rects.append((x, y, x + random.uniform(0, 200), y + random.uniform(0, 80)))
+    grid = PageGrid.from_rects(rects)
+
+    for _ in range(500):
+        x, y = random.uniform(-100, 700), random.uniform(-100, 900)
+        query = (x, y, x + random.uniform(-5, 300), y + random.uniform(-5, 100))
+        expected = [
+            index for index, rect in enumerate(rects)
+            if query[0] < query[2] and query[1] < query[3]
+            and rect[0] < rect[2] and rect[1] < rect[3] and rects_intersect(query, rect)
+        ]
+        assert grid.query(query) == expected
+        assert grid.intersects(query) == bool(expected)
+
+
+def test_oversized_entry_is_not_spread_over_cells():
+    # Kích thước lấy từ /SignatureManifest do người upload kiểm soát
+    started = time.perf_counter()
+    manifest = _manifest(
+        _entry(0, 0, 1e7, 1e7),
+        _entry(-1e300, -1e300, 1e308, 1e308),
+        _entry(100, 100, 128000, 128000, page=2),
+        _entry(10, 10, 180, 50),
+    )
+    assert time.perf_counter() - started < 1
+
+    # Vẫn được tính khi kiểm tra chồng chéo, ở bất kỳ đâu nó phủ tới
+    assert manifest.overlaps(1, (500, 500, 680, 550))
+    assert manifest.overlaps(1, (5e6, 5e6, 5e6 + 180, 5e6 + 50))
+    assert manifest.overlaps(2, (1e5, 1e5, 1e5 + 180, 1e5 + 50))
+    assert not manifest.overlaps(2, (0, 0, 50, 50))
+    assert len(manifest.page_rects(1)) == 3
+
+
+def test_non_finite_entries_do_not_break_index():
+    manifest = SignatureManifest.from_raw(None, json.dumps({
+        "version": MANIFEST_VERSION,
+        "signatures": [_entry(float("nan"), 0, 180, 50), _entry(0, 0, float("inf"), 50), _entry(0, 200, 180, 50)],
+    }))
+    assert manifest.overlaps(1, (10, 10, 20, 20))  # rect tới vô cực
+    assert manifest.overlaps(1, (10, 210, 20, 220))
+    assert not manifest.overlaps(1, (10, 300, 20, 320))
+
+
+def test_huge_query_rect_is_bounded():
+    grid = PageGrid.from_rects([(10, 10, 190, 60), (300, 300, 480, 350)])
+    started = time.perf_counter()
+    assert grid.query((-1e12, -1e12, 1e12, 1e12)) == [0, 1]
+    assert not grid.intersects((1e12, 1e12, 1e12 + 180, 1e12 + 50))
+    assert time.perf_counter() - started < 1
+
+
+def test_nearest_free_slot():
+    manifest = _manifest(_entry(100, 100, 180, 50))
+    page = (0, 0, 612, 792)
+
+    assert manifest.free_slot(1, (300, 400, 480, 450), page) == (300, 400, 480, 450)
+    slot = manifest.free_slot(1, (100, 100, 280, 150), page)
+    assert slot is not None and not manifest.overlaps(1, slot)
+    assert manifest.free_slot(1, (0, 0, 700, 50), page) is None
+
+
+def test_nearest_free_slot_on_huge_page_is_bounded():
+    manifest = _manifest(_entry(100, 100, 180, 50))
+    started = time.perf_counter()
+    slot = manifest.free_slot(1, (100, 100, 280, 150), (0, 0, 14400, 14400))
+    assert slot is not None and not manifest.overlaps(1, slot)
+    assert time.perf_counter() - started < 2
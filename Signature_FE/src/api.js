@@ -347,7 +347,7 @@ export const documentContent = async (documentId) => {
       throw new Error('Authentication required');
     }
 
-    const response = await fetch(`${API_BASE_URL}/${API_DOCUMENT}/${documentId}/content`, {
+    const response = await fetch(`${API_BASE_URL}/${API_DOCUMENT}/${documentId}/content?format=json`, {
       method: 'GET',
       headers: {
         'Authorization': `Bearer ${token}`,